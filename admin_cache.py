@@ -0,0 +1,125 @@
+"""
+Кэш администраторов чатов
+
+Хранит результат bot.get_chat_administrators по chat_id с TTL и LRU-вытеснением,
+чтобы проверки прав в командах не делали запрос к Bot API на каждое обновление.
+Инвалидируется обработчиками my_chat_member/chat_member (handlers/members.py).
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from config import ADMIN_CACHE_TTL_SECONDS, ADMIN_CACHE_MAX_CHATS
+from metrics import ADMIN_CACHE_EVICTIONS, ADMIN_CACHE_INVALIDATIONS, ADMIN_CACHE_REQUESTS, ADMIN_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class AdminCache:
+    """TTL + LRU кэш списков администраторов по chat_id"""
+
+    def __init__(self, ttl=ADMIN_CACHE_TTL_SECONDS, max_chats=ADMIN_CACHE_MAX_CHATS):
+        self.ttl = ttl
+        self.max_chats = max_chats
+        # chat_id -> (expires_at, admins, admin_ids)
+        self._entries = OrderedDict()
+        # chat_id -> Future: параллельные промахи по одному чату ждут один запрос
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _get_fresh(self, chat_id):
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[chat_id]
+            return None
+        self._entries.move_to_end(chat_id)
+        return entry
+
+    def _store(self, chat_id, admins):
+        admin_ids = frozenset(admin.user.id for admin in admins)
+        entry = (time.monotonic() + self.ttl, admins, admin_ids)
+        self._entries[chat_id] = entry
+        self._entries.move_to_end(chat_id)
+        while len(self._entries) > self.max_chats:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+            ADMIN_CACHE_EVICTIONS.inc()
+        return entry
+
+    async def _load(self, bot, chat_id):
+        entry = self._get_fresh(chat_id)
+        if entry is not None:
+            self.hits += 1
+            ADMIN_CACHE_REQUESTS.inc(result="hit")
+            return entry
+
+        pending = self._pending.get(chat_id)
+        if pending is not None:
+            self.hits += 1
+            ADMIN_CACHE_REQUESTS.inc(result="hit")
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        ADMIN_CACHE_REQUESTS.inc(result="miss")
+        future = asyncio.get_running_loop().create_future()
+        self._pending[chat_id] = future
+        try:
+            admins = await bot.get_chat_administrators(chat_id)
+            entry = self._store(chat_id, admins)
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            # Исключение уже передано вызывающему — не даем asyncio ругаться на необработанное
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(chat_id, None)
+
+    async def get_admins(self, bot, chat_id):
+        """Список администраторов чата (ChatMember) из кэша или Bot API"""
+        entry = await self._load(bot, chat_id)
+        return entry[1]
+
+    async def get_admin_ids(self, bot, chat_id):
+        """Множество user_id администраторов чата"""
+        entry = await self._load(bot, chat_id)
+        return entry[2]
+
+    async def is_admin(self, bot, chat_id, user_id):
+        """Проверяет, является ли пользователь администратором чата"""
+        return user_id in await self.get_admin_ids(bot, chat_id)
+
+    def invalidate(self, chat_id):
+        """Сбрасывает закэшированный список админов чата"""
+        if self._entries.pop(chat_id, None) is not None:
+            self.invalidations += 1
+            ADMIN_CACHE_INVALIDATIONS.inc()
+            logger.debug(f"Кэш админов чата {chat_id} сброшен")
+
+    def clear(self):
+        """Полностью очищает кэш"""
+        self._entries.clear()
+
+    def stats(self):
+        """Счетчики попаданий/промахов кэша"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+
+# Глобальный кэш администраторов
+admin_cache = AdminCache()
+ADMIN_CACHE_SIZE.set_function(lambda: len(admin_cache._entries))
@@ -0,0 +1,99 @@
+"""
+Перенос старых отчетов в холодный архив
+
+Раз в сутки (ARCHIVE_TIME) отчеты старше ARCHIVE_AFTER_DAYS дней переносятся
+пачками из daily_reports в годовые архивы ARCHIVE_DIR/reports_YYYY.db со
+сжатым текстом (storage/archive.py): каждая пачка сначала записывается в
+архив, затем удаляется из основной базы. После переноса файл базы
+перестраивается (VACUUM), чтобы он действительно уменьшился.
+
+Перенос идемпотентен: если процесс упал между записью в архив и удалением,
+до следующего запуска отчет читается только из основной базы (архивная копия
+пропускается в ReportRepository.source), а следующий запуск перезаписывает
+его в архиве и удаляет из основной базы.
+
+/report и /export читают архивы прозрачно. Полнотекстовый поиск (/search)
+и накопительная статистика (/stats) архив не затрагивают: поиск идет только
+по отчетам основной базы, счетчики статистики при переносе не меняются.
+
+Архив есть только у бэкенда SQLite; при шардировании перенос выполняет
+процесс шарда 0.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.triggers.cron import CronTrigger
+
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_TIME, SHARD_INDEX, TIMEZONE
+from bot_instance import scheduler
+from storage import storage
+from storage.archive import write_archive
+from timezones import get_timezone, local_now
+import sharding
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_JOB_ID = "archive-reports"
+
+
+def enabled():
+    """Переносит ли этот процесс отчеты в архив"""
+    return (
+        ARCHIVE_AFTER_DAYS > 0
+        and storage.backend.name == "sqlite"
+        and (not sharding.enabled() or SHARD_INDEX == 0)
+    )
+
+
+async def archive_old_reports(horizon_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Переносит отчеты старше horizon_days дней в годовые архивы
+
+    Returns:
+        dict: Сводка (граница, перенесено отчетов, годы архивов, длительность)
+    """
+    started = time.perf_counter()
+    cutoff = (local_now() - timedelta(days=horizon_days)).strftime("%Y-%m-%d")
+    summary = {"before": cutoff, "moved": 0, "years": [], "duration": 0.0}
+
+    while rows := await storage.reports.older_than(cutoff, batch_size):
+        by_year = {}
+        for row in rows:
+            by_year.setdefault(int(row[2][:4]), []).append(row)
+        for year, year_rows in by_year.items():
+            await write_archive(year, year_rows)
+            if year not in summary["years"]:
+                summary["years"].append(year)
+        # Из основной базы — только после commit в архив
+        await storage.reports.delete([row[:3] for row in rows])
+        summary["moved"] += len(rows)
+
+    if summary["moved"]:
+        await storage.backend.vacuum()
+    summary["duration"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"Архивация отчетов до {cutoff}: перенесено {summary['moved']} "
+        f"(годы: {summary['years'] or '—'}) за {summary['duration']} с"
+    )
+    return summary
+
+
+def schedule_archive():
+    """Создает (или снимает, если архивация выключена) ежедневную задачу переноса"""
+    if not enabled():
+        try:
+            scheduler.remove_job(ARCHIVE_JOB_ID)
+        except JobLookupError:
+            pass
+        return
+    hour, minute = map(int, ARCHIVE_TIME.split(":"))
+    scheduler.add_job(
+        archive_old_reports,
+        CronTrigger(hour=hour, minute=minute, timezone=get_timezone(TIMEZONE)),
+        id=ARCHIVE_JOB_ID,
+        name="archive reports",
+        replace_existing=True
+    )
+    logger.info(f"Архивация отчетов старше {ARCHIVE_AFTER_DAYS} дней — ежедневно в {ARCHIVE_TIME}")
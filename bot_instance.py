@@ -4,12 +4,30 @@
 """
 from aiogram import Bot, Dispatcher
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from config import BOT_TOKEN
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+import config
+from config import (
+    BOT_TOKEN,
+    TIMEZONE,
+    DB_BUSY_TIMEOUT_MS,
+    SCHEDULER_JOBS_TABLE,
+    SCHEDULER_MISFIRE_GRACE_SECONDS,
+    SHARD_COUNT,
+    SHARD_INDEX,
+)
+
+# Параметры задач по умолчанию: пропущенные за время простоя запуски
+# схлопываются в один и выполняются, если опоздание не больше grace-периода
+JOB_DEFAULTS = {
+    "coalesce": True,
+    "misfire_grace_time": SCHEDULER_MISFIRE_GRACE_SECONDS,
+    "max_instances": 1,
+}
 
 # Глобальные объекты
 bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
-scheduler = AsyncIOScheduler()
+scheduler = AsyncIOScheduler(job_defaults=JOB_DEFAULTS, timezone=TIMEZONE)
 
 # Event loop (инициализируется в main)
 loop = None
@@ -21,6 +39,36 @@ def set_event_loop(event_loop):
     loop = event_loop
 
 
+def setup_scheduler(db_path=None):
+    """
+    Подключает постоянное хранилище задач в базе бота (вызывается из main.py до scheduler.start())
+
+    Отложенные проверки отчетов и расписания переживают перезапуск бота.
+    При шардировании у каждого процесса своя таблица задач, чтобы процессы
+    не выполняли задачи друг друга.
+
+    Хранилище задач синхронное (SQLAlchemy, sqlite://) и пишет в тот же файл,
+    что и пул aiosqlite: каждое изменение задачи — блокирующая запись, которая
+    может ждать блокировку писателя до DB_BUSY_TIMEOUT_MS. Поэтому из корутин
+    (scheduler_tasks) задачи добавляются и удаляются через asyncio.to_thread,
+    а не в потоке event loop. Сам планировщик обновляет хранилище после запуска
+    задачи в event loop — это одна короткая запись на срабатывание.
+
+    Args:
+        db_path: Путь к базе данных (по умолчанию config.DB_PATH)
+    """
+    jobstore = SQLAlchemyJobStore(
+        url=f"sqlite:///{db_path or config.DB_PATH}",
+        tablename=SCHEDULER_JOBS_TABLE if SHARD_COUNT <= 1 else f"{SCHEDULER_JOBS_TABLE}_{SHARD_INDEX}",
+        engine_options={"connect_args": {"timeout": DB_BUSY_TIMEOUT_MS / 1000}},
+    )
+    scheduler.configure(
+        jobstores={"default": jobstore},
+        job_defaults=JOB_DEFAULTS,
+        timezone=TIMEZONE,
+    )
+
+
 
 
 
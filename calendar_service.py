@@ -0,0 +1,113 @@
+"""
+Производственный календарь
+
+Для каждой пары (страна, год) один раз строится битовая маска рабочих дней
+(46 байт): бит N — день с порядковым номером N от 1 января. Источник — библиотека
+holidays (праздники и перенесенные выходные) плюс файл переносов
+<CALENDAR_OVERRIDES_DIR>/<КОД>.json, где перечислены рабочие субботы
+("workdays") и выходные, которых нет в библиотеке ("holidays"):
+
+    {"workdays": ["2025-11-01"], "holidays": ["2026-01-09"]}
+
+После построения проверка дня — чтение одного бита без обращения к holidays
+и без создания объектов.
+Страна чата хранится в chats.country (NULL — CALENDAR_DEFAULT_COUNTRY).
+"""
+import json
+import logging
+import os
+from datetime import date
+
+import holidays
+
+from config import CALENDAR_DEFAULT_COUNTRY, CALENDAR_OVERRIDES_DIR
+from timezones import local_now
+
+logger = logging.getLogger(__name__)
+
+
+class CalendarService:
+    """Мемоизированные битовые маски рабочих дней по странам и годам"""
+
+    def __init__(self, default_country=CALENDAR_DEFAULT_COUNTRY, overrides_dir=CALENDAR_OVERRIDES_DIR):
+        self.default_country = default_country
+        self.overrides_dir = overrides_dir
+        # (country, year) -> (ordinal 1 января, bytes-маска рабочих дней)
+        self._years = {}
+        # country -> {date: True (рабочая суббота) / False (дополнительный выходной)}
+        self._overrides = {}
+
+    @staticmethod
+    def supports(country):
+        """Есть ли календарь страны в библиотеке holidays"""
+        return country.upper() in holidays.list_supported_countries()
+
+    def _load_overrides(self, country):
+        overrides = self._overrides.get(country)
+        if overrides is not None:
+            return overrides
+        overrides = {}
+        path = os.path.join(self.overrides_dir, f"{country}.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            for day in data.get("holidays", []):
+                overrides[date.fromisoformat(day)] = False
+            for day in data.get("workdays", []):
+                overrides[date.fromisoformat(day)] = True
+            logger.info(f"Загружены переносы календаря {country}: {len(overrides)} дней из {path}")
+        self._overrides[country] = overrides
+        return overrides
+
+    def _build(self, country, year):
+        """Строит маску рабочих дней года"""
+        public = holidays.country_holidays(country, years=year)
+        overrides = self._load_overrides(country)
+        start = date(year, 1, 1).toordinal()
+        end = date(year + 1, 1, 1).toordinal()
+        mask = bytearray((end - start + 7) // 8)
+        for ordinal in range(start, end):
+            day = date.fromordinal(ordinal)
+            workday = overrides.get(day)
+            if workday is None:
+                workday = day.weekday() < 5 and day not in public
+            if workday:
+                offset = ordinal - start
+                mask[offset >> 3] |= 1 << (offset & 7)
+        entry = (start, bytes(mask))
+        self._years[(country, year)] = entry
+        return entry
+
+    def is_workday(self, day=None, country=None):
+        """
+        Проверяет, является ли день рабочим
+
+        Args:
+            day: Дата (по умолчанию — сегодня по МСК)
+            country: Код страны в верхнем регистре (по умолчанию — CALENDAR_DEFAULT_COUNTRY)
+
+        Returns:
+            bool: True если рабочий день, False если выходной/праздник
+        """
+        if day is None:
+            day = self.today()
+        country = country or self.default_country
+        entry = self._years.get((country, day.year))
+        if entry is None:
+            entry = self._build(country, day.year)
+        offset = day.toordinal() - entry[0]
+        return (entry[1][offset >> 3] >> (offset & 7)) & 1 == 1
+
+    @staticmethod
+    def today():
+        """Сегодняшняя дата по МСК"""
+        return local_now().date()
+
+    def reload(self):
+        """Сбрасывает построенные маски и переносы (после правки файлов переносов)"""
+        self._years.clear()
+        self._overrides.clear()
+
+
+# Глобальный календарь
+calendar_service = CalendarService()
@@ -1,16 +1,225 @@
+import asyncio
+import time
 import aiosqlite
 import logging
+from contextlib import asynccontextmanager
 from aiogram import Bot
 
-from config import DB_PATH
+import config
+from config import (
+    DB_POOL_READERS,
+    DB_BUSY_TIMEOUT_MS,
+    DB_MMAP_SIZE,
+    DB_CACHE_SIZE,
+)
+from migrations import MIGRATIONS
+from admin_cache import admin_cache
+from metrics import DB_POOL_READERS_IDLE, DB_POOL_WAIT, DB_POOL_WRITER_BUSY
 
 logger = logging.getLogger(__name__)
 
-DB_VERSION = 1  # Версия схемы базы данных
+DB_VERSION = MIGRATIONS[-1][0]  # Версия схемы базы данных (последняя миграция)
+
+# PRAGMA, выставляемые на каждом соединении пула.
+# WAL позволяет читателям (/report, проверка отчетов) не блокировать писателя,
+# а synchronous=NORMAL в режиме WAL убирает fsync на каждый commit.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}",
+    f"PRAGMA mmap_size = {DB_MMAP_SIZE}",
+    f"PRAGMA cache_size = {DB_CACHE_SIZE}",
+)
+
+
+class ConnectionPool:
+    """
+    Пул долгоживущих соединений aiosqlite: один писатель и N читателей
+
+    Соединения открываются один раз при старте бота (main.main) и
+    переиспользуются всеми модулями вместо aiosqlite.connect() на каждый запрос.
+    Писатель один — SQLite всё равно допускает только одну пишущую транзакцию,
+    поэтому запись сериализуется через asyncio.Lock, а не через блокировки файла.
+    """
+
+    def __init__(self, readers=DB_POOL_READERS):
+        self.readers_count = max(1, readers)
+        self.path = None
+        self._writer = None
+        self._writer_lock = asyncio.Lock()
+        self._readers = []
+        self._idle_readers = None
+        # Статистика пула
+        self._acquired = {"writer": 0, "reader": 0}
+        self._waited = {"writer": 0, "reader": 0}
+        self._wait_total = {"writer": 0.0, "reader": 0.0}
+        self._wait_max = {"writer": 0.0, "reader": 0.0}
+
+    @property
+    def is_open(self):
+        return self._writer is not None
+
+    async def _connect(self):
+        """Открывает одно соединение с базой и настраивает PRAGMA"""
+        # uri=True: архивы подключаются через ATTACH 'file:...?mode=ro' (обычный путь работает как раньше)
+        conn = await aiosqlite.connect(self.path, uri=True)
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+        return conn
+
+    async def open(self, path=None):
+        """
+        Открывает соединения пула
+
+        Args:
+            path: Путь к базе данных (по умолчанию config.DB_PATH)
+        """
+        if self.is_open:
+            return
+        self.path = path or config.DB_PATH
+        self._writer = await self._connect()
+        self._idle_readers = asyncio.Queue()
+        for _ in range(self.readers_count):
+            conn = await self._connect()
+            await conn.execute("PRAGMA query_only = ON")
+            self._readers.append(conn)
+            self._idle_readers.put_nowait(conn)
+        logger.info(f"Пул соединений открыт: {self.path} (1 писатель, {self.readers_count} читателей)")
+
+    async def close(self):
+        """Закрывает все соединения пула"""
+        if not self.is_open:
+            return
+        stats = self.stats()
+        async with self._writer_lock:
+            await self._writer.close()
+            self._writer = None
+        for conn in self._readers:
+            await conn.close()
+        self._readers = []
+        self._idle_readers = None
+        logger.info(f"Пул соединений закрыт. Статистика: {stats}")
+
+    async def create_function(self, name, nargs, func):
+        """Регистрирует SQL-функцию на всех соединениях пула"""
+        self._ensure_open()
+        for conn in [self._writer, *self._readers]:
+            await conn.create_function(name, nargs, func, deterministic=True)
+
+    def _record_wait(self, kind, started):
+        waited = time.perf_counter() - started
+        self._acquired[kind] += 1
+        if waited > 0.001:
+            self._waited[kind] += 1
+        self._wait_total[kind] += waited
+        self._wait_max[kind] = max(self._wait_max[kind], waited)
+        DB_POOL_WAIT.observe(waited, role=kind)
+
+    def _ensure_open(self):
+        if not self.is_open:
+            raise RuntimeError("Пул соединений с БД не открыт (вызовите pool.open())")
+
+    @asynccontextmanager
+    async def writer(self):
+        """
+        Захватывает единственное пишущее соединение
+
+        При исключении незавершенная транзакция откатывается,
+        при нормальном выходе — фиксируется, если вызывающий забыл commit().
+        """
+        self._ensure_open()
+        started = time.perf_counter()
+        async with self._writer_lock:
+            self._record_wait("writer", started)
+            db = self._writer
+            try:
+                yield db
+            except BaseException:
+                if db.in_transaction:
+                    await db.rollback()
+                raise
+            else:
+                if db.in_transaction:
+                    await db.commit()
+
+    @asynccontextmanager
+    async def reader(self):
+        """Берет из пула свободное соединение только для чтения"""
+        self._ensure_open()
+        started = time.perf_counter()
+        db = await self._idle_readers.get()
+        self._record_wait("reader", started)
+        try:
+            yield db
+        finally:
+            if db.in_transaction:
+                await db.rollback()
+            self._idle_readers.put_nowait(db)
+
+    def stats(self):
+        """Возвращает статистику использования пула"""
+        idle = self._idle_readers.qsize() if self._idle_readers is not None else 0
+        return {
+            "open": self.is_open,
+            "readers": len(self._readers),
+            "readers_idle": idle,
+            "writer_busy": self._writer_lock.locked(),
+            "acquired": dict(self._acquired),
+            "waited": dict(self._waited),
+            "wait_total_ms": {k: round(v * 1000, 2) for k, v in self._wait_total.items()},
+            "wait_max_ms": {k: round(v * 1000, 2) for k, v in self._wait_max.items()},
+        }
+
+
+# Глобальный пул соединений (открывается в main.main)
+pool = ConnectionPool()
+DB_POOL_READERS_IDLE.set_function(lambda: pool.stats()["readers_idle"])
+DB_POOL_WRITER_BUSY.set_function(lambda: int(pool.stats()["writer_busy"]))
+
+
+async def get_schema_version(db):
+    """Возвращает текущую версию схемы (0 для пустой базы)"""
+    cursor = await db.execute("SELECT MAX(version) FROM schema_version")
+    row = await cursor.fetchone()
+    return row[0] or 0
+
+
+async def apply_migrations(db, migrations=MIGRATIONS):
+    """
+    Применяет недостающие миграции по порядку
+
+    Каждая миграция выполняется в отдельной транзакции вместе с записью
+    своей версии в schema_version: при ошибке откатывается только она,
+    а уже примененные миграции остаются на месте.
+
+    Returns:
+        int: Версия схемы после применения миграций
+    """
+    current_version = await get_schema_version(db)
+    for version, description, steps in migrations:
+        if version <= current_version:
+            continue
+        logger.info(f"Применяю миграцию {version}: {description}")
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            for step in steps:
+                if callable(step):
+                    await step(db)
+                else:
+                    await db.execute(step)
+            await db.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.error(f"Ошибка миграции {version}, изменения откатаны", exc_info=True)
+            raise
+        current_version = version
+    return current_version
+
 
 async def init_db():
-    """Инициализация базы данных с версионированием и индексами"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    """Инициализация базы данных: таблица версий и миграции схемы"""
+    async with pool.writer() as db:
         logger.info("Инициализация базы данных...")
         
         # Создаем таблицу версий схемы
@@ -20,107 +229,45 @@ async def init_db():
             applied_at TEXT DEFAULT CURRENT_TIMESTAMP
         );
         """)
+        await db.commit()
         
-        # Всегда создаем таблицы (IF NOT EXISTS безопасен)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS chats (
-            chat_id INTEGER PRIMARY KEY,
-            chat_title TEXT,
-            daily_time TEXT
-        );
-        """)
-        
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS participants (
-            chat_id INTEGER,
-            user_id INTEGER,
-            username TEXT,
-            active BOOLEAN DEFAULT TRUE,
-            is_admin BOOLEAN DEFAULT FALSE,
-            PRIMARY KEY (chat_id, user_id)
-        );
-        """)
-        
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS daily_reports (
-            chat_id INTEGER,
-            user_id INTEGER,
-            date TEXT,
-            reply_to_message_id INTEGER,
-            message_id INTEGER,
-            text TEXT,
-            created_at TEXT,
-            PRIMARY KEY (chat_id, user_id, date)
-        );
-        """)
-        
-        # Создаем индексы для оптимизации запросов
-        await db.execute("""
-        CREATE INDEX IF NOT EXISTS idx_daily_reports_date 
-        ON daily_reports(chat_id, date)
-        """)
-        
-        await db.execute("""
-        CREATE INDEX IF NOT EXISTS idx_participants_active 
-        ON participants(chat_id, active)
-        """)
-        
-        await db.execute("""
-        CREATE INDEX IF NOT EXISTS idx_participants_username 
-        ON participants(chat_id, username)
-        """)
-        
-        # Проверяем/обновляем версию схемы
-        cursor = await db.execute("SELECT version FROM schema_version ORDER BY version DESC LIMIT 1")
-        row = await cursor.fetchone()
-        current_version = row[0] if row else 0
-        
+        current_version = await get_schema_version(db)
         if current_version < DB_VERSION:
             logger.info(f"Обновление схемы БД с версии {current_version} до {DB_VERSION}")
-            if current_version == 0:
-                await db.execute("INSERT INTO schema_version (version) VALUES (?)", (DB_VERSION,))
-            else:
-                await db.execute("INSERT INTO schema_version (version) VALUES (?)", (DB_VERSION,))
+            await apply_migrations(db)
             logger.info(f"✅ База данных успешно инициализирована (версия {DB_VERSION})")
         else:
             logger.info(f"База данных актуальна (версия {current_version})")
-        
-        await db.commit()
 
 async def ensure_admins_in_db(bot: Bot, chat_id):
     """Убедиться что все админы чата есть в базе participants"""
+    # participant_cache и storage сами импортируют db, поэтому импортируем здесь
+    from participant_cache import participant_cache
+    from storage import storage
     try:
-        admins = await bot.get_chat_administrators(chat_id)
-        async with aiosqlite.connect(DB_PATH) as db:
-            added = 0
-            updated = 0
-            for admin in admins:
-                user = admin.user
-                cursor = await db.execute(
-                    "SELECT active FROM participants WHERE chat_id = ? AND user_id = ?",
-                    (chat_id, user.id)
-                )
-                row = await cursor.fetchone()
-                if row is not None:
-                    await db.execute(
-                        "UPDATE participants SET username = ?, is_admin = True WHERE chat_id = ? AND user_id = ?",
-                        (user.username or user.full_name, chat_id, user.id)
-                    )
-                    updated += 1
-                else:
-                    await db.execute(
-                        "INSERT INTO participants (chat_id, user_id, username, active, is_admin) VALUES (?, ?, ?, ?, ?)",
-                        (
-                            chat_id,
-                            user.id,
-                            user.username or user.full_name,
-                            False,
-                            True
-                        )
-                    )
-                    added += 1
-            await db.commit()
-            if added > 0 or updated > 0:
-                logger.info(f"Синхронизация админов для чата {chat_id}: добавлено {added}, обновлено {updated}")
+        admins = await admin_cache.get_admins(bot, chat_id)
+        # Пишем только тех админов, кого нет в базе или у кого изменилось имя/флаг
+        changes = []
+        for admin in admins:
+            user = admin.user
+            username = user.username or user.full_name
+            participant = await participant_cache.get(chat_id, user.id)
+            if participant is None or participant.username != username or not participant.is_admin:
+                changes.append((user.id, username, participant is not None))
+        if not changes:
+            return
+
+        await storage.participants.upsert_admins(
+            chat_id, [(user_id, username) for user_id, username, _ in changes]
+        )
+
+        added = 0
+        for user_id, username, exists in changes:
+            if exists:
+                participant_cache.update(chat_id, user_id, username=username, is_admin=True)
+            else:
+                participant_cache.add(chat_id, user_id, username, active=False, is_admin=True)
+                added += 1
+        logger.info(f"Синхронизация админов для чата {chat_id}: добавлено {added}, обновлено {len(changes) - added}")
     except Exception as e:
-        logger.error(f"Ошибка при синхронизации админов для чата {chat_id}: {e}") 
\ No newline at end of file
+        logger.error(f"Ошибка при синхронизации админов для чата {chat_id}: {e}")
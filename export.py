@@ -0,0 +1,91 @@
+"""
+Выгрузка отчетов чата за период в CSV или JSONL
+
+Строки читаются из daily_reports пачками по EXPORT_BATCH_SIZE через курсор
+хранилища и сразу пишутся в SpooledTemporaryFile: до EXPORT_SPOOL_MAX_BYTES
+файл лежит в памяти, дальше — на диске. Отправляется он тоже по частям
+(SpooledInputFile), поэтому расход памяти не зависит от объема истории.
+"""
+import csv
+import io
+import json
+import logging
+import tempfile
+
+from aiogram.types import InputFile
+
+from config import EXPORT_BATCH_SIZE, EXPORT_SPOOL_MAX_BYTES
+from storage import storage
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl")
+COLUMNS = ("date", "user_id", "username", "text", "created_at")
+
+
+class SpooledInputFile(InputFile):
+    """Файл для send_document, читаемый из временного файла по частям"""
+
+    def __init__(self, file, filename, chunk_size=64 * 1024):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot):
+        # С начала: при повторе после flood control файл отправляется заново
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+
+
+def _write_csv(text, rows):
+    csv.writer(text).writerows(rows)
+
+
+def _write_jsonl(text, rows):
+    for row in rows:
+        text.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False))
+        text.write("\n")
+
+
+async def export_reports(chat_id, date_from, date_to, fmt="csv",
+                         batch_size=EXPORT_BATCH_SIZE, spool_max_bytes=EXPORT_SPOOL_MAX_BYTES):
+    """
+    Выгружает отчеты чата за период [date_from, date_to] во временный файл
+
+    Args:
+        chat_id: ID чата
+        date_from: Первая дата периода (YYYY-MM-DD)
+        date_to: Последняя дата периода (YYYY-MM-DD)
+        fmt: "csv" или "jsonl"
+
+    Returns:
+        tuple: (SpooledTemporaryFile с выгрузкой, количество отчетов);
+        файл закрывает вызывающий
+
+    Raises:
+        ValueError: если формат не поддерживается
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    file = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes)
+    # utf-8-sig: Excel открывает CSV с кириллицей без ручного выбора кодировки
+    text = io.TextIOWrapper(file, encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="")
+    count = 0
+    try:
+        if fmt == "csv":
+            csv.writer(text).writerow(COLUMNS)
+        write = _write_csv if fmt == "csv" else _write_jsonl
+        async for rows in storage.reports.stream_range(chat_id, date_from, date_to, batch_size):
+            write(text, rows)
+            count += len(rows)
+        text.flush()
+    except BaseException:
+        text.close()
+        raise
+    # Обертка больше не нужна: отсоединяем ее, чтобы она не закрыла файл
+    text.detach()
+    logger.info(
+        f"Выгрузка {fmt} чата {chat_id} за {date_from}..{date_to}: {count} отчетов, "
+        f"{file.tell()} байт"
+    )
+    return file, count
@@ -8,9 +8,10 @@
 from . import admin
 from . import reports
 from . import common
+from . import members
 from . import daily
 
-__all__ = ['admin', 'reports', 'common', 'daily']
+__all__ = ['admin', 'reports', 'common', 'members', 'daily']
 
 
 
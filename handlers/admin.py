@@ -3,14 +3,21 @@
 """
 import asyncio
 import logging
-import aiosqlite
 from aiogram.types import Message
 from aiogram.filters import Command, CommandObject
 
-from config import DB_PATH, DAILY_TEXT, CLEANUP_MESSAGE_SECONDS
+from config import TIMEZONE, DAILY_TEXT, CLEANUP_MESSAGE_SECONDS, CALENDAR_DEFAULT_COUNTRY, STATS_MESSAGE_MAX_CHARS
 from bot_instance import bot, dp
 from db import ensure_admins_in_db
-from scheduler_tasks import schedule_all_dailies
+from storage import storage
+from admin_cache import admin_cache
+from calendar_service import calendar_service
+from participant_cache import participant_cache
+from scheduler_tasks import normalize_daily_time, reschedule_chat_daily
+from sender import gateway
+from mentions import split_parts
+from message_index import message_index, KIND_DAILY
+from timezones import chat_timezones, is_valid_timezone, local_now
 from utils import delete_later
 
 logger = logging.getLogger(__name__)
@@ -21,49 +28,37 @@ async def cmd_start(message: Message):
     """Инициализация бота в группе - добавление чата и админов в БД"""
     # Проверяем, что команда написана в групповом чате
     if message.chat.type not in ("group", "supergroup"):
-        await message.answer("Эта команда работает только в групповых чатах.")
+        await gateway.answer(message, "Эта команда работает только в групповых чатах.")
         return
 
-    # Получаем список админов чата
-    admins = await bot.get_chat_administrators(message.chat.id)
-    admin_ids = [admin.user.id for admin in admins]
+    # Получаем список админов чата (из кэша)
+    admins = await admin_cache.get_admins(bot, message.chat.id)
 
     # Проверяем, что пользователь — админ чата
-    if message.from_user.id not in admin_ids:
-        await message.answer("Только админ чата может запускать бота.")
+    if not await admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
+        await gateway.answer(message, "Только админ чата может запускать бота.")
         return
     
     # Добавляем чат в базу (если ещё не добавлен)
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT OR IGNORE INTO chats (chat_id, chat_title, daily_time) VALUES (?, ?, ?)",
-            (message.chat.id, message.chat.title, None)
+    await storage.chats.add(message.chat.id, message.chat.title)
+    # Получаем чат из базы для проверки и выводим в лог
+    logger.info(f"Чат из базы: {await storage.chats.get(message.chat.id)}")
+
+    # Добавляем всех админов как участников
+    # (active=False — админы по умолчанию не в активных, чтобы не получать напоминания)
+    await storage.participants.add_admins(
+        message.chat.id,
+        [(admin.user.id, admin.user.username or admin.user.full_name) for admin in admins]
+    )
+    added = len(admins)
+    for admin in admins:
+        participant_cache.add(
+            message.chat.id, admin.user.id, admin.user.username or admin.user.full_name,
+            active=False, is_admin=True
         )
-        await db.commit()
-        # Получаем чат из базы для проверки и выводим в лог
-        async with db.execute("SELECT * FROM chats WHERE chat_id = ?", (message.chat.id,)) as cursor:
-            row = await cursor.fetchone()
-            logger.info(f"Чат из базы: {row}")
-        
-        # Добавляем всех админов как участников (active=False, is_admin=True)
-        added = 0
-        async with aiosqlite.connect(DB_PATH) as db:
-            for admin in admins:
-                await db.execute(
-                    "INSERT OR IGNORE INTO participants (chat_id, user_id, username, active, is_admin) VALUES (?, ?, ?, ?, ?)",
-                    (
-                        message.chat.id,
-                        admin.user.id,
-                        admin.user.username or admin.user.full_name,
-                        False,  # админы по умолчанию не в активных, чтобы не получать напоминания
-                        True,
-                    )
-                )
-                added += 1
-            await db.commit()
-        logger.info(f"Добавлено админов в чат {message.chat.id}: {added}")
+    logger.info(f"Добавлено админов в чат {message.chat.id}: {added}")
 
-    await message.answer("Бот успешно активирован! (пока только тест)")
+    await gateway.answer(message, "Бот успешно активирован! (пока только тест)")
 
 
 @dp.message(Command("settime"))
@@ -71,63 +66,121 @@ async def cmd_settime(message: Message, command: CommandObject):
     """Установка времени ежедневной рассылки дэйликов"""
     # Проверка: только для группы
     if message.chat.type not in ("group", "supergroup"):
-        await message.answer("Эта команда только для групп.")
+        await gateway.answer(message, "Эта команда только для групп.")
         return
 
     # Проверка: только для админа
-    admins = await bot.get_chat_administrators(message.chat.id)
-    admin_ids = [admin.user.id for admin in admins]
-    if message.from_user.id not in admin_ids:
-        await message.answer("Только админ может менять время рассылки.")
+    if not await admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
+        await gateway.answer(message, "Только админ может менять время рассылки.")
         return
 
+    tz = await chat_timezones.get(message.chat.id)
+
     # Проверяем аргумент (время)
     if not command.args:
-        await message.answer("Укажи время в формате HH:MM по московскому времени (МСК), например: /settime 10:00")
+        await gateway.answer(message, f"Укажи время в формате HH:MM по времени чата ({tz}), например: /settime 10:00")
         return
 
-    time_str = command.args.strip()
-    # Простейшая валидация формата времени
+    # Валидация и нормализация формата времени (9:5 -> 09:05)
     try:
-        hour, minute = map(int, time_str.split(":"))
-        assert 0 <= hour < 24 and 0 <= minute < 60
+        time_str = normalize_daily_time(command.args)
     except Exception:
-        await message.answer("Некорректный формат. Используй: /settime 10:00 (время по МСК)")
+        await gateway.answer(message, f"Некорректный формат. Используй: /settime 10:00 (время по {tz})")
         return
 
-    # Сохраняем в базу
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE chats SET daily_time = ? WHERE chat_id = ?",
-            (time_str, message.chat.id)
-        )
-        await db.commit()
+    # Сохраняем в базу, запоминая прежнее время
+    previous = await storage.chats.set_daily_time(message.chat.id, time_str)
+    if previous is None:
+        # Чата нет в базе: задачу рассылки не создаем
+        await gateway.answer(message, "Чат не зарегистрирован. Сначала выполните /start.")
+        return
+    old_time, = previous
     
-    await message.answer(f"✅ Время ежедневной рассылки установлено на {time_str} (МСК).\nДэйлик будет отправляться автоматически каждый рабочий день.")
-    await schedule_all_dailies()
+    await gateway.answer(message, f"✅ Время ежедневной рассылки установлено на {time_str} ({tz}).\nДэйлик будет отправляться автоматически каждый рабочий день.")
+    await reschedule_chat_daily(old_time, time_str, tz, tz)
 
     logger.info(f"Чат {message.chat.id}: daily_time обновлено на {time_str}")
 
 
+@dp.message(Command("settz"))
+async def cmd_settz(message: Message, command: CommandObject):
+    """Установка часового пояса чата (время рассылки и даты отчетов)"""
+    if message.chat.type not in ("group", "supergroup"):
+        await gateway.answer(message, "Эта команда только для групп.")
+        return
+
+    if not await admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
+        await gateway.answer(message, "Только админ может менять часовой пояс.")
+        return
+
+    if not command.args:
+        await gateway.answer(message, f"Укажи часовой пояс IANA, например: /settz Asia/Yekaterinburg (по умолчанию {TIMEZONE})")
+        return
+
+    tz = command.args.strip()
+    if not is_valid_timezone(tz):
+        await gateway.answer(message, "Неизвестный часовой пояс. Примеры: Europe/Moscow, Asia/Novosibirsk, Europe/Berlin")
+        return
+
+    # Сохраняем в базу, запоминая прежний пояс и время рассылки
+    previous = await storage.chats.set_timezone(message.chat.id, tz)
+    if previous is None:
+        # Чата нет в базе: кэш поясов и задачи рассылки не трогаем
+        await gateway.answer(message, "Чат не зарегистрирован. Сначала выполните /start.")
+        return
+    daily_time, old_tz = previous
+    chat_timezones.set(message.chat.id, tz)
+
+    old_tz = old_tz or TIMEZONE
+    await reschedule_chat_daily(daily_time, daily_time, old_tz, tz)
+
+    await gateway.answer(message, f"✅ Часовой пояс чата: {tz}. Время рассылки и даты отчетов считаются по нему.")
+    logger.info(f"Чат {message.chat.id}: timezone обновлено на {tz}")
+
+
+@dp.message(Command("setcountry"))
+async def cmd_setcountry(message: Message, command: CommandObject):
+    """Выбор производственного календаря (страны), по которому пропускаются выходные"""
+    if message.chat.type not in ("group", "supergroup"):
+        await gateway.answer(message, "Эта команда только для групп.")
+        return
+
+    if not await admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
+        await gateway.answer(message, "Только админ может менять календарь.")
+        return
+
+    if not command.args:
+        await gateway.answer(message, f"Укажи код страны, например: /setcountry {CALENDAR_DEFAULT_COUNTRY}")
+        return
+
+    country = command.args.strip().upper()
+    if not calendar_service.supports(country):
+        await gateway.answer(message, f"Календарь для страны {country} не найден. Используй двухбуквенный код ISO, например: BY, KZ, RU")
+        return
+
+    await storage.chats.set_country(message.chat.id, country)
+
+    await gateway.answer(message, f"✅ Дэйлик будет пропускать выходные и праздники по календарю {country}.")
+    logger.info(f"Чат {message.chat.id}: country обновлено на {country}")
+
+
 @dp.message(Command("testdaily"))
 async def cmd_testdaily(message: Message):
     """Тестовая отправка дэйлика немедленно"""
     # Проверяем, что команда написана в групповом чате
     if message.chat.type not in ("group", "supergroup"):
-        await message.answer("Эта команда работает только в групповых чатах.")
+        await gateway.answer(message, "Эта команда работает только в групповых чатах.")
         return
 
-    # Получаем список админов чата
-    admins = await bot.get_chat_administrators(message.chat.id)
-    admin_ids = [admin.user.id for admin in admins]
-
     # Проверяем, что пользователь — админ чата
-    if message.from_user.id not in admin_ids:
-        await message.answer("Только админ чата может отправлять дэйлик.")
+    if not await admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
+        await gateway.answer(message, "Только админ чата может отправлять дэйлик.")
         return
 
-    # Отправляем дэйлик
-    sent = await message.answer(DAILY_TEXT)
+    # Отправляем дэйлик и запоминаем его, чтобы ответы засчитывались как отчеты за сегодня
+    sent = await gateway.answer(message, DAILY_TEXT)
+    date_today = local_now(await chat_timezones.get(message.chat.id)).strftime("%Y-%m-%d")
+    await message_index.record(message.chat.id, sent.message_id, KIND_DAILY, date_today)
     logger.info(f"Тестовый дэйлик отправлен в чат {message.chat.id}")
 
 
@@ -139,19 +192,17 @@ async def cmd_exclude(message: Message, command: CommandObject):
     
     # Проверка: только в группе
     if message.chat.type not in ("group", "supergroup"):
-        await message.answer("Эта команда только для групп.")
+        await gateway.answer(message, "Эта команда только для групп.")
         return
 
     # Проверка: только админ может использовать
-    admins = await bot.get_chat_administrators(message.chat.id)
-    admin_ids = [admin.user.id for admin in admins]
-    if message.from_user.id not in admin_ids:
-        await message.answer("Только админ может исключать участников.")
+    if not await admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
+        await gateway.answer(message, "Только админ может исключать участников.")
         return
 
     # Получаем аргумент команды
     if not command.args:
-        await message.answer("Укажи username или user_id (например: /exclude @username или /exclude 123456789).")
+        await gateway.answer(message, "Укажи username или user_id (например: /exclude @username или /exclude 123456789).")
         return
 
     arg = command.args.strip()
@@ -163,28 +214,19 @@ async def cmd_exclude(message: Message, command: CommandObject):
     else:
         username = arg.lstrip("@")
         # Ищем user_id по username
-        async with aiosqlite.connect(DB_PATH) as db:
-            cursor = await db.execute(
-                "SELECT user_id FROM participants WHERE chat_id = ? AND username = ?",
-                (message.chat.id, username)
-            )
-            row = await cursor.fetchone()
-            if row:
-                user_id = row[0]
+        participant = await participant_cache.find_by_username(message.chat.id, username)
+        if participant:
+            user_id = participant.user_id
 
     if not user_id:
-        await message.answer("Пользователь не найден в базе.")
+        await gateway.answer(message, "Пользователь не найден в базе.")
         return
 
     # Делаем active = False (исключаем из списка)
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE participants SET active = False WHERE chat_id = ? AND user_id = ?",
-            (message.chat.id, user_id)
-        )
-        await db.commit()
+    await storage.participants.set_active(message.chat.id, user_id, False)
+    participant_cache.update(message.chat.id, user_id, active=False)
 
-    await message.answer(f"Пользователь с user_id {user_id} больше не будет получать напоминания о дэйлике.")
+    await gateway.answer(message, f"Пользователь с user_id {user_id} больше не будет получать напоминания о дэйлике.")
     logger.info(f"Пользователь {user_id} исключен из активных в чате {message.chat.id}")
 
 
@@ -195,17 +237,15 @@ async def cmd_include(message: Message, command: CommandObject):
     await ensure_admins_in_db(bot, message.chat.id)
     
     if message.chat.type not in ("group", "supergroup"):
-        await message.answer("Эта команда только для групп.")
+        await gateway.answer(message, "Эта команда только для групп.")
         return
 
-    admins = await bot.get_chat_administrators(message.chat.id)
-    admin_ids = [admin.user.id for admin in admins]
-    if message.from_user.id not in admin_ids:
-        await message.answer("Только админ может возвращать участников.")
+    if not await admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
+        await gateway.answer(message, "Только админ может возвращать участников.")
         return
 
     if not command.args:
-        await message.answer("Укажи username или user_id (например: /include @username или /include 123456789).")
+        await gateway.answer(message, "Укажи username или user_id (например: /include @username или /include 123456789).")
         return
 
     arg = command.args.strip()
@@ -217,65 +257,53 @@ async def cmd_include(message: Message, command: CommandObject):
     else:
         username = arg.lstrip("@")
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        # 1. Пытаемся найти в базе
-        if user_id:
-            cursor = await db.execute(
-                "SELECT user_id, username FROM participants WHERE chat_id = ? AND user_id = ?",
-                (message.chat.id, user_id)
-            )
-        else:
-            cursor = await db.execute(
-                "SELECT user_id, username FROM participants WHERE chat_id = ? AND username = ?",
-                (message.chat.id, username)
-            )
-        row = await cursor.fetchone()
-
-        if row:
-            await db.execute(
-                "UPDATE participants SET active = True WHERE chat_id = ? AND user_id = ?",
-                (message.chat.id, row[0])
-            )
-            await db.commit()
-            await message.answer(f"Пользователь с user_id {row[0]} теперь снова в списке активных.")
-            logger.info(f"Пользователь {row[0]} возвращен в активные в чате {message.chat.id}")
-        else:
-            # 2. Пытаемся найти участника через get_chat_member
-            try:
-                member = None
-                if user_id:
-                    member = await bot.get_chat_member(message.chat.id, user_id)
-                elif username:
-                    try:
-                        # get_chat_member работает и по username, если тот уникальный в чате
-                        member = await bot.get_chat_member(message.chat.id, username)
-                    except Exception:
-                        # Если вдруг username не сработал — пробуем собрать всех, у кого username совпадает
-                        chat_adms = await bot.get_chat_administrators(message.chat.id)
-                        for m in chat_adms:
-                            if m.user.username and m.user.username.lower() == username.lower():
-                                member = m
-                                break
-
-                if member:
-                    user_id_to_add = member.user.id
-                    username_to_add = member.user.username
-                    await db.execute(
-                        "INSERT OR REPLACE INTO participants (chat_id, user_id, username, active) VALUES (?, ?, ?, ?)",
-                        (message.chat.id, user_id_to_add, username_to_add, True)
-                    )
-                    await db.commit()
-                    await message.answer(f"Пользователь @{username_to_add or user_id_to_add} добавлен в список активных и теперь должен сдавать отчёты.")
-                    logger.info(f"Пользователь {user_id_to_add} добавлен в активные в чате {message.chat.id}")
-                else:
-                    await message.answer(
-                        "Не удалось найти пользователя в чате.\n"
-                        "Проверь корректность user_id или username и убедись, что пользователь писал в чат.\n"
-                        "Лайфхак: пусть участник просто ответит реплаем на дэйлик, чтобы бот 100% его увидел."
-                    )
-            except Exception as e:
-                logger.error(f"Ошибка при добавлении пользователя в чате {message.chat.id}: {e}")
-                await message.answer(f"Ошибка при добавлении: {e}")
+    # 1. Пытаемся найти в базе (через кэш участников)
+    if user_id:
+        participant = await participant_cache.get(message.chat.id, user_id)
+    else:
+        participant = await participant_cache.find_by_username(message.chat.id, username)
+
+    if participant:
+        await storage.participants.set_active(message.chat.id, participant.user_id, True)
+        participant_cache.update(message.chat.id, participant.user_id, active=True)
+        await gateway.answer(message, f"Пользователь с user_id {participant.user_id} теперь снова в списке активных.")
+        logger.info(f"Пользователь {participant.user_id} возвращен в активные в чате {message.chat.id}")
+    else:
+        # 2. Пытаемся найти участника через get_chat_member
+        # (запросы к Telegram API делаем вне пишущего соединения, чтобы не держать его)
+        try:
+            member = None
+            if user_id:
+                member = await bot.get_chat_member(message.chat.id, user_id)
+            elif username:
+                try:
+                    # get_chat_member работает и по username, если тот уникальный в чате
+                    member = await bot.get_chat_member(message.chat.id, username)
+                except Exception:
+                    # Если вдруг username не сработал — пробуем собрать всех, у кого username совпадает
+                    chat_adms = await admin_cache.get_admins(bot, message.chat.id)
+                    for m in chat_adms:
+                        if m.user.username and m.user.username.lower() == username.lower():
+                            member = m
+                            break
+
+            if member:
+                user_id_to_add = member.user.id
+                username_to_add = member.user.username
+                await storage.participants.replace(message.chat.id, user_id_to_add, username_to_add, active=True)
+                participant_cache.put(message.chat.id, user_id_to_add, username_to_add, active=True)
+                await gateway.answer(message, f"Пользователь @{username_to_add or user_id_to_add} добавлен в список активных и теперь должен сдавать отчёты.")
+                logger.info(f"Пользователь {user_id_to_add} добавлен в активные в чате {message.chat.id}")
+            else:
+                await gateway.answer(
+                    message,
+                    "Не удалось найти пользователя в чате.\n"
+                    "Проверь корректность user_id или username и убедись, что пользователь писал в чат.\n"
+                    "Лайфхак: пусть участник просто ответит реплаем на дэйлик, чтобы бот 100% его увидел."
+                )
+        except Exception as e:
+            logger.error(f"Ошибка при добавлении пользователя в чате {message.chat.id}: {e}")
+            await gateway.answer(message, f"Ошибка при добавлении: {e}")
 
 
 @dp.message(Command("list_active"))
@@ -286,26 +314,19 @@ async def cmd_list_active(message: Message):
     
     # Проверка: только для группы
     if message.chat.type not in ("group", "supergroup"):
-        await message.answer("Эта команда только для групп.")
+        await gateway.answer(message, "Эта команда только для групп.")
         return
 
     # Проверка: только для админа
-    admins = await bot.get_chat_administrators(message.chat.id)
-    admin_ids = [admin.user.id for admin in admins]
-    if message.from_user.id not in admin_ids:
-        await message.answer("Только админ может просматривать список.")
+    if not await admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
+        await gateway.answer(message, "Только админ может просматривать список.")
         return
 
     # Получаем всех активных участников
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT user_id, username FROM participants WHERE chat_id = ? AND active = True",
-            (message.chat.id,)
-        )
-        rows = await cursor.fetchall()
+    rows = await participant_cache.active(message.chat.id)
 
     if not rows:
-        await message.answer("Список активных участников пуст.")
+        await gateway.answer(message, "Список активных участников пуст.")
         return
 
     # Формируем текст ответа
@@ -318,11 +339,11 @@ async def cmd_list_active(message: Message):
 
     # В чате — отправляем только "Результат отправил вам в личку!" и удаляем через 30 мин
     if message.chat.type in ("group", "supergroup"):
-        msg = await message.answer("Результат отправил вам в личку!")
+        msg = await gateway.answer(message, "Результат отправил вам в личку!")
         asyncio.create_task(delete_later(msg, seconds=CLEANUP_MESSAGE_SECONDS))
-        await bot.send_message(message.from_user.id, text)
+        await gateway.send_message(message.from_user.id, text)
     else:
-        await message.answer(text)
+        await gateway.answer(message, text)
 
 
 @dp.message(Command("list_all"))
@@ -333,26 +354,19 @@ async def cmd_list_all(message: Message):
 
     # Проверка: только для группы
     if message.chat.type not in ("group", "supergroup"):
-        await message.answer("Эта команда только для групп.")
+        await gateway.answer(message, "Эта команда только для групп.")
         return
 
     # Проверка: только для админа
-    admins = await bot.get_chat_administrators(message.chat.id)
-    admin_ids = [admin.user.id for admin in admins]
-    if message.from_user.id not in admin_ids:
-        await message.answer("Только админ может просматривать список.")
+    if not await admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
+        await gateway.answer(message, "Только админ может просматривать список.")
         return
 
     # Получаем всех участников чата (active и неактивных)
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT user_id, username, active FROM participants WHERE chat_id = ?",
-            (message.chat.id,)
-        )
-        rows = await cursor.fetchall()
+    rows = await participant_cache.all(message.chat.id)
 
     if not rows:
-        await message.answer("Участников пока нет в базе.")
+        await gateway.answer(message, "Участников пока нет в базе.")
         return
 
     # Формируем текст ответа
@@ -365,12 +379,91 @@ async def cmd_list_all(message: Message):
             text += f"{active_status} user_id: {user_id}\n"
 
     # В чате — только уведомление, сам отчёт шлём в ЛС
-    msg = await message.answer("Отправил список участников вам в личку!")
+    msg = await gateway.answer(message, "Отправил список участников вам в личку!")
     asyncio.create_task(delete_later(msg, seconds=CLEANUP_MESSAGE_SECONDS))
     try:
-        await bot.send_message(message.from_user.id, text)
+        await gateway.send_message(message.from_user.id, text)
     except Exception as e:
         logger.error(f"Не удалось отправить список в ЛС пользователю {message.from_user.id}: {e}")
-        await message.answer(
+        await gateway.answer(
+            message,
             "Не удалось отправить список участников в личку. Напишите боту в ЛС (например, /start), чтобы получать личные сообщения."
         )
+
+
+def format_stats_line(row):
+    """Строка участника в сводке /stats"""
+    user_id, username, reports, expected, missed, streak, best_streak, _, _ = row
+    user_ref = f"@{username}" if username else f"user_id: {user_id}"
+    if not expected:
+        return f"{user_ref} — отчётов: {reports}, проверок ещё не было"
+    done = expected - missed
+    return f"{user_ref} — {done * 100 // expected}% ({done}/{expected}), серия {streak}, рекорд {best_streak}"
+
+
+def format_user_stats(row):
+    """Подробная статистика участника для /stats <user>"""
+    user_id, username, reports, expected, missed, streak, best_streak, last_report, last_checked = row
+    user_ref = f"@{username}" if username else f"user_id: {user_id}"
+    lines = [f"Статистика {user_ref}:"]
+    if expected:
+        done = expected - missed
+        lines.append(f"Сдано в срок: {done} из {expected} ({done * 100 // expected}%)")
+        lines.append(f"Пропусков: {missed}")
+    else:
+        lines.append("Проверок отчётов ещё не было")
+    lines.append(f"Текущая серия: {streak} (рекорд: {best_streak})")
+    lines.append(f"Всего отчётов: {reports}")
+    if last_report:
+        lines.append(f"Последний отчёт: {last_report}")
+    return "\n".join(lines)
+
+
+@dp.message(Command("stats"))
+async def cmd_stats(message: Message, command: CommandObject):
+    """Показать статистику сдачи отчетов по чату или по участнику"""
+    if message.chat.type not in ("group", "supergroup"):
+        await gateway.answer(message, "Эта команда только для групп.")
+        return
+
+    if not await admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
+        await gateway.answer(message, "Только админ может просматривать статистику.")
+        return
+
+    arg = (command.args or "").strip()
+    if arg:
+        # Один участник: @username или user_id
+        if arg.isdigit():
+            user_id = int(arg)
+        else:
+            participant = await participant_cache.find_by_username(message.chat.id, arg.lstrip("@"))
+            user_id = participant.user_id if participant else None
+        row = await storage.compliance.for_user(message.chat.id, user_id) if user_id else None
+        if row is None:
+            await gateway.answer(message, "Статистики по этому участнику пока нет.")
+            return
+        chunks = [format_user_stats(row)]
+    else:
+        rows = await storage.compliance.for_chat(message.chat.id)
+        if not rows:
+            await gateway.answer(message, "Статистики пока нет: она появится после первых отчётов.")
+            return
+        # Длинную сводку делим на сообщения по лимиту Telegram
+        lines = ["Статистика сдачи отчётов (в срок / проверено):"] + [format_stats_line(row) for row in rows]
+        chunks = [
+            "".join(chunk).rstrip("\n")
+            for chunk in split_parts([line + "\n" for line in lines], STATS_MESSAGE_MAX_CHARS)
+        ]
+
+    # В чате — только уведомление, саму статистику шлём в ЛС
+    msg = await gateway.answer(message, "Отправил статистику вам в личку!")
+    asyncio.create_task(delete_later(msg, seconds=CLEANUP_MESSAGE_SECONDS))
+    try:
+        for chunk in chunks:
+            await gateway.send_message(message.from_user.id, chunk)
+    except Exception as e:
+        logger.error(f"Не удалось отправить статистику в ЛС пользователю {message.from_user.id}: {e}")
+        await gateway.answer(
+            message,
+            "Не удалось отправить статистику в личку. Напишите боту в ЛС (например, /start), чтобы получать личные сообщения."
+        )
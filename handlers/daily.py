@@ -4,16 +4,47 @@
 Обработчик ответов на дэйлики
 """
 import logging
-import aiosqlite
-from datetime import datetime
-from pytz import timezone as pytz_timezone
+from datetime import timedelta
 from aiogram.types import Message
 
-from config import DB_PATH, TIMEZONE
+from config import DAILY_TEXT, REMINDER_TEXT
 from bot_instance import bot, dp
+from report_writer import report_writer
+from message_index import message_index, KIND_DAILY, KIND_REMINDER
+from participant_cache import participant_cache
+from timezones import chat_timezones, get_timezone, local_now
 
 logger = logging.getLogger(__name__)
 
+DAILY_PREFIX = DAILY_TEXT.split("\n", 1)[0]
+
+
+async def legacy_daily_date(chat_id, parent):
+    """
+    Дата дэйлика, отправленного до появления индекса сообщений, или None
+
+    Такие дэйлики (и напоминания) узнаются по тексту, как до индекса, если
+    отправлены не раньше срока хранения индекса; найденное сообщение
+    записывается в индекс, и следующие ответы на него находятся поиском.
+    Переходный путь: после MESSAGE_INDEX_RETENTION_DAYS дней с обновления
+    он ничего не находит, и его можно удалить.
+    """
+    text = parent.text or ""
+    if text.startswith(DAILY_PREFIX):
+        kind = KIND_DAILY
+    elif REMINDER_TEXT in text:
+        kind = KIND_REMINDER
+    else:
+        return None
+    tz = await chat_timezones.get(chat_id)
+    sent_at = parent.date.astimezone(get_timezone(tz))
+    if sent_at < local_now(tz) - timedelta(days=message_index.retention_days):
+        return None
+    date_str = sent_at.strftime("%Y-%m-%d")
+    await message_index.record(chat_id, parent.message_id, kind, date_str)
+    logger.info(f"Чат {chat_id}: дэйлик {parent.message_id} за {date_str} добавлен в индекс по тексту")
+    return date_str
+
 
 @dp.message()
 async def handle_reply(message: Message):
@@ -25,77 +56,44 @@ async def handle_reply(message: Message):
     if not message.reply_to_message or message.reply_to_message.from_user.id != bot.id:
         return
     
-    # Разрешаем только reply на дейлик или напоминание
-    parent_text = message.reply_to_message.text or ""
-    if not (
-        parent_text.startswith("Текстовый дейлик:") or
-        "Жду Текстовый Дейлик" in parent_text
-    ):
+    # Разрешаем только reply на дейлик или напоминание: ищем родительское сообщение
+    # в индексе отправленных дэйликов, отчет относится к дате того дэйлика
+    report_date = message_index.lookup(message.chat.id, message.reply_to_message.message_id)
+    if report_date is None:
+        report_date = await legacy_daily_date(message.chat.id, message.reply_to_message)
+    if report_date is None:
         return  # Игнорируем любые другие reply на сообщения бота
     
-    # Открываем соединение один раз на всё
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT * FROM participants WHERE chat_id = ? AND user_id = ?",
-            (message.chat.id, message.from_user.id)
-        )
-        user = await cursor.fetchone()
-        
-        if not user:
-            # Новый участник - добавляем в базу
-            await db.execute(
-                "INSERT INTO participants (chat_id, user_id, username, active) VALUES (?, ?, ?, ?)",
-                (message.chat.id, message.from_user.id, 
-                 message.from_user.username or message.from_user.full_name, True)
-            )
-            await db.commit()
-            logger.info(
-                f"Добавлен новый участник: {message.from_user.username or message.from_user.full_name} "
-                f"(user_id: {message.from_user.id})"
-            )
-        elif user and not user[3]:  # user[3] — это поле active
-            # Участник был неактивен - возвращаем его в активные
-            await db.execute(
-                "UPDATE participants SET active = True WHERE chat_id = ? AND user_id = ?",
-                (message.chat.id, message.from_user.id)
-            )
-            await db.commit()
-            logger.info(
-                f"Участник снова стал активным: {message.from_user.username or message.from_user.full_name} "
-                f"(user_id: {message.from_user.id})"
-            )
-
-        # Сохраняем или обновляем отчет в daily_reports
-        moscow_tz = pytz_timezone(TIMEZONE)
-        today = datetime.now(moscow_tz).strftime("%Y-%m-%d")
-        created_at = datetime.now(moscow_tz).strftime("%Y-%m-%d %H:%M:%S")
-
-        await db.execute(
-            """
-            INSERT INTO daily_reports
-                (chat_id, user_id, date, reply_to_message_id, message_id, text, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(chat_id, user_id, date) DO UPDATE SET
-                reply_to_message_id=excluded.reply_to_message_id,
-                message_id=excluded.message_id,
-                text=excluded.text,
-                created_at=excluded.created_at
-            """,
-            (
-                message.chat.id,
-                message.from_user.id,
-                today,
-                message.reply_to_message.message_id,
-                message.message_id,
-                message.text,
-                created_at
-            )
-        )
-        await db.commit()
-        logger.info(
-            f"Сохранён отчет от {message.from_user.username or message.from_user.full_name} "
-            f"(user_id: {message.from_user.id}) за {today}"
+    username = message.from_user.username or message.from_user.full_name
+    # Время отчета — по местному времени чата (дата уже взята из дэйлика)
+    created_at = local_now(await chat_timezones.get(message.chat.id)).strftime("%Y-%m-%d %H:%M:%S")
+
+    # Участник (новый или неактивный) становится активным, отчет сохраняется или обновляется.
+    # Обе строки уходят в общий буфер и записываются групповым commit вместе
+    # с ответами других участников; await возвращается после фиксации транзакции.
+    # Уже активного участника (по кэшу) не трогаем — пишется только отчет.
+    participant = await participant_cache.get(message.chat.id, message.from_user.id)
+    needs_activation = participant is None or not participant.active
+    await report_writer.save(
+        participant=(message.chat.id, message.from_user.id, username) if needs_activation else None,
+        report=(
+            message.chat.id,
+            message.from_user.id,
+            report_date,
+            message.reply_to_message.message_id,
+            message.message_id,
+            message.text,
+            created_at
         )
+    )
+    if participant is None:
+        participant_cache.add(message.chat.id, message.from_user.id, username, active=True)
+    elif not participant.active:
+        participant_cache.update(message.chat.id, message.from_user.id, active=True)
+    logger.info(
+        f"Сохранён отчет от {username} "
+        f"(user_id: {message.from_user.id}) за {report_date}"
+    )
     
     # Можно добавить реакцию к сообщению пользователя (если всё успешно)
     # await message.reply("✅")
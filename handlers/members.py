@@ -0,0 +1,36 @@
+"""
+Обработчики изменений состава и прав участников чата
+Сбрасывают кэш администраторов при смене статусов
+"""
+import logging
+from aiogram.types import ChatMemberUpdated
+
+from bot_instance import dp
+from admin_cache import admin_cache
+
+logger = logging.getLogger(__name__)
+
+ADMIN_STATUSES = ("creator", "administrator")
+
+
+@dp.my_chat_member()
+async def on_my_chat_member(event: ChatMemberUpdated):
+    """Изменился статус самого бота в чате — список админов мог устареть"""
+    admin_cache.invalidate(event.chat.id)
+    logger.info(
+        f"Статус бота в чате {event.chat.id}: "
+        f"{event.old_chat_member.status} -> {event.new_chat_member.status}"
+    )
+
+
+@dp.chat_member()
+async def on_chat_member(event: ChatMemberUpdated):
+    """Сбрасывает кэш админов, если изменение затронуло права администратора"""
+    old_status = event.old_chat_member.status
+    new_status = event.new_chat_member.status
+    if old_status in ADMIN_STATUSES or new_status in ADMIN_STATUSES:
+        admin_cache.invalidate(event.chat.id)
+        logger.info(
+            f"Изменились права пользователя {event.new_chat_member.user.id} в чате {event.chat.id}: "
+            f"{old_status} -> {new_status}"
+        )
@@ -3,15 +3,19 @@
 """
 import re
 import logging
-import aiosqlite
 from datetime import datetime
-from pytz import timezone as pytz_timezone
-from aiogram.types import Message
+from aiogram.types import CallbackQuery, Message
 from aiogram.filters import Command, CommandObject
 
-from config import DB_PATH, TIMEZONE
 from bot_instance import bot, dp
 from db import ensure_admins_in_db
+from storage import storage
+from admin_cache import admin_cache
+from sender import gateway
+from timezones import chat_timezones, local_now
+from export import FORMATS, SpooledInputFile, export_reports
+from report_pages import ReportPage, render_page
+from search import SearchPage, render_results, search_sessions
 
 logger = logging.getLogger(__name__)
 
@@ -21,22 +25,15 @@ async def cmd_mychats(message: Message):
     """Показать список чатов, где пользователь является участником"""
     # Обрабатываем только в ЛС
     if message.chat.type != "private":
-        await message.answer("Эта команда работает только в личке.")
+        await gateway.answer(message, "Эта команда работает только в личке.")
         return
 
     user_id = message.from_user.id
     # Находим все чаты, где пользователь есть среди админов
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute("""
-            SELECT chats.chat_id, chats.chat_title
-            FROM chats
-            JOIN participants ON chats.chat_id = participants.chat_id
-            WHERE participants.user_id = ? AND participants.active = True
-        """, (user_id,))
-        rows = await cursor.fetchall()
+    rows = await storage.chats.for_member(user_id)
 
     if not rows:
-        await message.answer("Не найдено чатов, где вы были замечены как админ или активный участник.")
+        await gateway.answer(message, "Не найдено чатов, где вы были замечены как админ или активный участник.")
         return
 
     text = "Ваши чаты:\n"
@@ -44,7 +41,7 @@ async def cmd_mychats(message: Message):
         text += f"— {chat_title or 'Без названия'}: `{chat_id}`\n"
 
     text += "\nДля отчёта за сегодня: `/report <chat_id>`\nДля другой даты: `/report <chat_id> YYYY-MM-DD`"
-    await message.answer(text, parse_mode="Markdown")
+    await gateway.answer(message, text, parse_mode="Markdown")
 
 
 @dp.message(Command("report"))
@@ -58,78 +55,167 @@ async def cmd_report(message: Message, command: CommandObject):
         # В ЛС: admin может получить отчёт только по чатам, где он админ
         args = (command.args or "").strip().split()
         if not args:
-            await message.answer("Используй: /report <chat_id> [дата в формате YYYY-MM-DD]")
+            await gateway.answer(message, "Используй: /report <chat_id> [дата в формате YYYY-MM-DD]")
             return
-        chat_id = args[0]
+        if not args[0].lstrip("-").isdigit():
+            await gateway.answer(message, "chat_id — число, например: /report -1001234567890")
+            return
+        chat_id = int(args[0])
         # Проверяем, админ ли пользователь в этом чате
-        async with aiosqlite.connect(DB_PATH) as db:
-            cursor = await db.execute("""
-                SELECT 1 FROM participants
-                WHERE chat_id = ? AND user_id = ? AND active = True AND is_admin = True
-            """, (chat_id, message.from_user.id))
-            is_admin = await cursor.fetchone()
-        if not is_admin:
-            await message.answer("Команда /report доступна только администраторам указанного чата.")
+        if not await storage.participants.is_active_admin(chat_id, message.from_user.id):
+            await gateway.answer(message, "Команда /report доступна только администраторам указанного чата.")
             return
-        date_str = datetime.now(pytz_timezone(TIMEZONE)).strftime("%Y-%m-%d")
+        # "Сегодня" — по местному времени запрошенного чата
+        date_str = local_now(await chat_timezones.get(chat_id)).strftime("%Y-%m-%d")
         if len(args) > 1:
             date_str = args[1]
     else:
         # В группе: admin — это тот, кто сейчас админ через Telegram API
-        chat_id = str(message.chat.id)
+        chat_id = message.chat.id
         args = (command.args or "").strip().split()
         if args:
             date_str = args[0]
         else:
-            date_str = datetime.now(pytz_timezone(TIMEZONE)).strftime("%Y-%m-%d")
+            date_str = local_now(await chat_timezones.get(message.chat.id)).strftime("%Y-%m-%d")
 
-        admins = await bot.get_chat_administrators(message.chat.id)
-        admin_ids = [admin.user.id for admin in admins]
-        if message.from_user.id not in admin_ids:
-            await message.answer("Команда /report доступна только администраторам этого чата.")
+        if not await admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
+            await gateway.answer(message, "Команда /report доступна только администраторам этого чата.")
             return
 
     # Проверка даты
-    if not re.match(r"\d{4}-\d{2}-\d{2}", date_str):
-        await message.answer("Дата в формате YYYY-MM-DD, например: 2024-06-12")
-        return
-
-    # Собираем все отчёты
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute("""
-            SELECT participants.username, participants.user_id, daily_reports.text
-            FROM daily_reports
-            JOIN participants ON
-                daily_reports.chat_id = participants.chat_id AND daily_reports.user_id = participants.user_id
-            WHERE daily_reports.chat_id = ? AND daily_reports.date = ?
-            ORDER BY participants.username, participants.user_id
-        """, (chat_id, date_str))
-        rows = await cursor.fetchall()
-
-    if not rows:
-        await message.answer("Нет отчётов за эту дату.")
+    if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", date_str):
+        await gateway.answer(message, "Дата в формате YYYY-MM-DD, например: 2024-06-12")
         return
 
-    text = f"Отчёты за {date_str}:\n\n"
-    for username, user_id, report in rows:
-        user_ref = f"@{username}" if username else f"user_id: {user_id}"
-        text += f"{user_ref}:\n{report}\n\n"
+    # Первая страница отчётов (остальные строятся по кнопкам)
+    text, markup = await render_page(chat_id, date_str)
+
+    if text is None:
+        await gateway.answer(message, "Нет отчётов за эту дату.")
+        return
 
     # Если команда из ЛС — просто выводим текст. Если в чате — лучше отправить только админу
     if message.chat.type == "private":
-        await message.answer(text)
+        await gateway.answer(message, text, reply_markup=markup)
     else:
-        await message.answer("Отправил вам отчёты в личку.")
-        await bot.send_message(message.from_user.id, text)
+        await gateway.answer(message, "Отправил вам отчёты в личку.")
+        await gateway.send_message(message.from_user.id, text, reply_markup=markup)
     
     logger.info(f"Отчеты за {date_str} отправлены пользователю {message.from_user.id} для чата {chat_id}")
 
 
+@dp.callback_query(ReportPage.filter())
+async def on_report_page(callback: CallbackQuery, callback_data: ReportPage):
+    """Переход между страницами /report"""
+    # Права проверяем на каждой странице: админа могли разжаловать
+    if not await admin_cache.is_admin(bot, callback_data.chat_id, callback.from_user.id):
+        await callback.answer("Отчёты доступны только администраторам чата.", show_alert=True)
+        return
+
+    text, markup = await render_page(
+        callback_data.chat_id,
+        callback_data.date,
+        page=callback_data.page,
+        cursor=callback_data.cursor,
+        back=callback_data.back,
+    )
+    if text is None:
+        await callback.answer("Больше отчётов нет.")
+        return
+    await gateway.call(callback.message.chat.id, lambda: callback.message.edit_text(text, reply_markup=markup))
+    await callback.answer()
+
+
+@dp.message(Command("export"))
+async def cmd_export(message: Message, command: CommandObject):
+    """Выгрузить отчеты чата за период файлом CSV или JSONL"""
+    if message.chat.type != "private":
+        await gateway.answer(message, "Эта команда работает только в личке.")
+        return
+
+    usage = "Используй: /export <chat_id> <с YYYY-MM-DD> <по YYYY-MM-DD> [csv|jsonl]"
+    args = (command.args or "").strip().split()
+    if len(args) not in (3, 4) or not args[0].lstrip("-").isdigit():
+        await gateway.answer(message, usage)
+        return
+    chat_id = int(args[0])
+    date_from, date_to = args[1], args[2]
+    fmt = args[3].lower() if len(args) == 4 else "csv"
+    try:
+        if datetime.strptime(date_from, "%Y-%m-%d") > datetime.strptime(date_to, "%Y-%m-%d"):
+            date_from, date_to = date_to, date_from
+    except ValueError:
+        await gateway.answer(message, "Даты в формате YYYY-MM-DD, например: /export -1001234567890 2025-06-01 2025-06-30")
+        return
+    if fmt not in FORMATS:
+        await gateway.answer(message, usage)
+        return
+
+    if not await storage.participants.is_active_admin(chat_id, message.from_user.id):
+        await gateway.answer(message, "Команда /export доступна только администраторам указанного чата.")
+        return
+
+    file, count = await export_reports(chat_id, date_from, date_to, fmt)
+    try:
+        if not count:
+            await gateway.answer(message, "Нет отчётов за этот период.")
+            return
+        await gateway.send_document(
+            message.chat.id,
+            SpooledInputFile(file, f"reports_{chat_id}_{date_from}_{date_to}.{fmt}"),
+            caption=f"Отчёты за {date_from} — {date_to}: {count}"
+        )
+    finally:
+        file.close()
 
+    logger.info(f"Выгрузка {fmt} за {date_from}..{date_to} отправлена пользователю {message.from_user.id} для чата {chat_id}")
 
 
+@dp.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject):
+    """Найти отчеты чата по словам"""
+    if message.chat.type != "private":
+        await gateway.answer(message, "Эта команда работает только в личке.")
+        return
 
+    args = (command.args or "").strip().split(maxsplit=1)
+    if len(args) != 2 or not args[0].lstrip("-").isdigit():
+        await gateway.answer(message, "Используй: /search <chat_id> <слова для поиска>")
+        return
+    chat_id, query = int(args[0]), args[1]
 
+    if not await storage.participants.is_active_admin(chat_id, message.from_user.id):
+        await gateway.answer(message, "Команда /search доступна только администраторам указанного чата.")
+        return
+
+    search_id = search_sessions.add(chat_id, message.from_user.id, query)
+    text, markup = await render_results(chat_id, query, search_id)
+    if text is None:
+        await gateway.answer(message, "Ничего не найдено.")
+        return
+    await gateway.answer(message, text, parse_mode="HTML", reply_markup=markup)
 
+    logger.info(f"Поиск по чату {chat_id} для пользователя {message.from_user.id}")
 
 
+@dp.callback_query(SearchPage.filter())
+async def on_search_page(callback: CallbackQuery, callback_data: SearchPage):
+    """Переход между страницами результатов /search"""
+    session = search_sessions.get(callback_data.search_id)
+    if session is None or session[1] != callback.from_user.id:
+        await callback.answer("Поиск устарел, повторите /search.", show_alert=True)
+        return
+    chat_id, user_id, query = session
+    if not await storage.participants.is_active_admin(chat_id, user_id):
+        await callback.answer("Поиск доступен только администраторам чата.", show_alert=True)
+        return
+
+    text, markup = await render_results(chat_id, query, callback_data.search_id, callback_data.page)
+    if text is None:
+        await callback.answer("Больше результатов нет.")
+        return
+    await gateway.call(
+        callback.message.chat.id,
+        lambda: callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
+    )
+    await callback.answer()
@@ -3,7 +3,7 @@ Telegram Daily Bot - главный файл запуска
 
 Telegram-бот для автоматизированного сбора ежедневных отчетов (дэйликов) 
 в групповых чатах с расписанием по МСК, уведомлениями неотчитавшихся, 
-управлением участниками и хранением в SQLite.
+управлением участниками и хранением в SQLite или PostgreSQL.
 
 Автор: @Fessan
 """
@@ -11,10 +11,20 @@ Telegram-бот для автоматизированного сбора еже
 import asyncio
 import logging
 
-from config import LOG_FILE, LOG_LEVEL, LOG_FORMAT
-from bot_instance import bot, dp, scheduler, set_event_loop
-from db import init_db
+from config import LOG_FILE, LOG_LEVEL, LOG_FORMAT, BOT_MODE
+from bot_instance import bot, dp, scheduler, set_event_loop, setup_scheduler
+from storage import storage
+from admin_cache import admin_cache
+from participant_cache import participant_cache
+from sender import gateway
+from report_writer import report_writer
+from message_index import message_index
 from scheduler_tasks import schedule_all_dailies
+from archival import schedule_archive
+from webhook import run_webhook
+import metrics
+import sharding
+import tracing
 
 # Импортируем все обработчики (они автоматически регистрируются через декоратор @dp.message)
 import handlers  # noqa: F401
@@ -36,30 +46,61 @@ async def main():
     Главная функция запуска бота
     
     Выполняет:
-    1. Инициализацию базы данных
+    1. Открытие хранилища (SQLite или PostgreSQL) и миграции схемы
     2. Настройку event loop
     3. Запуск планировщика задач
     4. Планирование всех дэйликов
-    5. Запуск polling бота
+    5. Получение обновлений: polling или webhook (BOT_MODE)
     """
+    metrics_runner = None
     try:
-        # Инициализируем базу данных
-        await init_db()
+        # Метрики: перехватчики обработчиков, Bot API и планировщика + HTTP /metrics
+        if metrics.enabled():
+            metrics.install(bot, dp, scheduler)
+            metrics_runner = await metrics.start_server()
+        
+        # Трассировка обновлений и лог медленных (SLOW_UPDATE_MS)
+        if tracing.enabled():
+            tracing.install(bot, dp)
+        
+        # Открываем хранилище (SQLite или PostgreSQL) и применяем миграции схемы
+        await storage.open()
+        
+        # Загружаем индекс отправленных дэйликов (для сопоставления ответов)
+        await message_index.load()
+        
+        # Запускаем буфер групповой записи отчетов
+        report_writer.start()
+        
+        # При шардировании рассылает только держатель аренды своего шарда
+        sharding.check_config()
+        if sharding.enabled():
+            await sharding.shard_lease.acquire()
+            sharding.shard_lease.start()
         
         # Устанавливаем event loop для scheduler
         event_loop = asyncio.get_event_loop()
         set_event_loop(event_loop)
         
-        # Запускаем планировщик
+        # Запускаем планировщик с постоянным хранилищем задач в базе бота
+        setup_scheduler()
         scheduler.start()
         
-        # Планируем все дэйлики из БД
+        # Сверяем расписания дэйликов с БД (задачи сохраняются между перезапусками)
         await schedule_all_dailies()
         
+        # Ежедневный перенос старых отчетов в архив
+        schedule_archive()
+        
         logger.info("✅ Бот успешно запущен! Scheduler работает, жду рассылки...")
         
-        # Запускаем polling
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            # Обновления приходят на встроенный aiohttp-сервер
+            await run_webhook(bot, dp)
+        else:
+            # Снимаем webhook, если бот раньше работал в режиме webhook, иначе getUpdates не работает
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
         
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем (Ctrl+C)")
@@ -68,7 +109,16 @@ async def main():
         raise
     finally:
         logger.info("Завершение работы бота...")
-        scheduler.shutdown()
+        if scheduler.running:
+            scheduler.shutdown()
+        await report_writer.stop()
+        await sharding.shard_lease.release()
+        await storage.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        logger.info(f"Кэш админов: {admin_cache.stats()}")
+        logger.info(f"Кэш участников: {participant_cache.stats()}")
+        logger.info(f"Шлюз отправки: {gateway.stats()}")
         await bot.session.close()
         logger.info("Бот остановлен")
 
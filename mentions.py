@@ -0,0 +1,132 @@
+"""
+Напоминания с упоминаниями участников
+
+Упоминания передаются сущностями text_mention (entities), а не HTML-разметкой:
+Telegram не разбирает текст, а имена не нужно экранировать. Упоминания
+раскладываются по сообщениям жадно, в порядке списка: следующее имя
+добавляется в текущее сообщение, пока текст вместе с подписью помещается в
+MESSAGE_MAX_LENGTH, а упоминаний не больше MAX_MENTIONS_PER_MESSAGE.
+
+Смещения и длины сущностей Telegram считает в единицах UTF-16, поэтому и
+длина текста считается так же (эмодзи в имени — две единицы). Тем же счетом
+split_parts раскладывает по сообщениям длинные ответы (/stats), а fit_parts
+укорачивает отчеты, чтобы страница /report уложилась в лимит.
+"""
+from aiogram.types import MessageEntity, User
+
+from config import MAX_MENTIONS_PER_MESSAGE, MESSAGE_MAX_LENGTH, REMINDER_TEXT
+
+# Максимальная длина имени в упоминании (first_name в Telegram — до 64 символов)
+NAME_MAX_LENGTH = 64
+
+
+def utf16_len(text):
+    """Длина текста в единицах UTF-16"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def truncate(text, max_length, ellipsis="…"):
+    """Обрезает текст до max_length единиц UTF-16, отмечая обрезку многоточием"""
+    if utf16_len(text) <= max_length:
+        return text
+    units = text.encode("utf-16-le")[:max(0, max_length - utf16_len(ellipsis)) * 2]
+    # Половина суррогатной пары на границе отбрасывается
+    return units.decode("utf-16-le", errors="ignore") + ellipsis
+
+
+def fit_parts(parts, max_length=MESSAGE_MAX_LENGTH):
+    """
+    Укорачивает части, чтобы вместе они были не длиннее max_length (UTF-16)
+
+    Короткие части не меняются, длинные обрезаются до общей наибольшей длины,
+    при которой помещаются все части.
+
+    Returns:
+        list: Части в том же порядке
+    """
+    lengths = [utf16_len(part) for part in parts]
+    if sum(lengths) <= max_length:
+        return list(parts)
+    low, high = 0, max(lengths)
+    while low < high:
+        cap = (low + high + 1) // 2
+        if sum(min(length, cap) for length in lengths) <= max_length:
+            low = cap
+        else:
+            high = cap - 1
+    return [truncate(part, low) if length > low else part for part, length in zip(parts, lengths)]
+
+
+def split_parts(parts, max_length=MESSAGE_MAX_LENGTH):
+    """
+    Раскладывает части текста по сообщениям
+
+    Части не разрываются: следующая добавляется в текущее сообщение, пока оно
+    не длиннее max_length единиц UTF-16. Часть длиннее max_length обрезается.
+
+    Args:
+        parts: Части текста (вместе с разделителями) в порядке вывода
+        max_length: Максимальная длина сообщения (UTF-16)
+
+    Returns:
+        list: Сообщения — списки частей
+    """
+    messages = []
+    length = 0
+    for part in parts:
+        part = truncate(part, max_length)
+        part_length = utf16_len(part)
+        if not messages or length + part_length > max_length:
+            messages.append([])
+            length = 0
+        messages[-1].append(part)
+        length += part_length
+    return messages
+
+
+def mention_name(user_id, name):
+    """Имя для упоминания: без переводов строк и лишних пробелов, не длиннее NAME_MAX_LENGTH"""
+    name = " ".join((name or "").split())[:NAME_MAX_LENGTH].strip()
+    return name or f"User {user_id}"
+
+
+def pack_mentions(users, footer=REMINDER_TEXT, max_length=MESSAGE_MAX_LENGTH, max_mentions=MAX_MENTIONS_PER_MESSAGE):
+    """
+    Раскладывает упоминания по сообщениям
+
+    Args:
+        users: Список (user_id, имя) в порядке упоминания
+        footer: Подпись с новой строки после упоминаний
+        max_length: Максимальная длина сообщения (UTF-16)
+        max_mentions: Максимум упоминаний в сообщении
+
+    Returns:
+        list: Сообщения (text, entities) для send_message(..., entities=entities)
+    """
+    tail = f"\n{footer}" if footer else ""
+    tail_length = utf16_len(tail)
+    messages = []
+    parts, entities, length = [], [], 0
+
+    for user_id, name in users:
+        name = mention_name(user_id, name)
+        name_length = utf16_len(name)
+        if entities and (
+            len(entities) >= max_mentions
+            or length + 1 + name_length + tail_length > max_length
+        ):
+            messages.append(("".join(parts) + tail, entities))
+            parts, entities, length = [], [], 0
+        offset = length + 1 if entities else 0
+        parts.append(f" {name}" if entities else name)
+        entities.append(MessageEntity(
+            type="text_mention",
+            offset=offset,
+            length=name_length,
+            user=User(id=user_id, is_bot=False, first_name=name),
+        ))
+        length = offset + name_length
+
+    if entities:
+        messages.append(("".join(parts) + tail, entities))
+    return messages
@@ -0,0 +1,82 @@
+"""
+Индекс отправленных ботом дэйликов и напоминаний
+
+Каждое сообщение с дэйликом или напоминанием записывается в таблицу
+sent_messages и в словарь в памяти (chat_id, message_id) -> дата дэйлика.
+handle_reply определяет, что ответ относится к дэйлику, одним поиском
+по словарю вместо сравнения текста родительского сообщения, и относит отчет
+к дате того дэйлика, на который ответили.
+"""
+import logging
+from datetime import datetime, timedelta
+from pytz import timezone as pytz_timezone
+
+from config import TIMEZONE, MESSAGE_INDEX_RETENTION_DAYS
+from storage import storage
+
+logger = logging.getLogger(__name__)
+
+KIND_DAILY = "daily"
+KIND_REMINDER = "reminder"
+
+
+class MessageIndex:
+    """Индекс сообщений бота, на которые принимаются ответы-отчеты"""
+
+    def __init__(self, retention_days=MESSAGE_INDEX_RETENTION_DAYS):
+        self.retention_days = retention_days
+        self._dates = {}  # (chat_id, message_id) -> "YYYY-MM-DD"
+        self._newest_date = None
+
+    def _cutoff(self, date_str):
+        day = datetime.strptime(date_str, "%Y-%m-%d").date()
+        return (day - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+
+    async def load(self, today=None):
+        """
+        Загружает в память сообщения за последние retention_days дней
+
+        Args:
+            today: Текущая дата YYYY-MM-DD (по умолчанию — сегодня по МСК)
+        """
+        today = today or datetime.now(pytz_timezone(TIMEZONE)).strftime("%Y-%m-%d")
+        rows = await storage.messages.since(self._cutoff(today))
+        self._dates = {(chat_id, message_id): date for chat_id, message_id, date in rows}
+        self._newest_date = max(self._dates.values(), default=None)
+        logger.info(f"Индекс сообщений загружен: {len(self._dates)} дэйликов и напоминаний")
+
+    def _prune(self, date_str):
+        """Выбрасывает из памяти сообщения старше срока хранения"""
+        cutoff = self._cutoff(date_str)
+        before = len(self._dates)
+        self._dates = {key: date for key, date in self._dates.items() if date >= cutoff}
+        if before != len(self._dates):
+            logger.info(f"Индекс сообщений: удалено из памяти {before - len(self._dates)} старых записей")
+
+    async def record(self, chat_id, message_id, kind, date_str):
+        """
+        Запоминает отправленный дэйлик или напоминание
+
+        Args:
+            chat_id: ID чата
+            message_id: ID отправленного сообщения
+            kind: KIND_DAILY или KIND_REMINDER
+            date_str: Дата дэйлика YYYY-MM-DD, к которой относятся ответы
+        """
+        await storage.messages.record(chat_id, message_id, kind, date_str)
+        # Раз в день (с первым сообщением новой даты) чистим память от старых записей
+        if self._newest_date is None or date_str > self._newest_date:
+            self._newest_date = date_str
+            self._prune(date_str)
+        self._dates[(chat_id, message_id)] = date_str
+
+    def lookup(self, chat_id, message_id):
+        """Дата дэйлика, к которому относится сообщение, или None"""
+        return self._dates.get((chat_id, message_id))
+
+    def __len__(self):
+        return len(self._dates)
+
+
+# Глобальный индекс сообщений (загружается в main.main)
+message_index = MessageIndex()
@@ -0,0 +1,370 @@
+"""
+Метрики в формате Prometheus
+
+Легковесный реестр без внешних зависимостей: счетчики и гистограммы с метками
+живут в памяти процесса, а GET /metrics на METRICS_HOST:METRICS_PORT отдает
+их в текстовом формате Prometheus. Сервер и перехватчики включаются в
+main.main, если METRICS_PORT > 0.
+
+Что собирается:
+- bot_handler_duration_seconds, bot_handler_errors_total — обработчики handlers/*
+  (middleware диспетчера);
+- bot_db_query_duration_seconds — запросы репозиториев storage по имени метода;
+- bot_api_requests_total, bot_api_request_duration_seconds — вызовы Bot API
+  (middleware сессии бота) с результатом ok или типом ошибки;
+- bot_scheduler_lag_seconds — опоздание запуска задачи планировщика
+  относительно запланированного времени;
+- bot_reminder_batch_size — число упоминаний в одном напоминании check_daily_reports;
+- bot_db_pool_wait_seconds, bot_db_pool_readers_idle, bot_db_pool_writer_busy —
+  ожидание и занятость соединений пула SQLite (db.ConnectionPool);
+- bot_admin_cache_requests_total, bot_admin_cache_invalidations_total,
+  bot_admin_cache_evictions_total, bot_admin_cache_size — кэш администраторов;
+- bot_send_queue_depth, bot_send_wait_seconds, bot_send_messages_total,
+  bot_send_retries_total — шлюз исходящих сообщений (sender.SendGateway).
+
+Датчики (gauge) с функцией значения считаются в момент запроса /metrics.
+"""
+import functools
+import logging
+import time
+from datetime import datetime, timezone
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from apscheduler.events import EVENT_JOB_SUBMITTED
+
+from config import METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы гистограмм
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+BATCH_BUCKETS = (1, 5, 10, 20, 30, 40, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Метрика с фиксированным набором меток"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидались метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        self._values.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key in sorted(self._values):
+            lines.extend(self._render_value(key, self._values[key]))
+        return lines
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _render_value(self, key, value):
+        yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Gauge(Metric):
+    """Текущее значение; может задаваться функцией, которая вызывается при выводе"""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def set_function(self, func, **labels):
+        """Значение берется из func() при каждом выводе (clear его не сбрасывает)"""
+        self._functions[self._key(labels)] = func
+
+    def value(self, **labels):
+        key = self._key(labels)
+        func = self._functions.get(key)
+        return func() if func is not None else self._values.get(key, 0)
+
+    def render(self):
+        for key, func in self._functions.items():
+            self._values[key] = func()
+        return super().render()
+
+    def _render_value(self, key, value):
+        yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам (в выводе — накопительно, как требует Prometheus)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # [счетчики по корзинам (+ последняя — +Inf), сумма, количество]
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        state[0][index] += 1
+        state[1] += value
+        state[2] += 1
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _render_value(self, key, state):
+        counts, total, count = state
+        cumulative = 0
+        for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+            cumulative += bucket_count
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} {cumulative}"
+        yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+        yield f"{self.name}_count{_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """Сбрасывает значения всех метрик"""
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+registry = Registry()
+
+HANDLER_DURATION = registry.histogram(
+    "bot_handler_duration_seconds", "Время обработки события обработчиком", ["handler"]
+)
+HANDLER_ERRORS = registry.counter(
+    "bot_handler_errors_total", "Исключения в обработчиках", ["handler"]
+)
+DB_QUERY_DURATION = registry.histogram(
+    "bot_db_query_duration_seconds", "Время запроса к хранилищу по методу репозитория", ["query"]
+)
+API_REQUESTS = registry.counter(
+    "bot_api_requests_total", "Вызовы Bot API по методу и результату", ["method", "result"]
+)
+API_DURATION = registry.histogram(
+    "bot_api_request_duration_seconds", "Время вызова Bot API", ["method"]
+)
+SCHEDULER_LAG = registry.histogram(
+    "bot_scheduler_lag_seconds", "Опоздание запуска задачи планировщика", ["job"], buckets=LAG_BUCKETS
+)
+REMINDER_BATCH_SIZE = registry.histogram(
+    "bot_reminder_batch_size", "Упоминаний в одном напоминании о дэйлике", buckets=BATCH_BUCKETS
+)
+DB_POOL_WAIT = registry.histogram(
+    "bot_db_pool_wait_seconds", "Ожидание соединения пула SQLite", ["role"]
+)
+DB_POOL_READERS_IDLE = registry.gauge(
+    "bot_db_pool_readers_idle", "Свободные читающие соединения пула SQLite"
+)
+DB_POOL_WRITER_BUSY = registry.gauge(
+    "bot_db_pool_writer_busy", "Пишущее соединение пула SQLite занято (0 или 1)"
+)
+ADMIN_CACHE_REQUESTS = registry.counter(
+    "bot_admin_cache_requests_total", "Запросы к кэшу администраторов (hit или miss)", ["result"]
+)
+ADMIN_CACHE_INVALIDATIONS = registry.counter(
+    "bot_admin_cache_invalidations_total", "Сбросы кэша администраторов чата"
+)
+ADMIN_CACHE_EVICTIONS = registry.counter(
+    "bot_admin_cache_evictions_total", "Чаты, вытесненные из кэша администраторов по LRU"
+)
+ADMIN_CACHE_SIZE = registry.gauge(
+    "bot_admin_cache_size", "Чатов в кэше администраторов"
+)
+SEND_QUEUE_DEPTH = registry.gauge(
+    "bot_send_queue_depth", "Отправок, ожидающих своей очереди или выполняющихся в шлюзе"
+)
+SEND_WAIT = registry.histogram(
+    "bot_send_wait_seconds", "Ожидание отправки в лимитах шлюза", buckets=LAG_BUCKETS
+)
+SEND_MESSAGES = registry.counter(
+    "bot_send_messages_total", "Отправки через шлюз по результату (sent или failed)", ["result"]
+)
+SEND_RETRIES = registry.counter(
+    "bot_send_retries_total", "Повторы отправки после TelegramRetryAfter"
+)
+
+
+def timed(histogram, **labels):
+    """Декоратор корутины: время выполнения — в гистограмму (в том числе при исключении)"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, **labels)
+        return wrapper
+    return decorator
+
+
+def handler_name(handler_object):
+    """Имя обработчика для метки: модуль.функция"""
+    callback = getattr(handler_object, "callback", None)
+    if callback is None:
+        return "unknown"
+    return f"{callback.__module__}.{callback.__qualname__}"
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware диспетчера: время и ошибки сработавшего обработчика"""
+
+    async def __call__(self, handler, event, data):
+        name = handler_name(data.get("handler"))
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - started, handler=name)
+
+
+class BotApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: число, время и ошибки вызовов Bot API"""
+
+    async def __call__(self, make_request, bot, method):
+        name = getattr(method, "__api_method__", type(method).__name__)
+        started = time.perf_counter()
+        result = "ok"
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            result = type(e).__name__
+            raise
+        finally:
+            API_DURATION.observe(time.perf_counter() - started, method=name)
+            API_REQUESTS.inc(method=name, result=result)
+
+
+def job_kind(job_id):
+    """Вид задачи для метки: daily, check или ID задачи без параметров"""
+    return job_id.split(":", 1)[0]
+
+
+def on_job_submitted(event):
+    """Слушатель планировщика: опоздание запуска относительно плана"""
+    if not event.scheduled_run_times:
+        return
+    lag = (datetime.now(timezone.utc) - event.scheduled_run_times[-1]).total_seconds()
+    SCHEDULER_LAG.observe(max(lag, 0.0), job=job_kind(event.job_id))
+
+
+def enabled():
+    return METRICS_PORT > 0
+
+
+def install(bot, dp, scheduler):
+    """Подключает сбор метрик к диспетчеру, сессии бота и планировщику"""
+    middleware = HandlerMetricsMiddleware()
+    for observer in (dp.message, dp.callback_query, dp.my_chat_member, dp.chat_member):
+        observer.middleware(middleware)
+    bot.session.middleware(BotApiMetricsMiddleware())
+    scheduler.add_listener(on_job_submitted, EVENT_JOB_SUBMITTED)
+
+
+async def handle_metrics(request):
+    return web.Response(body=registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+
+def make_app():
+    """aiohttp-приложение с маршрутом /metrics"""
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+async def start_server(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Запускает HTTP-сервер метрик
+
+    Returns:
+        web.AppRunner: остановить — await runner.cleanup()
+    """
+    runner = web.AppRunner(make_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,337 @@
+"""
+Миграции схемы базы данных
+
+Каждая миграция — кортеж (версия, описание, шаги). Шаг — это SQL-строка
+либо async-функция, принимающая соединение (для миграций данных).
+Миграции применяются строго по возрастанию версии, каждая в своей транзакции
+(см. db.apply_migrations). Новые шаги добавляются только в конец списка,
+уже выпущенные миграции не редактируются.
+
+POSTGRES_MIGRATIONS — та же схема для бэкенда PostgreSQL (storage/postgres.py)
+со своей нумерацией версий: изменение схемы добавляется в оба списка.
+"""
+
+
+MIGRATIONS = [
+    (1, "Базовая схема: chats, participants, daily_reports", [
+        """
+        CREATE TABLE IF NOT EXISTS chats (
+            chat_id INTEGER PRIMARY KEY,
+            chat_title TEXT,
+            daily_time TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS participants (
+            chat_id INTEGER,
+            user_id INTEGER,
+            username TEXT,
+            active BOOLEAN DEFAULT TRUE,
+            is_admin BOOLEAN DEFAULT FALSE,
+            PRIMARY KEY (chat_id, user_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS daily_reports (
+            chat_id INTEGER,
+            user_id INTEGER,
+            date TEXT,
+            reply_to_message_id INTEGER,
+            message_id INTEGER,
+            text TEXT,
+            created_at TEXT,
+            PRIMARY KEY (chat_id, user_id, date)
+        )
+        """,
+        # Индексы для оптимизации запросов
+        """
+        CREATE INDEX IF NOT EXISTS idx_daily_reports_date
+        ON daily_reports(chat_id, date)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_participants_active
+        ON participants(chat_id, active)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_participants_username
+        ON participants(chat_id, username)
+        """,
+    ]),
+    (2, "Время рассылки в формате HH:MM и индекс по нему", [
+        """
+        UPDATE chats SET daily_time = printf(
+            '%02d:%02d',
+            CAST(substr(daily_time, 1, instr(daily_time, ':') - 1) AS INTEGER),
+            CAST(substr(daily_time, instr(daily_time, ':') + 1) AS INTEGER)
+        )
+        WHERE daily_time IS NOT NULL AND instr(daily_time, ':') > 0
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_chats_daily_time
+        ON chats(daily_time)
+        """,
+    ]),
+    (3, "Индекс отправленных дэйликов и напоминаний", [
+        """
+        CREATE TABLE IF NOT EXISTS sent_messages (
+            chat_id INTEGER,
+            message_id INTEGER,
+            kind TEXT,
+            date TEXT,
+            sent_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (chat_id, message_id)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_sent_messages_date
+        ON sent_messages(date)
+        """,
+        # Дэйлики, отправленные до появления индекса, восстанавливаем по уже сданным на них ответам
+        """
+        INSERT OR IGNORE INTO sent_messages (chat_id, message_id, kind, date)
+        SELECT chat_id, reply_to_message_id, 'daily', MIN(date)
+        FROM daily_reports
+        WHERE reply_to_message_id IS NOT NULL
+        GROUP BY chat_id, reply_to_message_id
+        """,
+    ]),
+    (4, "Страна производственного календаря чата", [
+        # NULL — календарь по умолчанию (CALENDAR_DEFAULT_COUNTRY)
+        "ALTER TABLE chats ADD COLUMN country TEXT",
+    ]),
+    (5, "Часовой пояс чата и индекс расписания по (время, пояс)", [
+        # NULL — пояс по умолчанию (TIMEZONE из config)
+        "ALTER TABLE chats ADD COLUMN timezone TEXT",
+        "DROP INDEX IF EXISTS idx_chats_daily_time",
+        """
+        CREATE INDEX IF NOT EXISTS idx_chats_schedule
+        ON chats(daily_time, timezone)
+        """,
+    ]),
+    (6, "Аренда шардов и отметки об отправке дэйликов", [
+        """
+        CREATE TABLE IF NOT EXISTS shard_leases (
+            shard INTEGER PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """,
+        # Одна строка на чат и дату: кто первым вставил, тот и отправляет дэйлик
+        """
+        CREATE TABLE IF NOT EXISTS daily_claims (
+            chat_id INTEGER,
+            date TEXT,
+            owner TEXT,
+            claimed_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (chat_id, date)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_daily_claims_date
+        ON daily_claims(date)
+        """,
+    ]),
+    (7, "Полнотекстовый индекс FTS5 по тексту отчетов", [
+        # external content: индекс хранит только токены, текст берется из daily_reports по rowid
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS daily_reports_fts USING fts5(
+            text,
+            content = 'daily_reports',
+            content_rowid = 'rowid',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS daily_reports_fts_insert AFTER INSERT ON daily_reports BEGIN
+            INSERT INTO daily_reports_fts (rowid, text) VALUES (new.rowid, new.text);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS daily_reports_fts_delete AFTER DELETE ON daily_reports BEGIN
+            INSERT INTO daily_reports_fts (daily_reports_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+        END
+        """,
+        # Повторный ответ за ту же дату (upsert) обновляет текст отчета
+        """
+        CREATE TRIGGER IF NOT EXISTS daily_reports_fts_update AFTER UPDATE OF text ON daily_reports BEGIN
+            INSERT INTO daily_reports_fts (daily_reports_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+            INSERT INTO daily_reports_fts (rowid, text) VALUES (new.rowid, new.text);
+        END
+        """,
+        # Индексируем уже накопленные отчеты
+        "INSERT INTO daily_reports_fts (daily_reports_fts) VALUES ('rebuild')",
+    ]),
+    (8, "Накопительная статистика участников: сдачи отчетов и серии", [
+        # Обновляется инкрементально при сохранении отчета и при проверке отчетов за день
+        # (storage.compliance), /stats читает отсюда, а не из daily_reports
+        """
+        CREATE TABLE IF NOT EXISTS participant_stats (
+            chat_id INTEGER,
+            user_id INTEGER,
+            reports INTEGER NOT NULL DEFAULT 0,
+            expected INTEGER NOT NULL DEFAULT 0,
+            missed INTEGER NOT NULL DEFAULT 0,
+            streak INTEGER NOT NULL DEFAULT 0,
+            best_streak INTEGER NOT NULL DEFAULT 0,
+            broken_streak INTEGER NOT NULL DEFAULT 0,
+            last_report_date TEXT,
+            last_missed_date TEXT,
+            last_checked_date TEXT,
+            PRIMARY KEY (chat_id, user_id)
+        )
+        """,
+        # Число отчетов за уже накопленную историю (пропуски до этой версии не учитывались)
+        """
+        INSERT INTO participant_stats (chat_id, user_id, reports, last_report_date)
+        SELECT chat_id, user_id, COUNT(*), MAX(date) FROM daily_reports WHERE TRUE GROUP BY chat_id, user_id
+        ON CONFLICT DO NOTHING
+        """,
+    ]),
+    (9, "Индекс по дате отчета для переноса старых отчетов в архив", [
+        # archival.py выбирает отчеты всех чатов старше границы: WHERE date < ? ORDER BY date.
+        # Архив есть только у SQLite, поэтому в POSTGRES_MIGRATIONS индекса нет
+        """
+        CREATE INDEX IF NOT EXISTS idx_daily_reports_day
+        ON daily_reports(date)
+        """,
+    ]),
+    (10, "Имя участника из Telegram для напоминаний и время его получения", [
+        # Заполняется проверкой отчетов для участников без username (UTC, YYYY-MM-DD HH:MM:SS)
+        "ALTER TABLE participants ADD COLUMN display_name TEXT",
+        "ALTER TABLE participants ADD COLUMN display_name_at TEXT",
+    ]),
+]
+
+
+# Схема PostgreSQL (STORAGE_BACKEND=postgres, см. storage/postgres.py).
+# Совпадает с последней версией схемы SQLite, но с BIGINT для идентификаторов
+# Telegram и колонкой seq вместо rowid (порядок добавления участников).
+POSTGRES_MIGRATIONS = [
+    (1, "Схема PostgreSQL, соответствующая версии 6 схемы SQLite", [
+        """
+        CREATE TABLE IF NOT EXISTS chats (
+            chat_id BIGINT PRIMARY KEY,
+            chat_title TEXT,
+            daily_time TEXT,
+            country TEXT,
+            timezone TEXT
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_chats_schedule
+        ON chats(daily_time, timezone)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS participants (
+            chat_id BIGINT,
+            user_id BIGINT,
+            username TEXT,
+            active BOOLEAN DEFAULT TRUE,
+            is_admin BOOLEAN DEFAULT FALSE,
+            seq BIGSERIAL,
+            PRIMARY KEY (chat_id, user_id)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_participants_active
+        ON participants(chat_id, active)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_participants_username
+        ON participants(chat_id, username)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_participants_user
+        ON participants(user_id)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS daily_reports (
+            chat_id BIGINT,
+            user_id BIGINT,
+            date TEXT,
+            reply_to_message_id BIGINT,
+            message_id BIGINT,
+            text TEXT,
+            created_at TEXT,
+            PRIMARY KEY (chat_id, user_id, date)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_daily_reports_date
+        ON daily_reports(chat_id, date)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS sent_messages (
+            chat_id BIGINT,
+            message_id BIGINT,
+            kind TEXT,
+            date TEXT,
+            sent_at TIMESTAMPTZ DEFAULT now(),
+            PRIMARY KEY (chat_id, message_id)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_sent_messages_date
+        ON sent_messages(date)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS shard_leases (
+            shard INTEGER PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at DOUBLE PRECISION NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS daily_claims (
+            chat_id BIGINT,
+            date TEXT,
+            owner TEXT,
+            claimed_at TIMESTAMPTZ DEFAULT now(),
+            PRIMARY KEY (chat_id, date)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_daily_claims_date
+        ON daily_claims(date)
+        """,
+    ]),
+    (2, "Полнотекстовый поиск по тексту отчетов", [
+        # Генерируемая колонка поддерживается самим PostgreSQL при любой записи отчета.
+        # Конфигурация simple (без стемминга) — так же, как unicode61 в SQLite
+        """
+        ALTER TABLE daily_reports ADD COLUMN IF NOT EXISTS text_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', COALESCE(text, ''))) STORED
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_daily_reports_text_tsv
+        ON daily_reports USING GIN (text_tsv)
+        """,
+    ]),
+    (3, "Накопительная статистика участников: сдачи отчетов и серии", [
+        """
+        CREATE TABLE IF NOT EXISTS participant_stats (
+            chat_id BIGINT,
+            user_id BIGINT,
+            reports INTEGER NOT NULL DEFAULT 0,
+            expected INTEGER NOT NULL DEFAULT 0,
+            missed INTEGER NOT NULL DEFAULT 0,
+            streak INTEGER NOT NULL DEFAULT 0,
+            best_streak INTEGER NOT NULL DEFAULT 0,
+            broken_streak INTEGER NOT NULL DEFAULT 0,
+            last_report_date TEXT,
+            last_missed_date TEXT,
+            last_checked_date TEXT,
+            PRIMARY KEY (chat_id, user_id)
+        )
+        """,
+        """
+        INSERT INTO participant_stats (chat_id, user_id, reports, last_report_date)
+        SELECT chat_id, user_id, COUNT(*), MAX(date) FROM daily_reports GROUP BY chat_id, user_id
+        ON CONFLICT DO NOTHING
+        """,
+    ]),
+    (4, "Имя участника из Telegram для напоминаний и время его получения", [
+        "ALTER TABLE participants ADD COLUMN IF NOT EXISTS display_name TEXT",
+        "ALTER TABLE participants ADD COLUMN IF NOT EXISTS display_name_at TEXT",
+    ]),
+]
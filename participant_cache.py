@@ -0,0 +1,160 @@
+"""
+Кэш участников чатов
+
+Справочник участников чата (user_id, username, active, is_admin) загружается
+из таблицы participants при первом обращении к чату и дальше обновляется
+write-through: каждая запись в participants (handlers/admin.py,
+db.ensure_admins_in_db, handlers/daily.py) после commit повторяет изменение
+в кэше. Так ответы на дэйлики, проверка отчетов и /list_active обходятся без
+чтения participants. Давно не использованные чаты вытесняются (LRU).
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+
+from config import PARTICIPANT_CACHE_MAX_CHATS
+from storage import storage
+
+logger = logging.getLogger(__name__)
+
+
+class Participant:
+    """Участник чата в кэше"""
+
+    __slots__ = ("user_id", "username", "active", "is_admin")
+
+    def __init__(self, user_id, username, active, is_admin):
+        self.user_id = user_id
+        self.username = username
+        self.active = bool(active)
+        self.is_admin = bool(is_admin)
+
+
+class ParticipantCache:
+    """LRU кэш участников по chat_id с write-through обновлением"""
+
+    def __init__(self, max_chats=PARTICIPANT_CACHE_MAX_CHATS):
+        self.max_chats = max_chats
+        # chat_id -> {user_id: Participant} в порядке добавления в таблицу
+        self._chats = OrderedDict()
+        # chat_id -> Future: параллельные промахи по одному чату ждут одну загрузку
+        self._pending = {}
+        # Чаты, измененные во время загрузки: загруженный снимок мог устареть
+        self._stale = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def _fetch(self, chat_id):
+        rows = await storage.participants.list(chat_id)
+        return {row[0]: Participant(*row) for row in rows}
+
+    def _store(self, chat_id, members):
+        self._chats[chat_id] = members
+        self._chats.move_to_end(chat_id)
+        while len(self._chats) > self.max_chats:
+            self._chats.popitem(last=False)
+            self.evictions += 1
+
+    async def _members(self, chat_id):
+        members = self._chats.get(chat_id)
+        if members is not None:
+            self.hits += 1
+            self._chats.move_to_end(chat_id)
+            return members
+
+        pending = self._pending.get(chat_id)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[chat_id] = future
+        self._stale.discard(chat_id)
+        try:
+            members = await self._fetch(chat_id)
+            # Если во время чтения чат меняли, снимок отдаем, но не кэшируем
+            if chat_id not in self._stale:
+                self._store(chat_id, members)
+            future.set_result(members)
+            return members
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(chat_id, None)
+            self._stale.discard(chat_id)
+
+    async def get(self, chat_id, user_id):
+        """Участник чата или None"""
+        return (await self._members(chat_id)).get(user_id)
+
+    async def find_by_username(self, chat_id, username):
+        """Участник чата с указанным username или None"""
+        for participant in (await self._members(chat_id)).values():
+            if participant.username == username:
+                return participant
+        return None
+
+    async def active(self, chat_id):
+        """Активные участники чата: список (user_id, username)"""
+        return [(p.user_id, p.username) for p in (await self._members(chat_id)).values() if p.active]
+
+    async def all(self, chat_id):
+        """Все участники чата: список (user_id, username, active)"""
+        return [(p.user_id, p.username, p.active) for p in (await self._members(chat_id)).values()]
+
+    def _loaded(self, chat_id):
+        """Словарь участников чата для write-through (None, если чат не в кэше)"""
+        if chat_id in self._pending:
+            self._stale.add(chat_id)
+        return self._chats.get(chat_id)
+
+    def add(self, chat_id, user_id, username, active, is_admin=False):
+        """Добавляет участника, если его еще нет (как INSERT OR IGNORE)"""
+        members = self._loaded(chat_id)
+        if members is not None and user_id not in members:
+            members[user_id] = Participant(user_id, username, active, is_admin)
+
+    def put(self, chat_id, user_id, username, active, is_admin=False):
+        """Добавляет или полностью заменяет участника (как INSERT OR REPLACE)"""
+        members = self._loaded(chat_id)
+        if members is not None:
+            members.pop(user_id, None)
+            members[user_id] = Participant(user_id, username, active, is_admin)
+
+    def update(self, chat_id, user_id, **fields):
+        """Меняет поля существующего участника (как UPDATE)"""
+        members = self._loaded(chat_id)
+        participant = members.get(user_id) if members is not None else None
+        if participant is not None:
+            for name, value in fields.items():
+                setattr(participant, name, bool(value) if name in ("active", "is_admin") else value)
+
+    def invalidate(self, chat_id):
+        """Сбрасывает участников чата (следующее обращение перечитает их из БД)"""
+        self._chats.pop(chat_id, None)
+        if chat_id in self._pending:
+            self._stale.add(chat_id)
+
+    def clear(self):
+        """Полностью очищает кэш"""
+        self._chats.clear()
+
+    def stats(self):
+        """Счетчики попаданий/промахов кэша"""
+        total = self.hits + self.misses
+        return {
+            "chats": len(self._chats),
+            "participants": sum(len(members) for members in self._chats.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+# Глобальный кэш участников
+participant_cache = ParticipantCache()
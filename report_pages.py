@@ -0,0 +1,96 @@
+"""
+Постраничный вывод /report
+
+Отчеты за дату показываются страницами по REPORT_PAGE_ROWS участников с
+кнопками «Назад»/«Далее». Страница строится только по запросу одним
+keyset-запросом: из БД читается REPORT_PAGE_ROWS + 1 отчетов после курсора
+(user_id последнего участника предыдущей страницы) или, для «Назад», перед
+курсором (user_id первого участника текущей). Курсор и номер страницы
+хранятся в callback_data кнопок, так что между нажатиями бот ничего не держит
+в памяти.
+
+В странице всегда ровно REPORT_PAGE_ROWS участников (кроме последней), поэтому
+страница, прочитанная назад, совпадает с той, что пользователь видел, листая
+вперед. Если отчеты не помещаются в REPORT_PAGE_MAX_CHARS (в единицах UTF-16,
+как считает Telegram), длинные из них обрезаются.
+"""
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import REPORT_PAGE_ROWS, REPORT_PAGE_MAX_CHARS
+from mentions import fit_parts, utf16_len
+from storage import storage
+
+SEPARATOR = "\n\n"
+
+
+class ReportPage(CallbackData, prefix="rp"):
+    """Кнопка перехода на страницу отчетов"""
+
+    chat_id: int
+    date: str
+    page: int = 1
+    cursor: int | None = None   # user_id крайнего участника соседней страницы
+    back: bool = False          # страница — перед курсором
+
+
+def format_entry(username, user_id, text):
+    """Отчет одного участника (без разделителя)"""
+    user_ref = f"@{username}" if username else f"user_id: {user_id}"
+    return f"{user_ref}:\n{text or ''}"
+
+
+def _header(date_str, page=None):
+    if page is None:
+        return f"Отчёты за {date_str}:\n\n"
+    return f"Отчёты за {date_str}, стр. {page}:\n\n"
+
+
+async def render_page(chat_id, date_str, page=1, cursor=None, back=False,
+                      rows=REPORT_PAGE_ROWS, max_chars=REPORT_PAGE_MAX_CHARS):
+    """
+    Строит страницу отчетов за дату
+
+    Args:
+        chat_id: ID чата
+        date_str: Дата YYYY-MM-DD
+        page: Номер страницы
+        cursor: user_id, после которого начинается страница (None — первая)
+        back: Страница заканчивается перед cursor
+
+    Returns:
+        tuple: (текст, клавиатура или None); (None, None), если отчетов нет
+    """
+    fetched = await storage.reports.page(chat_id, date_str, cursor, back, limit=rows + 1)
+    if not fetched:
+        return None, None
+
+    more = len(fetched) > rows
+    fetched = fetched[:rows]
+    if back:
+        fetched.reverse()
+        has_prev, has_next = more, True
+        if not more:
+            page = 1   # дошли до начала дня
+    else:
+        has_prev, has_next = cursor is not None, more
+
+    header = _header(date_str, page if has_prev or has_next else None)
+    # Место под заголовок и разделители; не поместившиеся отчеты укорачиваются
+    budget = max_chars - utf16_len(header) - len(fetched) * len(SEPARATOR)
+    entries = fit_parts([format_entry(*row) for row in fetched], budget)
+    text = header + "".join(entry + SEPARATOR for entry in entries)
+
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton(
+            text="◀️ Назад",
+            callback_data=ReportPage(chat_id=chat_id, date=date_str, page=page - 1, cursor=fetched[0][1], back=True).pack()
+        ))
+    if has_next:
+        buttons.append(InlineKeyboardButton(
+            text="Далее ▶️",
+            callback_data=ReportPage(chat_id=chat_id, date=date_str, page=page + 1, cursor=fetched[-1][1]).pack()
+        ))
+    markup = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return text, markup
@@ -0,0 +1,166 @@
+"""
+Групповая запись отчетов (group commit)
+
+handle_reply не пишет в БД сам, а ставит строки в очередь ReportWriter.
+Фоновая задача раз в несколько миллисекунд (или при наборе N строк) сбрасывает
+накопленные upsert'ы участников и отчетов одной транзакцией, после чего
+завершает future каждого вызывающего — ответ считается сохраненным только
+после commit.
+
+Запись идет в фоновой задаче, вне контекста обновления, поэтому save
+записывает ожидание пачки вместе с commit как спан БД вызывающего
+обновления (reports.save_batch).
+"""
+import asyncio
+import logging
+import time
+
+from config import REPORT_FLUSH_INTERVAL_MS, REPORT_FLUSH_MAX_ROWS
+from storage import storage
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class ReportWriter:
+    """Буфер записи отчетов с групповым commit"""
+
+    def __init__(self, flush_interval_ms=REPORT_FLUSH_INTERVAL_MS, max_rows=REPORT_FLUSH_MAX_ROWS):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        self._pending = []  # (participant_row | None, report_row | None, future)
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        # Статистика
+        self.flushes = 0
+        self.rows_written = 0
+        self.max_batch = 0
+        self.flush_time_total = 0.0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запускает фоновую задачу сброса буфера"""
+        if not self.running:
+            self._wakeup = asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="report-writer")
+            logger.info(
+                f"Буфер записи отчетов запущен (интервал {self.flush_interval * 1000:.0f} мс, "
+                f"до {self.max_rows} строк)"
+            )
+
+    async def stop(self):
+        """Останавливает фоновую задачу, предварительно сбросив всё накопленное"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        self._stopping = True
+        self._wakeup.set()
+        await task
+        await self._flush()
+        logger.info(f"Буфер записи отчетов остановлен. Статистика: {self.stats()}")
+
+    def submit(self, participant=None, report=None):
+        """
+        Ставит строки в очередь на запись
+
+        Args:
+            participant: (chat_id, user_id, username) — участник, которого нужно активировать
+            report: (chat_id, user_id, date, reply_to_message_id, message_id, text, created_at)
+
+        Returns:
+            asyncio.Future: завершается после commit транзакции с этими строками
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((participant, report, future))
+        # Первая строка открывает окно накопления, заполненная пачка сбрасывается сразу
+        if len(self._pending) == 1 or len(self._pending) >= self.max_rows:
+            self._wakeup.set()
+        return future
+
+    async def save(self, participant=None, report=None):
+        """Записывает строки и ждет подтверждения commit"""
+        future = self.submit(participant, report)
+        if not self.running:
+            # Фоновая задача не запущена (например, в тестах) — пишем сразу,
+            # спан запроса записывает сам репозиторий
+            await self._flush()
+            await future
+            return
+        with span("db", "reports.save_batch"):
+            await future
+
+    async def _run(self):
+        while not self._stopping:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Даем набраться пачке, если она еще не заполнена
+            if not self._stopping and len(self._pending) < self.max_rows:
+                try:
+                    await asyncio.wait_for(self._full_batch(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._flush()
+
+    async def _full_batch(self):
+        while len(self._pending) < self.max_rows and not self._stopping:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def _flush(self):
+        """Записывает все накопленные строки одной транзакцией"""
+        while self._pending:
+            batch = self._pending[:self.max_rows]
+            del self._pending[:self.max_rows]
+            started = time.perf_counter()
+            await self._write(batch)
+            self.flushes += 1
+            self.max_batch = max(self.max_batch, len(batch))
+            self.flush_time_total += time.perf_counter() - started
+
+    async def _write(self, batch):
+        """
+        Записывает пачку и завершает futures ее вызывающих
+
+        Если транзакция не прошла, пачка делится пополам и половины пишутся
+        отдельно (в исходном порядке): ошибку получают только те, чьи строки
+        ее вызывают, остальные ответы сохраняются.
+        """
+        participants = [p for p, _, _ in batch if p is not None]
+        reports = [r for _, r, _ in batch if r is not None]
+        try:
+            await storage.reports.save_batch(participants, reports)
+        except Exception as e:
+            if len(batch) > 1:
+                logger.warning(f"Ошибка групповой записи {len(batch)} отчетов, пишем по частям: {e}")
+                middle = len(batch) // 2
+                await self._write(batch[:middle])
+                await self._write(batch[middle:])
+                return
+            logger.error(f"Ошибка записи отчета: {e}")
+            _, _, future = batch[0]
+            if not future.done():
+                future.set_exception(e)
+            return
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result(None)
+        self.rows_written += len(participants) + len(reports)
+
+    def stats(self):
+        """Статистика групповой записи"""
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "max_batch": self.max_batch,
+            "avg_flush_ms": round(self.flush_time_total / self.flushes * 1000, 2) if self.flushes else 0.0,
+        }
+
+
+# Глобальный буфер записи отчетов (запускается в main.main)
+report_writer = ReportWriter()
@@ -3,94 +3,327 @@
 """
 import asyncio
 import logging
-import html
-from datetime import datetime, timedelta
-import aiosqlite
-from pytz import timezone as pytz_timezone
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.triggers.cron import CronTrigger
 
 from config import (
-    DB_PATH,
     TIMEZONE,
     DAILY_TEXT,
     DAILY_CHECK_INTERVAL_HOURS,
-    MAX_MENTIONS_PER_MESSAGE
+    DAILY_DISPATCH_CONCURRENCY,
+    DAILY_DISPATCH_JITTER_SECONDS,
+    DISPLAY_NAME_TTL_HOURS,
+    NAME_RESOLVE_CONCURRENCY,
+    MESSAGE_INDEX_RETENTION_DAYS,
 )
-import bot_instance
 from bot_instance import bot, scheduler
+from mentions import pack_mentions
+from metrics import REMINDER_BATCH_SIZE
+from storage import storage
+from sender import gateway
+from participant_cache import participant_cache
+from message_index import message_index, KIND_DAILY, KIND_REMINDER
+from timezones import get_timezone, local_now, chat_timezones
+import sharding
+from sharding import owns, claim_daily, release_daily_claim, prune_daily_claims
 from utils import is_workday
 
 logger = logging.getLogger(__name__)
 
 
+DAILY_JOB_PREFIX = "daily:"
+CHECK_JOB_PREFIX = "check:"
+
+
+def normalize_daily_time(daily_time):
+    """
+    Приводит время рассылки к виду HH:MM
+
+    Raises:
+        ValueError: если время некорректно
+    """
+    hour, minute = map(int, daily_time.strip().split(":"))
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Некорректное время: {daily_time}")
+    return f"{hour:02d}:{minute:02d}"
+
+
+def daily_job_id(daily_time, tz=TIMEZONE):
+    """Стабильный ID cron-задачи рассылки для минуты HH:MM в поясе tz"""
+    return f"{DAILY_JOB_PREFIX}{daily_time}@{tz}"
+
+
+def check_job_id(chat_id, date_today):
+    """Стабильный ID задачи проверки отчетов за дату"""
+    return f"{CHECK_JOB_PREFIX}{chat_id}:{date_today}"
+
+
+def make_daily_trigger(daily_time, tz=TIMEZONE):
+    """Cron-триггер для времени рассылки HH:MM в поясе tz"""
+    hour, minute = map(int, daily_time.split(":"))
+    return CronTrigger(hour=hour, minute=minute, timezone=get_timezone(tz))
+
+
+async def _send_daily_bounded(chat_id, semaphore, tz):
+    """Отправляет дэйлик в один чат с ограничением параллельности и джиттером"""
+    async with semaphore:
+        if DAILY_DISPATCH_JITTER_SECONDS > 0:
+            await asyncio.sleep(random.uniform(0, DAILY_DISPATCH_JITTER_SECONDS))
+        await send_scheduled_daily(chat_id, tz=tz)
+
+
+async def dispatch_dailies(daily_time, tz=TIMEZONE):
+    """
+    Рассылает дэйлики всем чатам с временем рассылки daily_time в поясе tz
+
+    Одна cron-задача на каждую пару (пояс, HH:MM), в которую есть хотя бы
+    один чат этого шарда: чаты выбираются одним запросом и обрабатываются
+    пулом из DAILY_DISPATCH_CONCURRENCY параллельных отправок.
+
+    Args:
+        daily_time: Время рассылки в формате HH:MM
+        tz: Часовой пояс чатов (имя IANA)
+
+    Returns:
+        dict: Сводка рассылки (количество чатов, отправлено, ошибки, длительность)
+    """
+    started = time.perf_counter()
+    summary = {"daily_time": daily_time, "timezone": tz, "chats": 0, "skipped": 0, "sent": 0, "failed": 0, "duration": 0.0}
+    
+    # Без аренды шарда не рассылаем: её держит другой процесс с тем же SHARD_INDEX
+    if sharding.enabled() and not sharding.shard_lease.held:
+        logger.error(f"Аренда шарда не удержана — рассылка {daily_time} ({tz}) пропущена")
+        return summary
+    
+    rows = [row for row in await storage.chats.in_bucket(daily_time, tz) if owns(row[0])]
+    
+    # Выходной определяется по календарю страны чата (маска года строится один раз)
+    today = local_now(tz).date()
+    chat_ids = [chat_id for chat_id, country in rows if is_workday(today, country)]
+    summary["skipped"] = len(rows) - len(chat_ids)
+    if summary["skipped"]:
+        logger.info(f"Выходной или праздник — дэйлики на {daily_time} ({tz}) не отправляются в {summary['skipped']} чатов.")
+    
+    semaphore = asyncio.Semaphore(DAILY_DISPATCH_CONCURRENCY)
+    results = await asyncio.gather(
+        *(_send_daily_bounded(chat_id, semaphore, tz) for chat_id in chat_ids),
+        return_exceptions=True
+    )
+    for chat_id, result in zip(chat_ids, results):
+        if isinstance(result, Exception):
+            summary["failed"] += 1
+            logger.error(f"Не удалось отправить дэйлик в чат {chat_id}: {result}")
+    
+    summary["chats"] = len(chat_ids)
+    summary["sent"] = len(chat_ids) - summary["failed"]
+    summary["duration"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"Рассылка {daily_time} ({tz}): чатов {summary['chats']}, отправлено {summary['sent']}, "
+        f"ошибок {summary['failed']}, за {summary['duration']} с"
+    )
+    return summary
+
+
+def ensure_daily_bucket(daily_time, tz=TIMEZONE):
+    """
+    Создает cron-задачу для минуты HH:MM в поясе tz, если её еще нет
+
+    Args:
+        daily_time: Время рассылки в формате HH:MM
+        tz: Часовой пояс (имя IANA)
+    """
+    job_id = daily_job_id(daily_time, tz)
+    if scheduler.get_job(job_id) is not None:
+        return
+    scheduler.add_job(
+        dispatch_dailies,
+        make_daily_trigger(daily_time, tz),
+        args=[daily_time, tz],
+        id=job_id,
+        name=f"daily {daily_time} {tz}",
+        replace_existing=True
+    )
+    logger.info(f"Добавлена задача рассылки на {daily_time} ({tz})")
+
+
+async def release_daily_bucket(daily_time, tz=TIMEZONE):
+    """Удаляет cron-задачу минуты HH:MM в поясе tz, если в ней не осталось чатов этого шарда"""
+    if any(owns(chat_id) for chat_id, _ in await storage.chats.in_bucket(daily_time, tz)):
+        return
+    try:
+        await asyncio.to_thread(scheduler.remove_job, daily_job_id(daily_time, tz))
+        logger.info(f"Задача рассылки на {daily_time} ({tz}) удалена — чатов не осталось")
+    except JobLookupError:
+        pass
+
+
+async def reschedule_chat_daily(old_time, new_time, old_tz=TIMEZONE, new_tz=TIMEZONE):
+    """
+    Обновляет задачи после изменения времени или пояса рассылки одного чата
+
+    Затрагивает только пары (old_tz, old_time) и (new_tz, new_time), остальные
+    задачи (в том числе отложенные проверки отчетов) не трогаются.
+    """
+    if new_time:
+        # Запись в хранилище задач блокирующая — вне потока event loop (см. setup_scheduler)
+        await asyncio.to_thread(ensure_daily_bucket, new_time, new_tz)
+    if old_time and (old_time, old_tz) != (new_time, new_tz):
+        await release_daily_bucket(old_time, old_tz)
+
+
+def _reconcile_daily_buckets(buckets):
+    """Создает недостающие задачи рассылки и удаляет лишние; возвращает (добавлено, удалено)"""
+    existing = {
+        job.id: job for job in scheduler.get_jobs()
+        if job.id.startswith(DAILY_JOB_PREFIX)
+    }
+    added = 0
+    for tz, daily_time in buckets:
+        if existing.pop(daily_job_id(daily_time, tz), None) is None:
+            ensure_daily_bucket(daily_time, tz)
+            added += 1
+    
+    # Минуты, в которые больше нет чатов (и задачи старого формата)
+    for job in existing.values():
+        job.remove()
+    return added, len(existing)
+
+
 async def schedule_all_dailies():
     """
-    Планирует отправку дэйликов для всех чатов согласно их расписанию
-    Вызывается при запуске бота и после изменения времени рассылки
+    Сверяет задачи рассылки в хранилище планировщика с расписанием чатов в БД
+    Вызывается только при запуске бота: задачи переживают перезапуск,
+    поэтому создаются лишь недостающие пары (пояс, HH:MM), а лишние удаляются.
+    Изменение времени или пояса одного чата обрабатывается через reschedule_chat_daily()
     """
-    scheduler.remove_all_jobs()
-    moscow_tz = pytz_timezone(TIMEZONE)
-    now_msk = datetime.now(moscow_tz)
+    now_msk = local_now()
     logger.info(f"Сейчас в Москве: {now_msk.strftime('%Y-%m-%d %H:%M:%S')}")
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT chat_id, daily_time FROM chats WHERE daily_time IS NOT NULL"
-        )
-        chats = await cursor.fetchall()
-    
-    for chat_id, daily_time in chats:
-        hour, minute = map(int, daily_time.split(":"))
-        logger.info(f"Добавляю задачу для чата {chat_id}: {daily_time} (hour={hour}, minute={minute})")
-
-        def make_job(chat_id_inner):
-            """Фабрика для создания job с правильным замыканием chat_id"""
-            def job():
-                now_msk = datetime.now(pytz_timezone(TIMEZONE))
-                logger.info(
-                    f"Сработала задача для чата {chat_id_inner} — "
-                    f"сейчас в МСК {now_msk.strftime('%Y-%m-%d %H:%M:%S')}"
-                )
-                # Используем глобальный loop из bot_instance
-                asyncio.run_coroutine_threadsafe(send_scheduled_daily(chat_id_inner), bot_instance.loop)
-            return job
-        
-        scheduler.add_job(
-            make_job(chat_id),
-            "cron",
-            hour=hour,
-            minute=minute,
-            timezone=moscow_tz
-        )
-    
-    logger.info("Расписания дэйликов добавлены для всех чатов.")
-
-
-async def send_scheduled_daily(chat_id):
+    # Только пары (пояс, HH:MM), в которых есть чаты этого шарда
+    buckets = sorted({(tz, daily_time) for chat_id, tz, daily_time in await storage.chats.schedule() if owns(chat_id)})
+    
+    # Чтение и изменения хранилища задач — одним вызовом вне потока event loop
+    added, removed = await asyncio.to_thread(_reconcile_daily_buckets, buckets)
+    
+    logger.info(
+        f"Расписания дэйликов сверены: минут рассылки {len(buckets)}, "
+        f"добавлено {added}, удалено {removed}."
+    )
+    
+    # Отметки об отправке нужны только на случай повторного запуска рассылки за ту же дату
+    cutoff = (now_msk - timedelta(days=MESSAGE_INDEX_RETENTION_DAYS)).strftime("%Y-%m-%d")
+    await prune_daily_claims(cutoff)
+    
+    # Ответы на дэйлики старше срока хранения индекса не принимаются — их сообщения больше не нужны
+    removed = await storage.messages.prune(cutoff)
+    if removed:
+        logger.info(f"Удалено старых записей об отправленных дэйликах и напоминаниях: {removed}")
+
+
+async def send_scheduled_daily(chat_id, tz=None):
     """
     Отправляет дэйлик в указанный чат и планирует проверку отчетов
+    Проверка рабочего дня выполняется один раз на всю рассылку в dispatch_dailies
     
     Args:
         chat_id: ID чата для отправки дэйлика
+        tz: Часовой пояс чата (если не передан — берется из настроек чата)
     """
-    if not is_workday():
-        logger.info("Сегодня выходной или праздник — дэйлик не отправляется.")
-        return
-    
     logger.info(f"send_scheduled_daily запускается для {chat_id}")
-    sent = await bot.send_message(chat_id, DAILY_TEXT)
+    # Дата дэйлика — по местному времени чата
+    tz = tz or await chat_timezones.get(chat_id)
+    date_today = local_now(tz).strftime("%Y-%m-%d")
+    
+    # Дэйлик за дату отправляет только тот, кто первым поставил отметку
+    # (защита от двойной отправки другим процессом или повторным запуском задачи)
+    if not await claim_daily(chat_id, date_today):
+        logger.warning(f"Дэйлик за {date_today} в чат {chat_id} уже отправлен другим запуском — пропускаем")
+        return
+    try:
+        sent = await gateway.send_message(chat_id, DAILY_TEXT)
+    except Exception:
+        await release_daily_claim(chat_id, date_today)
+        raise
     last_daily_message_id = sent.message_id
-    date_today = datetime.now(pytz_timezone(TIMEZONE)).strftime("%Y-%m-%d")
+    # Запоминаем дэйлик, чтобы принимать ответы на него как отчеты за date_today
+    await message_index.record(chat_id, last_daily_message_id, KIND_DAILY, date_today)
     
-    # Планируем проверку отчетов через N часов
-    scheduler.add_job(
+    # Планируем проверку отчетов через N часов (запись в хранилище задач — вне потока event loop)
+    await asyncio.to_thread(
+        scheduler.add_job,
         check_daily_reports,
         "date",
-        run_date=datetime.now(pytz_timezone(TIMEZONE)) + timedelta(hours=DAILY_CHECK_INTERVAL_HOURS),
-        args=[chat_id, last_daily_message_id, date_today]
+        run_date=local_now(tz) + timedelta(hours=DAILY_CHECK_INTERVAL_HOURS),
+        args=[chat_id, last_daily_message_id, date_today],
+        id=check_job_id(chat_id, date_today),
+        replace_existing=True,
+        # Проверка должна выполниться даже если бот был перезапущен в момент срабатывания
+        misfire_grace_time=DAILY_CHECK_INTERVAL_HOURS * 3600
     )
     logger.info(f"Дэйлик отправлен по расписанию в чат {chat_id}")
 
 
+async def _fetch_display_name(chat_id, user_id, semaphore):
+    async with semaphore:
+        try:
+            member = await bot.get_chat_member(chat_id, user_id)
+        except Exception as e:
+            logger.warning(f"Не удалось получить имя user_id={user_id} в чате {chat_id}: {e}")
+            return None
+    return member.user.first_name or None
+
+
+async def resolve_display_names(chat_id, users):
+    """
+    Имена для упоминаний в напоминании
+
+    У кого есть username — он. Остальным имя берется из participants, если
+    оно получено не раньше DISPLAY_NAME_TTL_HOURS часов назад, иначе
+    запрашивается у Telegram (не больше NAME_RESOLVE_CONCURRENCY запросов
+    одновременно) и сохраняется в participants для следующих проверок.
+
+    Args:
+        chat_id: ID чата
+        users: Список (user_id, username)
+
+    Returns:
+        dict: user_id -> имя
+    """
+    names = {user_id: username for user_id, username in users if username}
+    nameless = [user_id for user_id, username in users if not username]
+    if not nameless:
+        return names
+
+    now = datetime.now(timezone.utc)
+    fresh_after = (now - timedelta(hours=DISPLAY_NAME_TTL_HOURS)).strftime("%Y-%m-%d %H:%M:%S")
+    stored = await storage.participants.display_names(chat_id)
+    stale = []
+    for user_id in nameless:
+        name, resolved_at = stored.get(user_id, (None, None))
+        if name and resolved_at and resolved_at >= fresh_after:
+            names[user_id] = name
+        else:
+            stale.append(user_id)
+
+    if stale:
+        semaphore = asyncio.Semaphore(NAME_RESOLVE_CONCURRENCY)
+        fetched = await asyncio.gather(*(_fetch_display_name(chat_id, user_id, semaphore) for user_id in stale))
+        resolved = [(user_id, name) for user_id, name in zip(stale, fetched) if name]
+        if resolved:
+            try:
+                await storage.participants.set_display_names(chat_id, resolved, now.strftime("%Y-%m-%d %H:%M:%S"))
+            except Exception as e:
+                logger.error(f"Ошибка сохранения имен участников чата {chat_id}: {e}")
+        # Не удалось получить — устаревшее сохраненное имя лучше, чем никакого
+        for user_id, name in zip(stale, fetched):
+            names[user_id] = name or stored.get(user_id, (None, None))[0] or f"User {user_id}"
+        logger.info(f"Имена участников чата {chat_id}: запрошено {len(stale)}, получено {len(resolved)}")
+    return names
+
+
 async def check_daily_reports(chat_id, daily_message_id, date_today):
     """
     Проверяет кто не сдал отчет и отправляет напоминания
@@ -102,57 +335,34 @@ async def check_daily_reports(chat_id, daily_message_id, date_today):
     """
     logger.info(f"Запущена проверка отчетов за {date_today} в чате {chat_id}")
     
-    # Получаем всех активных участников
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT user_id, username FROM participants WHERE chat_id = ? AND active = True",
-            (chat_id,)
-        )
-        users = await cursor.fetchall()
-
-        # Получаем тех, кто уже сдал отчет
-        cursor = await db.execute(
-            "SELECT user_id FROM daily_reports WHERE chat_id = ? AND date = ?",
-            (chat_id, date_today)
-        )
-        reporters = {row[0] for row in await cursor.fetchall()}
+    # Получаем всех активных участников (из кэша участников)
+    users = await participant_cache.active(chat_id)
+
+    # Получаем тех, кто уже сдал отчет
+    reporters = await storage.reports.reporters(chat_id, date_today)
 
     # Находим неотчитавшихся
     not_reported = [(u_id, uname) for u_id, uname in users if u_id not in reporters]
     logger.info(f"Неотчитались ({len(not_reported)} человек): {not_reported}")
+
+    # Итог дня — в накопительную статистику (/stats); повторная проверка даты ее не меняет
+    try:
+        await storage.compliance.record_check(chat_id, date_today, [(u_id, u_id in reporters) for u_id, _ in users])
+    except Exception as e:
+        logger.error(f"Ошибка обновления статистики чата {chat_id} за {date_today}: {e}")
     
     if not_reported:
-        # Rate limiting: отправляем по частям, если слишком много упоминаний
-        for i in range(0, len(not_reported), MAX_MENTIONS_PER_MESSAGE):
-            batch = not_reported[i:i + MAX_MENTIONS_PER_MESSAGE]
-            mentions = []
-            
-            for user_id, username in batch:
-                # Пытаемся получить красивое имя пользователя
-                try:
-                    if username:
-                        display_name = html.escape(username)
-                    else:
-                        # Пробуем получить имя через API
-                        try:
-                            member = await bot.get_chat_member(chat_id, user_id)
-                            display_name = html.escape(member.user.first_name or f"User {user_id}")
-                        except Exception:
-                            display_name = f"User {user_id}"
-                    
-                    mention = f'<a href="tg://user?id={user_id}">{display_name}</a>'
-                    mentions.append(mention)
-                except Exception as e:
-                    logger.error(f"Ошибка при создании упоминания для user_id={user_id}: {e}")
-            
-            if mentions:
-                mention_text = " ".join(mentions)
-                text = f"{mention_text}\nЖду Текстовый Дейлик!"
-                try:
-                    await bot.send_message(chat_id, text, parse_mode="HTML")
-                    # Защита от rate limit между батчами
-                    if i + MAX_MENTIONS_PER_MESSAGE < len(not_reported):
-                        await asyncio.sleep(0.5)
-                except Exception as e:
-                    logger.error(f"Ошибка при отправке напоминания в чат {chat_id}: {e}")
+        # Имена всех неотчитавшихся — заранее и параллельно, а не по одному в цикле
+        names = await resolve_display_names(chat_id, not_reported)
+        # Упоминания (text_mention) раскладываются по сообщениям по длине текста
+        # и числу упоминаний — как можно меньше сообщений в пределах лимитов Telegram
+        for text, entities in pack_mentions([(user_id, names[user_id]) for user_id, _ in not_reported]):
+            REMINDER_BATCH_SIZE.observe(len(entities))
+            try:
+                # Rate limiting между сообщениями обеспечивает шлюз отправки
+                sent = await gateway.send_message(chat_id, text, entities=entities)
+                # Ответ на напоминание — тоже отчет за date_today
+                await message_index.record(chat_id, sent.message_id, KIND_REMINDER, date_today)
+            except Exception as e:
+                logger.error(f"Ошибка при отправке напоминания в чат {chat_id}: {e}")
 
@@ -0,0 +1,80 @@
+"""
+Проигрывание записанных обновлений Telegram в локальный webhook
+
+Файл — по одному JSON-обновлению на строку (как в ответе getUpdates).
+Скрипт отправляет их POST-запросами с секретом в заголовке и печатает
+распределение времени ответа сервера и коды ответов. Задержку до конца
+обработки хендлерами сервер пишет в лог при остановке (Статистика: ...).
+
+Пример:
+    BOT_MODE=webhook WEBHOOK_URL=https://example.invalid/webhook WEBHOOK_SECRET=s python main.py
+    python scripts/replay_updates.py updates.jsonl --secret s --concurrency 20 --repeat 10
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+
+import aiohttp
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def load_updates(path, repeat):
+    """Читает обновления и размножает их с уникальными update_id"""
+    with open(path, encoding="utf-8") as f:
+        updates = [json.loads(line) for line in f if line.strip()]
+    result = []
+    next_id = 1
+    for _ in range(repeat):
+        for update in updates:
+            result.append({**update, "update_id": next_id})
+            next_id += 1
+    return result
+
+
+async def replay(url, secret, updates, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = Counter()
+
+    async with aiohttp.ClientSession(headers={SECRET_HEADER: secret}) as session:
+        async def post(update):
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.post(url, json=update) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(update) for update in updates))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Отправлено: {len(updates)} за {elapsed:.2f} с ({len(updates) / elapsed:.0f} обн./с)")
+    print(f"Коды ответов: {dict(statuses)}")
+    print(
+        f"Ответ сервера, мс: p50={statistics.median(latencies) * 1000:.1f} "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} "
+        f"max={latencies[-1] * 1000:.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проигрывание обновлений в webhook")
+    parser.add_argument("file", help="Файл с обновлениями (JSON по одному на строку)")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--secret", required=True, help="Значение WEBHOOK_SECRET")
+    parser.add_argument("--concurrency", type=int, default=10, help="Одновременных запросов")
+    parser.add_argument("--repeat", type=int, default=1, help="Сколько раз проиграть файл")
+    args = parser.parse_args()
+
+    updates = load_updates(args.file, args.repeat)
+    asyncio.run(replay(args.url, args.secret, updates, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Полнотекстовый поиск по отчетам (/search)
+
+Запрос пользователя разбирается на слова: ищутся отчеты, где встречаются все
+слова, "слово*" совпадает с любым словом, начинающимся с него. Результаты
+ранжируются индексом базы (bm25 в SQLite, ts_rank_cd в PostgreSQL) и
+выводятся страницами по SEARCH_PAGE_SIZE с кнопками «Назад»/«Далее».
+
+Текст запроса может не поместиться в callback_data (64 байта), поэтому
+кнопки несут короткий id поиска, а сам запрос хранится в памяти в LRU
+на SEARCH_MAX_SESSIONS последних поисков.
+"""
+import html
+import re
+import secrets
+from collections import OrderedDict
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import SEARCH_PAGE_SIZE, SEARCH_MAX_SESSIONS
+from storage import storage
+
+# Маркеры найденных слов во фрагменте: управляющие символы не встречаются
+# в тексте отчетов и переживают html.escape
+MARK_START, MARK_END = "\x02", "\x03"
+# Больше слов в запросе не нужно, а длинный запрос дорого ищется
+MAX_TERMS = 8
+
+
+class SearchPage(CallbackData, prefix="sp"):
+    """Кнопка перехода на страницу результатов поиска"""
+
+    search_id: str
+    page: int
+
+
+class SearchSessions:
+    """LRU последних поисков: search_id -> (chat_id, user_id, запрос)"""
+
+    def __init__(self, max_sessions=SEARCH_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+
+    def add(self, chat_id, user_id, query):
+        """Запоминает поиск и возвращает его id"""
+        search_id = secrets.token_urlsafe(6)
+        self._sessions[search_id] = (chat_id, user_id, query)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return search_id
+
+    def get(self, search_id):
+        """Параметры поиска или None, если он уже вытеснен"""
+        session = self._sessions.get(search_id)
+        if session is not None:
+            self._sessions.move_to_end(search_id)
+        return session
+
+    def clear(self):
+        self._sessions.clear()
+
+
+def parse_query(query):
+    """
+    Слова запроса для storage.reports.search
+
+    Returns:
+        list: (слово в нижнем регистре, префикс); пустой, если слов нет
+    """
+    return [
+        (word.lower(), bool(star))
+        for word, star in re.findall(r"(\w+)(\*?)", query)
+    ][:MAX_TERMS]
+
+
+def format_snippet(snippet):
+    """Фрагмент отчета в HTML: найденные слова жирным, в одну строку"""
+    text = html.escape(" ".join((snippet or "").split()))
+    return text.replace(MARK_START, "<b>").replace(MARK_END, "</b>")
+
+
+async def render_results(chat_id, query, search_id, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    Страница результатов поиска
+
+    Returns:
+        tuple: (HTML-текст, клавиатура или None); (None, None), если на странице ничего нет
+    """
+    terms = parse_query(query)
+    if not terms:
+        return None, None
+
+    # Строка сверх страницы показывает, есть ли следующая
+    rows = await storage.reports.search(
+        chat_id, terms, limit=page_size + 1, offset=(page - 1) * page_size,
+        marks=(MARK_START, MARK_END)
+    )
+    if not rows:
+        return None, None
+
+    shown = html.escape(query if len(query) <= 100 else query[:99] + "…")
+    lines = [f"Поиск «{shown}», стр. {page}:" if page > 1 or len(rows) > page_size else f"Поиск «{shown}»:"]
+    for date_str, user_id, username, snippet in rows[:page_size]:
+        user_ref = f"@{html.escape(username)}" if username else f"user_id: {user_id}"
+        lines.append(f"\n<b>{date_str}</b> {user_ref}:\n{format_snippet(snippet)}")
+    text = "\n".join(lines)
+
+    buttons = []
+    if page > 1:
+        buttons.append(InlineKeyboardButton(
+            text="◀️ Назад", callback_data=SearchPage(search_id=search_id, page=page - 1).pack()
+        ))
+    if len(rows) > page_size:
+        buttons.append(InlineKeyboardButton(
+            text="Далее ▶️", callback_data=SearchPage(search_id=search_id, page=page + 1).pack()
+        ))
+    markup = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return text, markup
+
+
+# Глобальное хранилище поисков для кнопок страниц
+search_sessions = SearchSessions()
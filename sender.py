@@ -0,0 +1,184 @@
+"""
+Шлюз исходящих сообщений
+
+Все отправки бота (рассылка, напоминания, ответы на команды) проходят через
+gateway: он ограничивает скорость глобальным и per-chat token bucket'ами
+под лимиты Telegram и повторяет запрос после TelegramRetryAfter.
+"""
+import asyncio
+import logging
+import time
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot_instance import bot
+from config import (
+    SEND_GLOBAL_RATE,
+    SEND_GROUP_RATE_PER_MINUTE,
+    SEND_PRIVATE_RATE,
+    SEND_CHAT_BURST,
+    SEND_MAX_RETRIES,
+)
+from metrics import SEND_MESSAGES, SEND_QUEUE_DEPTH, SEND_RETRIES, SEND_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Сколько per-chat bucket'ов держать, прежде чем выбрасывать простаивающие
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием
+
+    reserve() сразу забирает токен (баланс может уйти в минус) и возвращает,
+    сколько секунд нужно подождать до своей очереди — так ожидающие
+    обслуживаются по порядку без циклов опроса.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Резервирует токен и возвращает задержку в секундах"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def block(self, seconds):
+        """Запрещает отправку на seconds секунд (после RetryAfter)"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def is_idle(self):
+        """Bucket полный — его можно выбросить без потери состояния"""
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class SendGateway:
+    """Централизованная отправка сообщений с rate limiting и повтором после RetryAfter"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._global = TokenBucket(SEND_GLOBAL_RATE, SEND_GLOBAL_RATE)
+        self._chats = {}
+        # Статистика
+        self.queue_depth = 0
+        self.queue_peak = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._chats = {cid: b for cid, b in self._chats.items() if not b.is_idle()}
+            # Отрицательный chat_id — группа (20 сообщений в минуту), положительный — личка
+            rate = SEND_GROUP_RATE_PER_MINUTE / 60 if chat_id < 0 else SEND_PRIVATE_RATE
+            bucket = TokenBucket(rate, SEND_CHAT_BURST)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _wait_turn(self, chat_id):
+        """Ждет свободного места сначала в лимите чата, затем в глобальном"""
+        started = time.monotonic()
+        delay = self._chat_bucket(chat_id).reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        delay = self._global.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        waited = time.monotonic() - started
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        SEND_WAIT.observe(waited)
+
+    async def call(self, chat_id, make_request):
+        """
+        Выполняет отправку в чат с учетом лимитов
+
+        Args:
+            chat_id: ID чата-получателя (для per-chat лимита)
+            make_request: Функция без аргументов, возвращающая awaitable запроса к Bot API
+
+        Returns:
+            Результат запроса (например, Message)
+        """
+        self.queue_depth += 1
+        self.queue_peak = max(self.queue_peak, self.queue_depth)
+        try:
+            attempt = 0
+            while True:
+                await self._wait_turn(chat_id)
+                try:
+                    result = await make_request()
+                except TelegramRetryAfter as e:
+                    attempt += 1
+                    if attempt > SEND_MAX_RETRIES:
+                        self.failed += 1
+                        SEND_MESSAGES.inc(result="failed")
+                        raise
+                    self.retries += 1
+                    SEND_RETRIES.inc()
+                    logger.warning(
+                        f"Flood control в чате {chat_id}: повтор через {e.retry_after} с "
+                        f"(попытка {attempt}/{SEND_MAX_RETRIES})"
+                    )
+                    self._chat_bucket(chat_id).block(e.retry_after)
+                    continue
+                except Exception:
+                    self.failed += 1
+                    SEND_MESSAGES.inc(result="failed")
+                    raise
+                self.sent += 1
+                SEND_MESSAGES.inc(result="sent")
+                return result
+        finally:
+            self.queue_depth -= 1
+
+    async def send_message(self, chat_id, text, **kwargs):
+        """bot.send_message через шлюз"""
+        return await self.call(chat_id, lambda: self.bot.send_message(chat_id, text, **kwargs))
+
+    async def send_document(self, chat_id, document, **kwargs):
+        """bot.send_document через шлюз"""
+        return await self.call(chat_id, lambda: self.bot.send_document(chat_id, document, **kwargs))
+
+    async def answer(self, message, text, **kwargs):
+        """message.answer через шлюз (ответ в тот же чат)"""
+        return await self.call(message.chat.id, lambda: message.answer(text, **kwargs))
+
+    def stats(self):
+        """Глубина очереди, время ожидания и счетчики отправок"""
+        return {
+            "queue_depth": self.queue_depth,
+            "queue_peak": self.queue_peak,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "wait_total_s": round(self.wait_total, 3),
+            "wait_max_s": round(self.wait_max, 3),
+            "chat_buckets": len(self._chats),
+        }
+
+
+# Глобальный шлюз отправки
+gateway = SendGateway(bot)
+SEND_QUEUE_DEPTH.set_function(lambda: gateway.queue_depth)
@@ -14,6 +14,23 @@ setup(
         'utils',
         'scheduler_tasks',
         'db',
+        'migrations',
+        'admin_cache',
+        'participant_cache',
+        'calendar_service',
+        'timezones',
+        'webhook',
+        'sharding',
+        'sender',
+        'report_writer',
+        'message_index',
+        'export',
+        'report_pages',
+        'search',
+        'archival',
+        'mentions',
+        'metrics',
+        'tracing',
     ],
     install_requires=[
         line.strip()
@@ -0,0 +1,221 @@
+"""
+Шардирование чатов по нескольким процессам бота
+
+Чаты делятся между SHARD_COUNT процессами по crc32(chat_id) % SHARD_COUNT.
+Процесс SHARD_INDEX планирует рассылки и проверки только для своих чатов
+(в своей таблице задач планировщика) и обрабатывает только их обновления:
+webhook пересылает чужие обновления владельцу по SHARD_PEERS.
+
+От двойных отправок защищают две записи в хранилище (SQLite или PostgreSQL):
+- аренда шарда (shard_leases): процесс рассылает, только пока продлевает
+  аренду своего индекса — второй процесс с тем же индексом ждет ее истечения;
+- отметка об отправке (daily_claims): дэйлик в чат за дату отправляет тот,
+  кто первым вставил строку (chat_id, date).
+
+При SHARD_COUNT=1 все чаты принадлежат единственному процессу, аренда
+не используется, отметки об отправке защищают от повторного запуска рассылки.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+import zlib
+
+import aiohttp
+
+from config import BOT_MODE, SHARD_COUNT, SHARD_INDEX, SHARD_PEERS, SHARD_LEASE_SECONDS, WEBHOOK_PATH
+from storage import storage
+
+logger = logging.getLogger(__name__)
+
+# Заголовок пересланного между шардами обновления (повторно не пересылается)
+FORWARDED_HEADER = "X-Shard-Forwarded"
+
+# Уникальный владелец аренды и отметок: хост, pid и случайный суффикс
+OWNER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def enabled():
+    """Включено ли шардирование (больше одного процесса)"""
+    return SHARD_COUNT > 1
+
+
+def check_config():
+    """
+    Проверяет настройки шардирования
+
+    Raises:
+        ValueError: если настройки противоречат друг другу
+    """
+    if not enabled():
+        return
+    if BOT_MODE != "webhook":
+        raise ValueError("SHARD_COUNT > 1 работает только с BOT_MODE=webhook")
+    if not 0 <= SHARD_INDEX < SHARD_COUNT:
+        raise ValueError(f"SHARD_INDEX должен быть от 0 до {SHARD_COUNT - 1}, получено {SHARD_INDEX}")
+    if len(SHARD_PEERS) != SHARD_COUNT:
+        raise ValueError(f"SHARD_PEERS должен содержать {SHARD_COUNT} URL, получено {len(SHARD_PEERS)}")
+
+
+def shard_of(chat_id):
+    """Номер шарда, которому принадлежит чат"""
+    if SHARD_COUNT <= 1:
+        return 0
+    return zlib.crc32(str(chat_id).encode()) % SHARD_COUNT
+
+
+def owns(chat_id):
+    """Принадлежит ли чат этому процессу"""
+    return shard_of(chat_id) == SHARD_INDEX
+
+
+def update_chat_id(update):
+    """ID чата, к которому относится обновление (или пользователя, если чата нет)"""
+    try:
+        event = update.event
+    except Exception:
+        return None
+    chat = getattr(event, "chat", None)
+    if chat is None:
+        # callback_query: чат — у сообщения с кнопкой
+        chat = getattr(getattr(event, "message", None), "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    return user.id if user is not None else None
+
+
+class ShardLease:
+    """Аренда шарда в таблице shard_leases с периодическим продлением"""
+
+    def __init__(self, shard=SHARD_INDEX, owner=OWNER_ID, ttl=SHARD_LEASE_SECONDS):
+        self.shard = shard
+        self.owner = owner
+        self.ttl = ttl
+        self.expires_at = 0.0
+        self._task = None
+
+    @property
+    def held(self):
+        """Аренда наша и еще не истекла"""
+        return time.time() < self.expires_at
+
+    async def try_acquire(self):
+        """Берет или продлевает аренду, если она свободна, истекла или уже наша"""
+        now = time.time()
+        expires_at = now + self.ttl
+        if await storage.shards.acquire_lease(self.shard, self.owner, expires_at, now) == self.owner:
+            self.expires_at = expires_at
+            return True
+        self.expires_at = 0.0
+        return False
+
+    async def acquire(self):
+        """Ждет, пока аренда шарда не станет нашей"""
+        while not await self.try_acquire():
+            logger.warning(f"Шард {self.shard} арендован другим процессом, ждем освобождения...")
+            await asyncio.sleep(self.ttl / 3)
+        logger.info(f"Аренда шарда {self.shard} получена ({self.owner})")
+
+    async def _renew(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            was_held = self.held
+            try:
+                if not await self.try_acquire() and was_held:
+                    logger.error(f"Аренда шарда {self.shard} перехвачена другим процессом — рассылка приостановлена")
+            except Exception as e:
+                logger.error(f"Не удалось продлить аренду шарда {self.shard}: {e}")
+
+    def start(self):
+        """Запускает фоновое продление аренды"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._renew(), name=f"shard-lease-{self.shard}")
+
+    async def release(self):
+        """Останавливает продление и освобождает аренду"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await storage.shards.release_lease(self.shard, self.owner)
+        self.expires_at = 0.0
+        logger.info(f"Аренда шарда {self.shard} освобождена")
+
+
+async def claim_daily(chat_id, date_str):
+    """
+    Отмечает отправку дэйлика в чат за дату
+
+    Returns:
+        bool: True, если отметка наша и дэйлик нужно отправить
+    """
+    return await storage.shards.claim_daily(chat_id, date_str, OWNER_ID)
+
+
+async def release_daily_claim(chat_id, date_str):
+    """Снимает свою отметку (отправка не удалась — ее можно повторить)"""
+    await storage.shards.release_claim(chat_id, date_str, OWNER_ID)
+
+
+async def prune_daily_claims(before_date):
+    """Удаляет отметки об отправке старше before_date (YYYY-MM-DD)"""
+    removed = await storage.shards.prune_claims(before_date)
+    if removed:
+        logger.info(f"Удалено старых отметок об отправке дэйликов: {removed}")
+
+
+class ShardRouter:
+    """Пересылка обновлений webhook процессу-владельцу чата"""
+
+    def __init__(self, peers=None, path=WEBHOOK_PATH):
+        self.peers = peers if peers is not None else SHARD_PEERS
+        self.path = path
+        self._session = None
+        self.forwarded = 0
+
+    def remote_owner(self, update):
+        """Номер шарда-владельца обновления или None, если оно наше"""
+        chat_id = update_chat_id(update)
+        if chat_id is None or owns(chat_id):
+            return None
+        return shard_of(chat_id)
+
+    async def forward(self, shard, body, secret):
+        """
+        Пересылает тело запроса webhook шарду shard
+
+        Returns:
+            int: HTTP-статус ответа владельца (503, если он недоступен)
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        url = self.peers[shard].rstrip("/") + self.path
+        try:
+            async with self._session.post(
+                url,
+                data=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Telegram-Bot-Api-Secret-Token": secret,
+                    FORWARDED_HEADER: "1",
+                },
+            ) as response:
+                self.forwarded += 1
+                return response.status
+        except Exception as e:
+            logger.error(f"Не удалось переслать обновление шарду {shard} ({url}): {e}")
+            return 503
+
+    async def close(self):
+        """Закрывает HTTP-сессию"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+# Аренда шарда этого процесса (используется при SHARD_COUNT > 1)
+shard_lease = ShardLease()
@@ -0,0 +1,101 @@
+"""
+Хранилище бота: репозитории поверх подключаемого бэкенда
+
+Бэкенд выбирается настройкой STORAGE_BACKEND:
+- "sqlite" (по умолчанию) — файл DB_PATH через пул aiosqlite (db.pool);
+- "postgres" — PostgreSQL по DATABASE_URL через пул asyncpg.
+
+Модули бота обращаются к данным только через репозитории глобального
+объекта storage (storage.chats, storage.participants, storage.reports,
+storage.compliance, storage.messages, storage.shards), SQL в обработчиках не пишется.
+Хранилище задач планировщика остается в файле SQLite (bot_instance.py).
+"""
+import logging
+
+import config
+from storage.base import Backend
+from storage.repositories import (
+    ChatRepository,
+    ParticipantRepository,
+    ReportRepository,
+    ComplianceRepository,
+    MessageRepository,
+    ShardRepository,
+)
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("sqlite", "postgres")
+
+
+def create_backend(name=None, dsn=None):
+    """
+    Создает бэкенд по имени
+
+    Args:
+        name: "sqlite" или "postgres" (по умолчанию config.STORAGE_BACKEND)
+        dsn: Путь к файлу SQLite или DSN PostgreSQL (по умолчанию DB_PATH / DATABASE_URL)
+
+    Raises:
+        ValueError: если бэкенд неизвестен
+    """
+    name = name or config.STORAGE_BACKEND
+    if name == "sqlite":
+        from storage.sqlite import SqliteBackend
+        return SqliteBackend(dsn)
+    if name == "postgres":
+        # asyncpg импортируется только для PostgreSQL
+        from storage.postgres import PostgresBackend
+        return PostgresBackend(dsn)
+    raise ValueError(f"Неизвестный STORAGE_BACKEND: {name} (допустимо: {', '.join(BACKENDS)})")
+
+
+class Storage:
+    """Репозитории бота и текущий бэкенд"""
+
+    def __init__(self):
+        self._backend = None
+        self.chats = ChatRepository(self)
+        self.participants = ParticipantRepository(self)
+        self.reports = ReportRepository(self)
+        self.compliance = ComplianceRepository(self)
+        self.messages = MessageRepository(self)
+        self.shards = ShardRepository(self)
+
+    @property
+    def backend(self):
+        if self._backend is None or not self._backend.is_open:
+            raise RuntimeError("Хранилище не открыто (вызовите storage.open())")
+        return self._backend
+
+    @property
+    def is_open(self):
+        return self._backend is not None and self._backend.is_open
+
+    async def open(self, backend=None, dsn=None):
+        """
+        Открывает бэкенд и применяет миграции схемы
+
+        Args:
+            backend: Имя бэкенда или готовый Backend (по умолчанию STORAGE_BACKEND)
+            dsn: Путь к файлу SQLite или DSN PostgreSQL
+        """
+        if self.is_open:
+            return
+        self._backend = backend if isinstance(backend, Backend) else create_backend(backend, dsn)
+        await self._backend.open()
+        logger.info(f"Хранилище открыто: {self._backend.name}")
+
+    async def close(self):
+        """Закрывает бэкенд"""
+        if self._backend is not None:
+            await self._backend.close()
+            self._backend = None
+
+    def stats(self):
+        """Статистика соединений текущего бэкенда"""
+        return self._backend.stats() if self._backend is not None else {}
+
+
+# Глобальное хранилище (открывается в main.main)
+storage = Storage()
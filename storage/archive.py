@@ -0,0 +1,106 @@
+"""
+Холодный архив отчетов SQLite
+
+Старые отчеты переносятся из daily_reports основной базы в файлы
+ARCHIVE_DIR/reports_YYYY.db — по одному на год даты отчета. Текст хранится
+сжатым zlib (колонка text — BLOB), читается SQL-функцией unzip(), которую
+бэкенд SQLite регистрирует на соединениях чтения. Архивы подключаются к
+соединениям чтения через ATTACH только для чтения и только когда запрос
+затрагивает их годы (см. ReportRepository.source).
+
+Запись архива (сжатие и файловый ввод-вывод) выполняется в потоке через
+asyncio.to_thread, чтобы не блокировать цикл событий.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import zlib
+
+import config
+
+ARCHIVE_FILE = re.compile(r"reports_(\d{4})\.db")
+
+ARCHIVE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS daily_reports (
+        chat_id INTEGER,
+        user_id INTEGER,
+        date TEXT,
+        reply_to_message_id INTEGER,
+        message_id INTEGER,
+        text BLOB,
+        created_at TEXT,
+        PRIMARY KEY (chat_id, user_id, date)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_daily_reports_date ON daily_reports(chat_id, date)",
+)
+
+
+def archive_path(year, directory=None):
+    """Путь к архиву отчетов за год"""
+    return os.path.join(directory or config.ARCHIVE_DIR, f"reports_{year}.db")
+
+
+def archive_alias(year):
+    """Имя схемы, под которым архив года подключается через ATTACH"""
+    return f"archive_{year}"
+
+
+def archive_years(directory=None):
+    """Годы, для которых есть файлы архива (по возрастанию)"""
+    try:
+        names = os.listdir(directory or config.ARCHIVE_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(int(match.group(1)) for match in map(ARCHIVE_FILE.fullmatch, names) if match)
+
+
+def compress(text):
+    """Текст отчета для архива (None остается None)"""
+    return zlib.compress(text.encode("utf-8")) if text is not None else None
+
+
+def decompress(blob):
+    """Обратное к compress; функция unzip() в SQL"""
+    return zlib.decompress(blob).decode("utf-8") if blob is not None else None
+
+
+async def write_archive(year, rows, directory=None):
+    """
+    Записывает отчеты в архив года (создает файл при необходимости)
+
+    Повторная запись того же отчета заменяет прежнюю, поэтому перенос,
+    прерванный между записью в архив и удалением из основной базы,
+    безопасно повторяется.
+
+    Args:
+        year: Год дат отчетов
+        rows: Список (chat_id, user_id, date, reply_to_message_id, message_id, text, created_at)
+    """
+    await asyncio.to_thread(_write_archive, year, rows, directory or config.ARCHIVE_DIR)
+
+
+def _write_archive(year, rows, directory):
+    os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(archive_path(year, directory))
+    try:
+        for statement in ARCHIVE_SCHEMA:
+            db.execute(statement)
+        db.executemany(
+            """
+            INSERT INTO daily_reports
+                (chat_id, user_id, date, reply_to_message_id, message_id, text, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(chat_id, user_id, date) DO UPDATE SET
+                reply_to_message_id = excluded.reply_to_message_id,
+                message_id = excluded.message_id,
+                text = excluded.text,
+                created_at = excluded.created_at
+            """,
+            [row[:5] + (compress(row[5]), row[6]) for row in rows]
+        )
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,74 @@
+"""
+Общий интерфейс бэкендов хранилища
+
+Репозитории (storage/repositories.py) пишут SQL один раз — с плейсхолдерами
+"?" и конструкциями, которые понимают и SQLite, и PostgreSQL (ON CONFLICT,
+COALESCE). Бэкенд выполняет запросы на своих соединениях и возвращает строки
+как кортежи, а число затронутых строк — как int.
+
+Backend — абстрактный класс: бэкенд без какого-либо из обязательных методов
+не создается (TypeError при создании, а не при первом запросе).
+"""
+import abc
+
+
+class Backend(abc.ABC):
+    """Низкоуровневый доступ к базе: чтение, запись и транзакции"""
+
+    # Имя бэкенда для STORAGE_BACKEND
+    name = None
+    # Колонка, задающая порядок добавления строк participants
+    row_order = None
+
+    @property
+    @abc.abstractmethod
+    def is_open(self):
+        """Соединения открыты"""
+
+    @abc.abstractmethod
+    async def open(self):
+        """Открывает соединения и применяет миграции схемы"""
+
+    @abc.abstractmethod
+    async def close(self):
+        """Закрывает соединения"""
+
+    @abc.abstractmethod
+    async def fetch(self, sql, args=(), attach=None):
+        """
+        Все строки результата запроса на чтение (список кортежей)
+
+        attach — архивы отчетов {псевдоним: путь к файлу}, которые запрос читает
+        как псевдоним.daily_reports (только SQLite, см. storage/archive.py)
+        """
+
+    async def fetchrow(self, sql, args=()):
+        """Первая строка результата (кортеж) или None"""
+        rows = await self.fetch(sql, args)
+        return rows[0] if rows else None
+
+    @abc.abstractmethod
+    def stream(self, sql, args=(), batch_size=500, attach=None):
+        """
+        Результат запроса на чтение пачками по batch_size строк (асинхронный генератор
+        списков кортежей): в памяти держится только текущая пачка
+        """
+
+    @abc.abstractmethod
+    def transaction(self):
+        """
+        Пишущая транзакция (асинхронный контекстный менеджер): yield-ит объект
+        с методами execute, executemany и fetchrow; при исключении изменения откатываются
+        """
+
+    async def execute(self, sql, args=()):
+        """Один пишущий запрос в своей транзакции; возвращает число затронутых строк"""
+        async with self.transaction() as tx:
+            return await tx.execute(sql, args)
+
+    async def vacuum(self):
+        """Возвращает системе место после массового удаления строк (если бэкенду это нужно)"""
+
+    def stats(self):
+        """Статистика соединений бэкенда"""
+        return {}
@@ -0,0 +1,188 @@
+"""
+Бэкенд PostgreSQL: пул соединений asyncpg
+
+Каждое соединение пула само готовит (PREPARE) выполняемые запросы и держит
+их в кэше на PG_STATEMENT_CACHE_SIZE запросов, поэтому повторяющиеся запросы
+бота (проверка отчетов, рассылка, запись ответов) разбираются сервером один
+раз на соединение. Плейсхолдеры "?" из общих запросов репозиториев
+переводятся в $1, $2, ... один раз на текст запроса.
+
+Схема описана в migrations.POSTGRES_MIGRATIONS и применяется при открытии
+под advisory-блокировкой: несколько процессов бота (шарды) могут стартовать
+одновременно.
+"""
+import logging
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+import asyncpg
+
+from config import DATABASE_URL, PG_POOL_MIN_SIZE, PG_POOL_MAX_SIZE, PG_STATEMENT_CACHE_SIZE
+from migrations import POSTGRES_MIGRATIONS
+from storage.base import Backend
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-блокировки, под которой применяются миграции
+MIGRATION_LOCK_ID = 7_311_001
+
+
+@lru_cache(maxsize=None)
+def to_postgres(sql):
+    """Заменяет плейсхолдеры "?" на $1, $2, ..."""
+    parts = sql.split("?")
+    return "".join(
+        part + (f"${i}" if i < len(parts) else "")
+        for i, part in enumerate(parts, start=1)
+    )
+
+
+def _rowcount(status):
+    """Число затронутых строк из статуса команды ("INSERT 0 1", "DELETE 3")"""
+    last = status.rsplit(" ", 1)[-1]
+    return int(last) if last.isdigit() else 0
+
+
+class PostgresTransaction:
+    """Пишущая транзакция на соединении из пула"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def execute(self, sql, args=()):
+        return _rowcount(await self.conn.execute(to_postgres(sql), *args))
+
+    async def executemany(self, sql, rows):
+        await self.conn.executemany(to_postgres(sql), rows)
+
+    async def fetchrow(self, sql, args=()):
+        row = await self.conn.fetchrow(to_postgres(sql), *args)
+        return tuple(row) if row is not None else None
+
+
+async def get_schema_version(conn):
+    """Текущая версия схемы PostgreSQL (0 для пустой базы)"""
+    return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+
+
+async def apply_migrations(conn, migrations=POSTGRES_MIGRATIONS):
+    """
+    Применяет недостающие миграции PostgreSQL, каждую в своей транзакции
+
+    Returns:
+        int: Версия схемы после применения миграций
+    """
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            applied_at TIMESTAMPTZ DEFAULT now()
+        )
+    """)
+    for version, description, steps in migrations:
+        async with conn.transaction():
+            # Параллельно стартующий процесс ждет здесь и видит уже примененную миграцию
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK_ID)
+            if version <= await get_schema_version(conn):
+                continue
+            logger.info(f"Применяю миграцию PostgreSQL {version}: {description}")
+            for step in steps:
+                if callable(step):
+                    await step(conn)
+                else:
+                    await conn.execute(step)
+            await conn.execute("INSERT INTO schema_version (version) VALUES ($1)", version)
+    return await get_schema_version(conn)
+
+
+class PostgresBackend(Backend):
+    """Хранилище в PostgreSQL (STORAGE_BACKEND=postgres)"""
+
+    name = "postgres"
+    row_order = "seq"
+
+    def __init__(self, dsn=None, min_size=PG_POOL_MIN_SIZE, max_size=PG_POOL_MAX_SIZE,
+                 statement_cache_size=PG_STATEMENT_CACHE_SIZE):
+        self.dsn = dsn or DATABASE_URL
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self._pool = None
+        # Статистика ожидания соединений
+        self._acquired = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def is_open(self):
+        return self._pool is not None
+
+    async def open(self):
+        if self.is_open:
+            return
+        if not self.dsn:
+            raise ValueError("STORAGE_BACKEND=postgres требует DATABASE_URL")
+        self._pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            statement_cache_size=self.statement_cache_size,
+        )
+        async with self._acquire() as conn:
+            version = await apply_migrations(conn)
+        logger.info(
+            f"Пул PostgreSQL открыт ({self.min_size}-{self.max_size} соединений), версия схемы {version}"
+        )
+
+    async def close(self):
+        if not self.is_open:
+            return
+        stats = self.stats()
+        await self._pool.close()
+        self._pool = None
+        logger.info(f"Пул PostgreSQL закрыт. Статистика: {stats}")
+
+    def _ensure_open(self):
+        if not self.is_open:
+            raise RuntimeError("Пул PostgreSQL не открыт (вызовите storage.open())")
+
+    @asynccontextmanager
+    async def _acquire(self):
+        self._ensure_open()
+        started = time.perf_counter()
+        async with self._pool.acquire() as conn:
+            waited = time.perf_counter() - started
+            self._acquired += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            yield conn
+
+    # Архивы отчетов (attach) бывают только у SQLite, репозитории их сюда не передают
+
+    async def fetch(self, sql, args=(), attach=None):
+        async with self._acquire() as conn:
+            return [tuple(row) for row in await conn.fetch(to_postgres(sql), *args)]
+
+    async def stream(self, sql, args=(), batch_size=500, attach=None):
+        # Серверный курсор asyncpg работает только внутри транзакции
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                cursor = await conn.cursor(to_postgres(sql), *args)
+                while rows := await cursor.fetch(batch_size):
+                    yield [tuple(row) for row in rows]
+
+    @asynccontextmanager
+    async def transaction(self):
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                yield PostgresTransaction(conn)
+
+    def stats(self):
+        return {
+            "open": self.is_open,
+            "size": self._pool.get_size() if self.is_open else 0,
+            "idle": self._pool.get_idle_size() if self.is_open else 0,
+            "acquired": self._acquired,
+            "wait_total_ms": round(self._wait_total * 1000, 2),
+            "wait_max_ms": round(self._wait_max * 1000, 2),
+        }
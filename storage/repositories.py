@@ -0,0 +1,616 @@
+"""
+Репозитории: все запросы бота к таблицам, общие для SQLite и PostgreSQL
+
+Запросы пишутся с плейсхолдерами "?" и только теми конструкциями, которые
+одинаково работают в обеих СУБД (ON CONFLICT, COALESCE, TRUE/FALSE).
+Единственное различие — колонка порядка добавления участников
+(rowid в SQLite, seq в PostgreSQL) — берется у бэкенда.
+"""
+import inspect
+
+from config import TIMEZONE
+from metrics import DB_QUERY_DURATION, timed
+from storage.archive import archive_alias, archive_path, archive_years
+from tracing import traced
+
+
+class Repository:
+    """Базовый репозиторий: запросы выполняются через текущий бэкенд хранилища"""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Время каждого запроса — в метрику bot_db_query_duration_seconds{query="report.page"}
+        # и спаном в трассировку текущего обновления
+        prefix = cls.__name__.removesuffix("Repository").lower()
+        for name, method in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.iscoroutinefunction(method):
+                query = f"{prefix}.{name}"
+                setattr(cls, name, traced("db", query)(timed(DB_QUERY_DURATION, query=query)(method)))
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    @property
+    def backend(self):
+        return self._storage.backend
+
+
+class ChatRepository(Repository):
+    """Таблица chats: настройки чатов и расписание рассылки"""
+
+    async def add(self, chat_id, title):
+        """Добавляет чат, если его еще нет"""
+        await self.backend.execute(
+            "INSERT INTO chats (chat_id, chat_title, daily_time) VALUES (?, ?, NULL) ON CONFLICT DO NOTHING",
+            (chat_id, title)
+        )
+
+    async def get(self, chat_id):
+        """Строка чата (chat_id, chat_title, daily_time, country, timezone) или None"""
+        return await self.backend.fetchrow(
+            "SELECT chat_id, chat_title, daily_time, country, timezone FROM chats WHERE chat_id = ?",
+            (chat_id,)
+        )
+
+    async def set_daily_time(self, chat_id, daily_time):
+        """
+        Меняет время рассылки чата
+
+        Returns:
+            tuple: (прежнее время рассылки или None,) или None, если чата нет в базе
+        """
+        async with self.backend.transaction() as tx:
+            row = await tx.fetchrow("SELECT daily_time FROM chats WHERE chat_id = ?", (chat_id,))
+            if row is None:
+                return None
+            await tx.execute("UPDATE chats SET daily_time = ? WHERE chat_id = ?", (daily_time, chat_id))
+        return tuple(row)
+
+    async def set_timezone(self, chat_id, tz):
+        """
+        Меняет часовой пояс чата
+
+        Returns:
+            tuple: (время рассылки, прежний пояс или None) или None, если чата нет в базе
+        """
+        async with self.backend.transaction() as tx:
+            row = await tx.fetchrow("SELECT daily_time, timezone FROM chats WHERE chat_id = ?", (chat_id,))
+            if row is None:
+                return None
+            await tx.execute("UPDATE chats SET timezone = ? WHERE chat_id = ?", (tz, chat_id))
+        return tuple(row)
+
+    async def set_country(self, chat_id, country):
+        """Меняет страну производственного календаря чата"""
+        await self.backend.execute("UPDATE chats SET country = ? WHERE chat_id = ?", (country, chat_id))
+
+    async def timezone(self, chat_id):
+        """Часовой пояс чата или None (не задан или чата нет)"""
+        row = await self.backend.fetchrow("SELECT timezone FROM chats WHERE chat_id = ?", (chat_id,))
+        return row[0] if row else None
+
+    async def in_bucket(self, daily_time, tz=TIMEZONE):
+        """Чаты с рассылкой в daily_time по поясу tz: список (chat_id, country)"""
+        return await self.backend.fetch(
+            "SELECT chat_id, country FROM chats WHERE daily_time = ? AND COALESCE(timezone, ?) = ?",
+            (daily_time, TIMEZONE, tz)
+        )
+
+    async def schedule(self):
+        """Расписание всех чатов с рассылкой: список (chat_id, пояс, HH:MM)"""
+        return await self.backend.fetch(
+            "SELECT chat_id, COALESCE(timezone, ?), daily_time FROM chats WHERE daily_time IS NOT NULL",
+            (TIMEZONE,)
+        )
+
+    async def for_member(self, user_id):
+        """Чаты, где пользователь — активный участник: список (chat_id, chat_title)"""
+        return await self.backend.fetch(
+            """
+            SELECT chats.chat_id, chats.chat_title
+            FROM chats
+            JOIN participants ON chats.chat_id = participants.chat_id
+            WHERE participants.user_id = ? AND participants.active = TRUE
+            """,
+            (user_id,)
+        )
+
+
+class ParticipantRepository(Repository):
+    """Таблица participants"""
+
+    async def list(self, chat_id):
+        """Участники чата в порядке добавления: список (user_id, username, active, is_admin)"""
+        return await self.backend.fetch(
+            "SELECT user_id, username, active, is_admin FROM participants "
+            f"WHERE chat_id = ? ORDER BY {self.backend.row_order}",
+            (chat_id,)
+        )
+
+    async def add_admins(self, chat_id, admins):
+        """Добавляет админов (user_id, username) неактивными; существующих не трогает"""
+        async with self.backend.transaction() as tx:
+            await tx.executemany(
+                "INSERT INTO participants (chat_id, user_id, username, active, is_admin) "
+                "VALUES (?, ?, ?, FALSE, TRUE) ON CONFLICT DO NOTHING",
+                [(chat_id, user_id, username) for user_id, username in admins]
+            )
+
+    async def upsert_admins(self, chat_id, admins):
+        """Добавляет новых админов неактивными, у существующих обновляет имя и флаг админа"""
+        async with self.backend.transaction() as tx:
+            await tx.executemany(
+                """
+                INSERT INTO participants (chat_id, user_id, username, active, is_admin)
+                VALUES (?, ?, ?, FALSE, TRUE)
+                ON CONFLICT(chat_id, user_id) DO UPDATE SET username = excluded.username, is_admin = TRUE
+                """,
+                [(chat_id, user_id, username) for user_id, username in admins]
+            )
+
+    async def set_active(self, chat_id, user_id, active):
+        """Включает или исключает участника из напоминаний"""
+        await self.backend.execute(
+            "UPDATE participants SET active = ? WHERE chat_id = ? AND user_id = ?",
+            (bool(active), chat_id, user_id)
+        )
+
+    async def replace(self, chat_id, user_id, username, active):
+        """Записывает участника заново (как INSERT OR REPLACE: флаг админа сбрасывается)"""
+        async with self.backend.transaction() as tx:
+            await tx.execute("DELETE FROM participants WHERE chat_id = ? AND user_id = ?", (chat_id, user_id))
+            await tx.execute(
+                "INSERT INTO participants (chat_id, user_id, username, active) VALUES (?, ?, ?, ?)",
+                (chat_id, user_id, username, bool(active))
+            )
+
+    async def display_names(self, chat_id):
+        """
+        Имена участников, полученные из Telegram (для участников без username)
+
+        Returns:
+            dict: user_id -> (display_name, display_name_at)
+        """
+        rows = await self.backend.fetch(
+            "SELECT user_id, display_name, display_name_at FROM participants "
+            "WHERE chat_id = ? AND display_name IS NOT NULL",
+            (chat_id,)
+        )
+        return {user_id: (name, resolved_at) for user_id, name, resolved_at in rows}
+
+    async def set_display_names(self, chat_id, names, resolved_at):
+        """Сохраняет имена (user_id, display_name), полученные из Telegram в resolved_at"""
+        async with self.backend.transaction() as tx:
+            await tx.executemany(
+                "UPDATE participants SET display_name = ?, display_name_at = ? WHERE chat_id = ? AND user_id = ?",
+                [(name, resolved_at, chat_id, user_id) for user_id, name in names]
+            )
+
+    async def is_active_admin(self, chat_id, user_id):
+        """Является ли пользователь активным админом чата по данным БД"""
+        row = await self.backend.fetchrow(
+            "SELECT 1 FROM participants WHERE chat_id = ? AND user_id = ? AND active = TRUE AND is_admin = TRUE",
+            (chat_id, user_id)
+        )
+        return row is not None
+
+
+# Участник, ответивший на дэйлик, становится активным (новый — добавляется)
+PARTICIPANT_UPSERT_SQL = """
+    INSERT INTO participants (chat_id, user_id, username, active)
+    VALUES (?, ?, ?, TRUE)
+    ON CONFLICT(chat_id, user_id) DO UPDATE SET active = TRUE
+    WHERE participants.active = FALSE
+"""
+
+REPORT_UPSERT_SQL = """
+    INSERT INTO daily_reports
+        (chat_id, user_id, date, reply_to_message_id, message_id, text, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(chat_id, user_id, date) DO UPDATE SET
+        reply_to_message_id=excluded.reply_to_message_id,
+        message_id=excluded.message_id,
+        text=excluded.text,
+        created_at=excluded.created_at
+"""
+
+# Новый отчет (а не замена текста за ту же дату) учитывается в статистике участника.
+# Выполняется до REPORT_UPSERT_SQL, поэтому NOT EXISTS видит, был ли отчет.
+# Отчет за дату, которую проверка уже засчитала пропуском, отменяет пропуск и
+# восстанавливает прерванную им серию.
+STATS_REPORT_SQL = """
+    INSERT INTO participant_stats (chat_id, user_id, reports, last_report_date)
+    SELECT CAST(? AS BIGINT), CAST(? AS BIGINT), 1, CAST(? AS TEXT)
+    WHERE NOT EXISTS (SELECT 1 FROM daily_reports WHERE chat_id = ? AND user_id = ? AND date = ?)
+    ON CONFLICT(chat_id, user_id) DO UPDATE SET
+        reports = participant_stats.reports + 1,
+        last_report_date = CASE
+            WHEN participant_stats.last_report_date >= excluded.last_report_date THEN participant_stats.last_report_date
+            ELSE excluded.last_report_date
+        END,
+        missed = participant_stats.missed - CASE
+            WHEN participant_stats.last_missed_date = excluded.last_report_date THEN 1 ELSE 0
+        END,
+        streak = CASE
+            WHEN participant_stats.last_missed_date = excluded.last_report_date
+            THEN participant_stats.broken_streak + participant_stats.streak + 1
+            ELSE participant_stats.streak
+        END,
+        best_streak = CASE
+            WHEN participant_stats.last_missed_date = excluded.last_report_date
+                AND participant_stats.broken_streak + participant_stats.streak + 1 > participant_stats.best_streak
+            THEN participant_stats.broken_streak + participant_stats.streak + 1
+            ELSE participant_stats.best_streak
+        END,
+        last_missed_date = CASE
+            WHEN participant_stats.last_missed_date = excluded.last_report_date THEN NULL
+            ELSE participant_stats.last_missed_date
+        END
+"""
+
+
+class ReportRepository(Repository):
+    """Таблица daily_reports (и годовые архивы отчетов SQLite)"""
+
+    def source(self, chat_id, date_from, date_to):
+        """
+        Отчеты чата за период — из основной таблицы и архивов нужных лет
+
+        Returns:
+            tuple: (выражение FROM с псевдонимом daily_reports, его аргументы,
+                    архивы для attach или None). Если архивов за эти годы нет,
+                    это сама таблица daily_reports без аргументов.
+        """
+        years = [
+            year for year in archive_years()
+            if int(date_from[:4]) <= year <= int(date_to[:4])
+        ] if self.backend.name == "sqlite" else []
+        if not years:
+            return "daily_reports", (), None
+
+        parts = ["SELECT chat_id, user_id, date, text, created_at FROM main.daily_reports "
+                 "WHERE chat_id = ? AND date BETWEEN ? AND ?"]
+        # Отчет, который уже записан в архив, но еще не удален из основной базы
+        # (перенос прервался между шагами), читается один раз — из основной базы
+        parts += [
+            f"SELECT chat_id, user_id, date, unzip(text), created_at FROM {archive_alias(year)}.daily_reports AS cold "
+            "WHERE chat_id = ? AND date BETWEEN ? AND ? AND NOT EXISTS ("
+            "SELECT 1 FROM main.daily_reports AS hot "
+            "WHERE hot.chat_id = cold.chat_id AND hot.user_id = cold.user_id AND hot.date = cold.date)"
+            for year in years
+        ]
+        sql = "(" + " UNION ALL ".join(parts) + ") AS daily_reports"
+        return sql, (chat_id, date_from, date_to) * len(parts), {archive_alias(year): archive_path(year) for year in years}
+
+    async def save_batch(self, participants, reports):
+        """
+        Одной транзакцией активирует участников, сохраняет (обновляет) отчеты
+        и учитывает новые отчеты в participant_stats
+
+        Args:
+            participants: Список (chat_id, user_id, username)
+            reports: Список (chat_id, user_id, date, reply_to_message_id, message_id, text, created_at)
+        """
+        # Повторный ответ в той же пачке — тот же отчет, в статистике он один
+        new_reports = list(dict.fromkeys(report[:3] for report in reports))
+        async with self.backend.transaction() as tx:
+            if participants:
+                await tx.executemany(PARTICIPANT_UPSERT_SQL, participants)
+            if reports:
+                await tx.executemany(STATS_REPORT_SQL, [key + key for key in new_reports])
+                await tx.executemany(REPORT_UPSERT_SQL, reports)
+
+    async def reporters(self, chat_id, date_str):
+        """ID пользователей, сдавших отчет за дату"""
+        rows = await self.backend.fetch(
+            "SELECT user_id FROM daily_reports WHERE chat_id = ? AND date = ?",
+            (chat_id, date_str)
+        )
+        return {row[0] for row in rows}
+
+    async def page(self, chat_id, date_str, cursor=None, backward=False, limit=20):
+        """
+        Страница отчетов за дату (keyset-пагинация по имени и user_id участника)
+
+        Ключ сортировки — (username, user_id), NULL-имена идут первыми. Курсор —
+        user_id крайнего участника соседней страницы: его ключ берется
+        подзапросом, поэтому страница читается по индексу без OFFSET.
+
+        Args:
+            chat_id: ID чата
+            date_str: Дата YYYY-MM-DD
+            cursor: user_id, после (или до, если backward) которого начинается страница
+                (None — с начала)
+            backward: Читать строки перед курсором
+            limit: Максимум строк
+
+        Returns:
+            list: (username, user_id, text) в порядке ключа; для backward — от курсора к началу
+        """
+        key = "COALESCE(participants.username, ''), participants.user_id"
+        source, args, attach = self.source(chat_id, date_str, date_str)
+        sql = f"""
+            SELECT participants.username, participants.user_id, daily_reports.text
+            FROM {source}
+            JOIN participants ON
+                daily_reports.chat_id = participants.chat_id AND daily_reports.user_id = participants.user_id
+            WHERE daily_reports.chat_id = ? AND daily_reports.date = ?
+        """
+        args = [*args, chat_id, date_str]
+        if cursor is not None:
+            sql += f"""
+            AND ({key}) {'<' if backward else '>'} (
+                SELECT COALESCE(username, ''), user_id FROM participants WHERE chat_id = ? AND user_id = ?
+            )
+            """
+            args += [chat_id, cursor]
+        direction = "DESC" if backward else "ASC"
+        sql += f"ORDER BY COALESCE(participants.username, '') {direction}, participants.user_id {direction} LIMIT ?"
+        args.append(limit)
+        return await self.backend.fetch(sql, tuple(args), attach=attach)
+
+    def stream_range(self, chat_id, date_from, date_to, batch_size=500):
+        """
+        Отчеты чата за период [date_from, date_to] пачками по batch_size строк
+
+        Yields:
+            list: (date, user_id, username, text, created_at) по дате и user_id
+        """
+        source, args, attach = self.source(chat_id, date_from, date_to)
+        # LEFT JOIN: отчеты удаленных из participants пользователей тоже выгружаются
+        return self.backend.stream(
+            f"""
+            SELECT daily_reports.date, daily_reports.user_id, participants.username,
+                   daily_reports.text, daily_reports.created_at
+            FROM {source}
+            LEFT JOIN participants ON
+                daily_reports.chat_id = participants.chat_id AND daily_reports.user_id = participants.user_id
+            WHERE daily_reports.chat_id = ? AND daily_reports.date BETWEEN ? AND ?
+            ORDER BY daily_reports.date, daily_reports.user_id
+            """,
+            (*args, chat_id, date_from, date_to),
+            batch_size,
+            attach=attach
+        )
+
+    async def older_than(self, date_str, limit=1000):
+        """
+        Самые старые отчеты с датой раньше date_str (для переноса в архив)
+
+        Returns:
+            list: (chat_id, user_id, date, reply_to_message_id, message_id, text, created_at)
+        """
+        return await self.backend.fetch(
+            """
+            SELECT chat_id, user_id, date, reply_to_message_id, message_id, text, created_at
+            FROM daily_reports WHERE date < ? ORDER BY date LIMIT ?
+            """,
+            (date_str, limit)
+        )
+
+    async def delete(self, keys):
+        """Удаляет отчеты по ключам (chat_id, user_id, date)"""
+        async with self.backend.transaction() as tx:
+            await tx.executemany(
+                "DELETE FROM daily_reports WHERE chat_id = ? AND user_id = ? AND date = ?",
+                keys
+            )
+
+    async def search(self, chat_id, terms, limit=10, offset=0, marks=("\x02", "\x03")):
+        """
+        Полнотекстовый поиск по отчетам чата, лучшие совпадения первыми
+
+        SQLite ищет по FTS5-индексу daily_reports_fts и ранжирует по bm25,
+        PostgreSQL — по GIN-индексу колонки text_tsv и ts_rank_cd.
+
+        Args:
+            chat_id: ID чата
+            terms: Список (слово, префикс): все слова должны встретиться в отчете,
+                слово с префиксом совпадает с любым словом, которое с него начинается
+            limit: Максимум строк
+            offset: Сколько лучших совпадений пропустить
+            marks: Маркеры начала и конца найденного слова во фрагменте
+
+        Returns:
+            list: (date, user_id, username, фрагмент текста)
+        """
+        if self.backend.name == "postgres":
+            query = " & ".join(f"{word}:*" if prefix else word for word, prefix in terms)
+            options = f"StartSel={marks[0]}, StopSel={marks[1]}, MaxWords=20, MinWords=8, ShortWord=1"
+            # Фрагменты (ts_headline — дорогая функция) строятся только для строк страницы
+            return await self.backend.fetch(
+                """
+                SELECT found.date, found.user_id, participants.username,
+                       ts_headline('simple', found.text, to_tsquery('simple', ?), ?)
+                FROM (
+                    SELECT chat_id, user_id, date, text, ts_rank_cd(text_tsv, query) AS rank
+                    FROM daily_reports, to_tsquery('simple', ?) AS query
+                    WHERE chat_id = ? AND text_tsv @@ query
+                    ORDER BY rank DESC, date DESC, user_id
+                    LIMIT ? OFFSET ?
+                ) AS found
+                LEFT JOIN participants ON
+                    found.chat_id = participants.chat_id AND found.user_id = participants.user_id
+                ORDER BY found.rank DESC, found.date DESC, found.user_id
+                """,
+                (query, options, query, chat_id, limit, offset)
+            )
+
+        # Слова в кавычках: операторы FTS5 (AND, NEAR, "-") в запросе пользователя не работают
+        query = " ".join(f'"{word}"*' if prefix else f'"{word}"' for word, prefix in terms)
+        return await self.backend.fetch(
+            """
+            SELECT daily_reports.date, daily_reports.user_id, participants.username,
+                   snippet(daily_reports_fts, 0, ?, ?, '…', 16)
+            FROM daily_reports_fts
+            JOIN daily_reports ON daily_reports.rowid = daily_reports_fts.rowid
+            LEFT JOIN participants ON
+                daily_reports.chat_id = participants.chat_id AND daily_reports.user_id = participants.user_id
+            WHERE daily_reports_fts MATCH ? AND daily_reports.chat_id = ?
+            ORDER BY bm25(daily_reports_fts), daily_reports.date DESC, daily_reports.user_id
+            LIMIT ? OFFSET ?
+            """,
+            (marks[0], marks[1], query, chat_id, limit, offset)
+        )
+
+
+class ComplianceRepository(Repository):
+    """
+    Таблица participant_stats: накопительная статистика сдачи отчетов
+
+    Счетчики обновляются инкрементально: новый отчет — в ReportRepository.save_batch,
+    итог дня — в record_check при проверке отчетов. Чтение — одна строка на участника.
+    """
+
+    async def record_check(self, chat_id, date_str, results):
+        """
+        Учитывает итог проверки отчетов за дату
+
+        Сдавшему отчет серия продлевается, не сдавшему — засчитывается пропуск
+        и серия прерывается. Повторная проверка той же (или более ранней) даты
+        ничего не меняет.
+
+        Args:
+            chat_id: ID чата
+            date_str: Дата YYYY-MM-DD
+            results: Список (user_id, сдал ли отчет) для активных участников
+        """
+        async with self.backend.transaction() as tx:
+            await tx.executemany(
+                """
+                INSERT INTO participant_stats
+                    (chat_id, user_id, expected, missed, streak, best_streak, last_missed_date, last_checked_date)
+                VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+                ON CONFLICT(chat_id, user_id) DO UPDATE SET
+                    expected = participant_stats.expected + 1,
+                    missed = participant_stats.missed + excluded.missed,
+                    streak = CASE WHEN excluded.missed = 1 THEN 0 ELSE participant_stats.streak + 1 END,
+                    best_streak = CASE
+                        WHEN excluded.missed = 0 AND participant_stats.streak + 1 > participant_stats.best_streak
+                        THEN participant_stats.streak + 1
+                        ELSE participant_stats.best_streak
+                    END,
+                    broken_streak = CASE
+                        WHEN excluded.missed = 1 THEN participant_stats.streak ELSE participant_stats.broken_streak
+                    END,
+                    last_missed_date = CASE
+                        WHEN excluded.missed = 1 THEN excluded.last_missed_date ELSE participant_stats.last_missed_date
+                    END,
+                    last_checked_date = excluded.last_checked_date
+                WHERE participant_stats.last_checked_date IS NULL
+                    OR participant_stats.last_checked_date < excluded.last_checked_date
+                """,
+                [
+                    (chat_id, user_id, 0 if reported else 1, 1 if reported else 0, 1 if reported else 0,
+                     None if reported else date_str, date_str)
+                    for user_id, reported in results
+                ]
+            )
+
+    async def for_chat(self, chat_id):
+        """
+        Статистика участников чата, лучшие по доле сдачи первыми
+
+        Returns:
+            list: (user_id, username, reports, expected, missed, streak, best_streak,
+                   last_report_date, last_checked_date)
+        """
+        return await self.backend.fetch(
+            """
+            SELECT participant_stats.user_id, participants.username, reports, expected, missed,
+                   streak, best_streak, last_report_date, last_checked_date
+            FROM participant_stats
+            LEFT JOIN participants ON
+                participant_stats.chat_id = participants.chat_id AND participant_stats.user_id = participants.user_id
+            WHERE participant_stats.chat_id = ?
+            ORDER BY CASE WHEN expected > 0 THEN 1.0 * (expected - missed) / expected ELSE 0 END DESC,
+                     streak DESC, participant_stats.user_id
+            """,
+            (chat_id,)
+        )
+
+    async def for_user(self, chat_id, user_id):
+        """Статистика одного участника (кортеж как в for_chat) или None"""
+        return await self.backend.fetchrow(
+            """
+            SELECT participant_stats.user_id, participants.username, reports, expected, missed,
+                   streak, best_streak, last_report_date, last_checked_date
+            FROM participant_stats
+            LEFT JOIN participants ON
+                participant_stats.chat_id = participants.chat_id AND participant_stats.user_id = participants.user_id
+            WHERE participant_stats.chat_id = ? AND participant_stats.user_id = ?
+            """,
+            (chat_id, user_id)
+        )
+
+
+class MessageRepository(Repository):
+    """Таблица sent_messages: отправленные дэйлики и напоминания"""
+
+    async def record(self, chat_id, message_id, kind, date_str):
+        """Запоминает отправленное сообщение (повторная запись заменяет прежнюю)"""
+        await self.backend.execute(
+            """
+            INSERT INTO sent_messages (chat_id, message_id, kind, date) VALUES (?, ?, ?, ?)
+            ON CONFLICT(chat_id, message_id) DO UPDATE SET
+                kind = excluded.kind, date = excluded.date, sent_at = CURRENT_TIMESTAMP
+            """,
+            (chat_id, message_id, kind, date_str)
+        )
+
+    async def since(self, date_str):
+        """Сообщения с датой дэйлика не раньше date_str: список (chat_id, message_id, date)"""
+        return await self.backend.fetch(
+            "SELECT chat_id, message_id, date FROM sent_messages WHERE date >= ?",
+            (date_str,)
+        )
+
+    async def prune(self, before_date):
+        """Удаляет сообщения с датой дэйлика раньше before_date; возвращает число удаленных"""
+        return await self.backend.execute("DELETE FROM sent_messages WHERE date < ?", (before_date,))
+
+
+class ShardRepository(Repository):
+    """Таблицы shard_leases и daily_claims (см. sharding.py)"""
+
+    async def acquire_lease(self, shard, owner, expires_at, now):
+        """
+        Берет или продлевает аренду шарда, если она свободна, истекла или уже принадлежит owner
+
+        Returns:
+            str | None: Владелец аренды после попытки
+        """
+        async with self.backend.transaction() as tx:
+            await tx.execute(
+                """
+                INSERT INTO shard_leases (shard, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(shard) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE shard_leases.owner = excluded.owner OR shard_leases.expires_at < ?
+                """,
+                (shard, owner, expires_at, now)
+            )
+            row = await tx.fetchrow("SELECT owner FROM shard_leases WHERE shard = ?", (shard,))
+        return row[0] if row else None
+
+    async def release_lease(self, shard, owner):
+        """Освобождает аренду шарда, если она принадлежит owner"""
+        await self.backend.execute("DELETE FROM shard_leases WHERE shard = ? AND owner = ?", (shard, owner))
+
+    async def claim_daily(self, chat_id, date_str, owner):
+        """Ставит отметку об отправке дэйлика; True, если отметка вставлена этим вызовом"""
+        inserted = await self.backend.execute(
+            "INSERT INTO daily_claims (chat_id, date, owner) VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
+            (chat_id, date_str, owner)
+        )
+        return inserted == 1
+
+    async def release_claim(self, chat_id, date_str, owner):
+        """Снимает отметку owner об отправке дэйлика"""
+        await self.backend.execute(
+            "DELETE FROM daily_claims WHERE chat_id = ? AND date = ? AND owner = ?",
+            (chat_id, date_str, owner)
+        )
+
+    async def prune_claims(self, before_date):
+        """Удаляет отметки старше before_date; возвращает число удаленных"""
+        return await self.backend.execute("DELETE FROM daily_claims WHERE date < ?", (before_date,))
@@ -0,0 +1,107 @@
+"""
+Бэкенд SQLite: пул соединений aiosqlite из db.py (один писатель, N читателей)
+"""
+import logging
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+
+import config
+from db import pool, init_db
+from storage.archive import decompress
+from storage.base import Backend
+
+logger = logging.getLogger(__name__)
+
+# Сколько архивов держать подключенными к одному соединению (лимит SQLite — 10)
+MAX_ATTACHED_ARCHIVES = 8
+
+
+class SqliteTransaction:
+    """Пишущая транзакция на соединении-писателе пула"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def execute(self, sql, args=()):
+        cursor = await self.db.execute(sql, args)
+        return cursor.rowcount
+
+    async def executemany(self, sql, rows):
+        await self.db.executemany(sql, rows)
+
+    async def fetchrow(self, sql, args=()):
+        cursor = await self.db.execute(sql, args)
+        row = await cursor.fetchone()
+        return tuple(row) if row is not None else None
+
+
+class SqliteBackend(Backend):
+    """Хранилище в файле SQLite (по умолчанию)"""
+
+    name = "sqlite"
+    row_order = "rowid"
+
+    def __init__(self, path=None):
+        self.path = path
+        # Соединение чтения -> подключенные архивы {псевдоним: путь} в порядке использования
+        self._attached = {}
+
+    @property
+    def is_open(self):
+        return pool.is_open
+
+    async def open(self):
+        await pool.open(self.path or config.DB_PATH)
+        await init_db()
+        # Текст архивных отчетов сжат (storage/archive.py)
+        await pool.create_function("unzip", 1, decompress)
+
+    async def close(self):
+        await pool.close()
+        self._attached = {}
+
+    async def _attach(self, db, archives):
+        """Подключает к соединению недостающие архивы только для чтения, вытесняя давно не нужные"""
+        attached = self._attached.setdefault(db, OrderedDict())
+        for alias, path in (archives or {}).items():
+            if alias in attached:
+                attached.move_to_end(alias)
+                continue
+            while len(attached) >= MAX_ATTACHED_ARCHIVES:
+                old, _ = attached.popitem(last=False)
+                await db.execute(f"DETACH DATABASE {old}")
+            await db.execute(f"ATTACH DATABASE ? AS {alias}", (f"file:{quote(os.path.abspath(path))}?mode=ro",))
+            attached[alias] = path
+            logger.debug(f"Архив {path} подключен как {alias}")
+
+    async def fetch(self, sql, args=(), attach=None):
+        async with pool.reader() as db:
+            await self._attach(db, attach)
+            cursor = await db.execute(sql, args)
+            return [tuple(row) for row in await cursor.fetchall()]
+
+    async def stream(self, sql, args=(), batch_size=500, attach=None):
+        async with pool.reader() as db:
+            await self._attach(db, attach)
+            cursor = await db.execute(sql, args)
+            try:
+                while rows := await cursor.fetchmany(batch_size):
+                    yield [tuple(row) for row in rows]
+            finally:
+                await cursor.close()
+
+    @asynccontextmanager
+    async def transaction(self):
+        async with pool.writer() as db:
+            yield SqliteTransaction(db)
+            await db.commit()
+
+    async def vacuum(self):
+        """Перестраивает файл базы, возвращая место, освободившееся после удаления строк"""
+        async with pool.writer() as db:
+            await db.execute("VACUUM")
+
+    def stats(self):
+        return pool.stats()
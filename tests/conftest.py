@@ -3,12 +3,23 @@
 """
 import os
 import tempfile
+import uuid
 import pytest
 import aiosqlite
 from unittest.mock import AsyncMock, MagicMock
 
 # Устанавливаем тестовые переменные окружения перед импортом модулей
-os.environ['BOT_TOKEN'] = 'TEST_TOKEN_1234567890:ABCdefGHIjklMNOpqrsTUVwxyz'
+os.environ['BOT_TOKEN'] = '1234567890:TEST_TOKEN_ABCdefGHIjklMNOpqrsTUVwxyz'
+
+
+def pytest_collection_modifyitems(config, items):
+    """Бенчмарки (маркер benchmark) выполняются только с BENCH=1"""
+    if os.getenv("BENCH") == "1":
+        return
+    skip = pytest.mark.skip(reason="бенчмарк: запустите с BENCH=1")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
 
 
 @pytest.fixture
@@ -19,30 +30,94 @@ def temp_db():
     
     yield db_path
     
-    # Cleanup
-    if os.path.exists(db_path):
-        os.unlink(db_path)
+    # Cleanup (включая служебные файлы WAL)
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.unlink(path)
 
 
 @pytest.fixture
 async def test_db(temp_db):
-    """Инициализированная тестовая база данных"""
-    from db import init_db
+    """Инициализированная тестовая база данных SQLite (хранилище открыто на ней)"""
+    from storage import storage
     import config
     
     # Подменяем путь к БД
     original_db_path = config.DB_PATH
     config.DB_PATH = temp_db
     
-    # Инициализируем БД
-    await init_db()
+    # Открываем пул соединений и инициализируем БД
+    await storage.open("sqlite")
     
     yield temp_db
     
-    # Восстанавливаем оригинальный путь
+    # Закрываем пул и восстанавливаем оригинальный путь
+    await storage.close()
     config.DB_PATH = original_db_path
 
 
+@pytest.fixture(params=["sqlite", "postgres"])
+async def storage(request, temp_db):
+    """
+    Хранилище, открытое на каждом из бэкендов
+
+    PostgreSQL-вариант выполняется, только если задан TEST_POSTGRES_DSN
+    (например, postgresql://postgres@localhost/postgres): каждый тест работает
+    в своей временной схеме, которая удаляется после теста.
+    """
+    from storage import storage
+    
+    if request.param == "sqlite":
+        await storage.open("sqlite", temp_db)
+        yield storage
+        await storage.close()
+        return
+    
+    dsn = os.getenv("TEST_POSTGRES_DSN")
+    if not dsn:
+        pytest.skip("TEST_POSTGRES_DSN не задан")
+    asyncpg = pytest.importorskip("asyncpg")
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute(f"CREATE SCHEMA {schema}")
+        # Неизвестные asyncpg параметры DSN передаются серверу как настройки соединения
+        separator = "&" if "?" in dsn else "?"
+        await storage.open("postgres", f"{dsn}{separator}search_path={schema}")
+        yield storage
+        await storage.close()
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        await conn.close()
+
+
+@pytest.fixture(autouse=True)
+def clear_admin_cache():
+    """Сбрасывает глобальный кэш админов между тестами"""
+    from admin_cache import admin_cache
+    admin_cache.clear()
+    yield
+    admin_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_participant_cache():
+    """Сбрасывает глобальный кэш участников между тестами"""
+    from participant_cache import participant_cache
+    participant_cache.clear()
+    yield
+    participant_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_chat_timezones():
+    """Сбрасывает глобальный кэш часовых поясов чатов между тестами"""
+    from timezones import chat_timezones
+    chat_timezones.clear()
+    yield
+    chat_timezones.clear()
+
+
 @pytest.fixture
 def mock_bot():
     """Mock объект бота"""
@@ -150,3 +225,50 @@ def mock_scheduler():
 
 
 
+
+
+@pytest.fixture
+async def real_scheduler(monkeypatch):
+    """Настоящий (приостановленный) планировщик вместо глобального"""
+    import scheduler_tasks
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+    scheduler = AsyncIOScheduler()
+    scheduler.start(paused=True)
+    monkeypatch.setattr(scheduler_tasks, "scheduler", scheduler)
+    yield scheduler
+    scheduler.shutdown(wait=False)
+
+
+@pytest.fixture
+def add_chats(test_db):
+    """Добавляет в тестовую базу чаты: await add_chats([(chat_id, daily_time), ...])"""
+    async def add(chats):
+        async with aiosqlite.connect(test_db) as db:
+            await db.executemany(
+                "INSERT INTO chats (chat_id, chat_title, daily_time) VALUES (?, 'Chat', ?)",
+                chats
+            )
+            await db.commit()
+    return add
+
+
+@pytest.fixture
+def add_reports():
+    """
+    Сохраняет отчеты: await add_reports(storage, [(user_id, date, text), ...])
+    или await add_reports(storage, dates=[...], users=(...)) — отчет каждого
+    из users за каждую из dates с текстом «Отчет N за date».
+
+    Чат chat_id и участники (username userN) создаются.
+    """
+    async def add(storage, reports=(), chat_id=-1001234567890, dates=(), users=(111111111, 222222222)):
+        reports = list(reports) + [
+            (user_id, date, f"Отчет {user_id % 10} за {date}") for date in dates for user_id in users
+        ]
+        await storage.chats.add(chat_id, "Test Chat")
+        await storage.reports.save_batch(
+            [(chat_id, user_id, f"user{user_id % 10}") for user_id in dict.fromkeys(row[0] for row in reports)],
+            [(chat_id, user_id, date, 1, 2, text, f"{date} 10:00:00") for user_id, date, text in reports]
+        )
+    return add
@@ -0,0 +1,106 @@
+"""
+Unit тесты для кэша администраторов
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from admin_cache import AdminCache
+
+
+def make_admin(user_id):
+    admin = MagicMock()
+    admin.user.id = user_id
+    return admin
+
+
+class TestAdminCache:
+    """Тесты для AdminCache"""
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_second_lookup_served_from_cache(self, mock_bot):
+        """Повторная проверка не ходит в Bot API"""
+        mock_bot.get_chat_administrators.return_value = [make_admin(1)]
+        cache = AdminCache(ttl=60, max_chats=10)
+        
+        assert await cache.is_admin(mock_bot, -100, 1) is True
+        assert await cache.is_admin(mock_bot, -100, 2) is False
+        
+        mock_bot.get_chat_administrators.assert_awaited_once_with(-100)
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_entry_expires_after_ttl(self, mock_bot):
+        """Запись устаревает по TTL"""
+        mock_bot.get_chat_administrators.return_value = [make_admin(1)]
+        cache = AdminCache(ttl=60, max_chats=10)
+        
+        with patch("admin_cache.time.monotonic", return_value=1000.0):
+            await cache.get_admins(mock_bot, -100)
+        with patch("admin_cache.time.monotonic", return_value=1061.0):
+            await cache.get_admins(mock_bot, -100)
+        
+        assert mock_bot.get_chat_administrators.await_count == 2
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_invalidate(self, mock_bot):
+        """После инвалидации список запрашивается заново"""
+        mock_bot.get_chat_administrators.return_value = [make_admin(1)]
+        cache = AdminCache(ttl=60, max_chats=10)
+        
+        await cache.get_admins(mock_bot, -100)
+        cache.invalidate(-100)
+        await cache.get_admins(mock_bot, -100)
+        
+        assert mock_bot.get_chat_administrators.await_count == 2
+        assert cache.stats()["invalidations"] == 1
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self, mock_bot):
+        """При переполнении вытесняется давно не использованный чат"""
+        mock_bot.get_chat_administrators.return_value = [make_admin(1)]
+        cache = AdminCache(ttl=60, max_chats=2)
+        
+        await cache.get_admins(mock_bot, -1)
+        await cache.get_admins(mock_bot, -2)
+        await cache.get_admins(mock_bot, -1)  # -1 становится самым свежим
+        await cache.get_admins(mock_bot, -3)  # вытесняет -2
+        
+        assert cache.stats()["size"] == 2
+        assert cache.stats()["evictions"] == 1
+        await cache.get_admins(mock_bot, -1)
+        assert mock_bot.get_chat_administrators.await_count == 3
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_request(self):
+        """Параллельные промахи по одному чату делают один запрос"""
+        bot = MagicMock()
+        
+        async def slow_admins(chat_id):
+            await asyncio.sleep(0.01)
+            return [make_admin(1)]
+        
+        bot.get_chat_administrators = AsyncMock(side_effect=slow_admins)
+        cache = AdminCache(ttl=60, max_chats=10)
+        
+        results = await asyncio.gather(*(cache.is_admin(bot, -100, 1) for _ in range(5)))
+        
+        assert all(results)
+        bot.get_chat_administrators.assert_awaited_once()
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_api_error_not_cached(self, mock_bot):
+        """Ошибка Bot API пробрасывается и не кэшируется"""
+        mock_bot.get_chat_administrators.side_effect = [RuntimeError("api"), [make_admin(1)]]
+        cache = AdminCache(ttl=60, max_chats=10)
+        
+        with pytest.raises(RuntimeError):
+            await cache.get_admins(mock_bot, -100)
+        assert await cache.is_admin(mock_bot, -100, 1) is True
@@ -0,0 +1,177 @@
+"""
+Integration тесты для холодного архива отчетов
+"""
+import csv
+import io
+import sqlite3
+import pytest
+from unittest.mock import patch
+
+CHAT_ID = -1001234567890
+USERS = (111111111, 222222222)
+OLD_DATES = ["2023-05-02", "2023-12-29", "2024-01-09"]
+
+
+@pytest.fixture
+def archive_dir(tmp_path):
+    """Каталог архивов во временной папке теста"""
+    import config
+
+    with patch.object(config, "ARCHIVE_DIR", str(tmp_path / "archive")):
+        yield tmp_path / "archive"
+
+
+class TestArchiveFiles:
+    """Тесты файлов архива"""
+
+    @pytest.mark.unit
+    def test_compress_roundtrip(self):
+        """Текст сжимается и восстанавливается без потерь, None остается None"""
+        from storage.archive import compress, decompress
+
+        text = "Сделал задачу 🚀 " * 50
+
+        assert len(compress(text)) < len(text.encode("utf-8"))
+        assert decompress(compress(text)) == text
+        assert compress(None) is None and decompress(None) is None
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_write_is_idempotent(self, archive_dir):
+        """Повторная запись того же отчета заменяет его, годы берутся по именам файлов"""
+        from storage.archive import archive_path, archive_years, decompress, write_archive
+
+        row = (CHAT_ID, USERS[0], "2023-05-02", 1, 2, "первый", "2023-05-02 10:00:00")
+        await write_archive(2023, [row])
+        await write_archive(2023, [row[:5] + ("второй", row[6])])
+        (archive_dir / "notes.txt").write_text("не архив")
+
+        with sqlite3.connect(archive_path(2023)) as conn:
+            texts = [decompress(blob) for blob, in conn.execute("SELECT text FROM daily_reports")]
+
+        assert texts == ["второй"]
+        assert archive_years() == [2023]
+
+
+class TestArchiveOldReports:
+    """Тесты переноса отчетов в архив"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_moves_old_reports_by_year(self, test_db, archive_dir, add_reports):
+        """Старые отчеты уходят в архивы своих лет, свежие остаются, повторный запуск ничего не делает"""
+        from archival import archive_old_reports
+        from storage import storage
+        from timezones import local_now
+
+        today = local_now().strftime("%Y-%m-%d")
+        await add_reports(storage, dates=OLD_DATES + [today])
+
+        with patch.object(storage.backend, "vacuum", wraps=storage.backend.vacuum) as vacuum:
+            summary = await archive_old_reports(horizon_days=30, batch_size=3)
+
+        assert summary["moved"] == 6
+        assert sorted(summary["years"]) == [2023, 2024]
+        vacuum.assert_awaited_once()
+        assert sorted(path.name for path in archive_dir.iterdir()) == ["reports_2023.db", "reports_2024.db"]
+        remaining = await storage.reports.older_than("9999-12-31")
+        assert sorted((row[1], row[2]) for row in remaining) == [(user_id, today) for user_id in USERS]
+        assert (await archive_old_reports(horizon_days=30))["moved"] == 0
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_interrupted_move_not_duplicated(self, test_db, archive_dir, add_reports):
+        """Отчеты, записанные в архив, но не удаленные из базы, читаются один раз и переносятся повторным запуском"""
+        from archival import archive_old_reports
+        from export import export_reports
+        from storage import storage
+
+        await add_reports(storage, dates=OLD_DATES)
+        # Процесс упал после записи в архив, до удаления из основной базы
+        with patch.object(storage.reports, "delete", side_effect=RuntimeError("killed")):
+            with pytest.raises(RuntimeError):
+                await archive_old_reports(horizon_days=30)
+
+        assert len(await storage.reports.page(CHAT_ID, "2023-05-02")) == 2
+        file, count = await export_reports(CHAT_ID, "2023-01-01", "2024-12-31", "csv")
+        file.close()
+        assert count == 6
+
+        assert (await archive_old_reports(horizon_days=30))["moved"] == 6
+        assert await storage.reports.older_than("9999-12-31") == []
+        file, count = await export_reports(CHAT_ID, "2023-01-01", "2024-12-31", "csv")
+        file.close()
+        assert count == 6
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_report_pages_read_archive(self, test_db, archive_dir, add_reports):
+        """/report за архивную дату читает архив"""
+        from archival import archive_old_reports
+        from report_pages import render_page
+        from storage import storage
+
+        await add_reports(storage, dates=OLD_DATES)
+        await archive_old_reports(horizon_days=30)
+
+        text, _ = await render_page(CHAT_ID, "2023-12-29")
+
+        assert text == (
+            "Отчёты за 2023-12-29:\n\n"
+            "@user1:\nОтчет 1 за 2023-12-29\n\n"
+            "@user2:\nОтчет 2 за 2023-12-29\n\n"
+        )
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_export_spans_hot_and_cold(self, test_db, archive_dir, add_reports):
+        """Выгрузка за период соединяет архивы разных лет и основную базу по порядку дат"""
+        from archival import archive_old_reports
+        from export import export_reports
+        from storage import storage
+
+        await add_reports(storage, dates=OLD_DATES)
+        await archive_old_reports(horizon_days=30)
+        await add_reports(storage, dates=["2024-01-10"])
+
+        file, count = await export_reports(CHAT_ID, "2023-12-01", "2024-01-31", "csv")
+        with file:
+            file.seek(0)
+            rows = list(csv.reader(io.StringIO(file.read().decode("utf-8-sig"))))[1:]
+
+        assert count == 6
+        assert [row[0] for row in rows] == ["2023-12-29"] * 2 + ["2024-01-09"] * 2 + ["2024-01-10"] * 2
+        assert rows[0][3] == "Отчет 1 за 2023-12-29"
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_attached_archives_are_evicted(self, test_db, archive_dir, add_reports):
+        """К соединению подключено не больше MAX_ATTACHED_ARCHIVES архивов, остальные отключаются"""
+        from archival import archive_old_reports
+        from storage import storage
+
+        await add_reports(storage, dates=OLD_DATES)
+        await archive_old_reports(horizon_days=30)
+
+        with patch("storage.sqlite.MAX_ATTACHED_ARCHIVES", 1):
+            for date in OLD_DATES:
+                rows = await storage.reports.page(CHAT_ID, date)
+                assert [row[2] for row in rows] == [f"Отчет {user_id % 10} за {date}" for user_id in USERS]
+
+        assert all(len(attached) <= 1 for attached in storage.backend._attached.values())
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_archive_is_read_only(self, test_db, archive_dir, add_reports):
+        """Подключенный архив нельзя изменить через соединения бота"""
+        from archival import archive_old_reports
+        from storage import storage
+
+        await add_reports(storage, dates=OLD_DATES)
+        await archive_old_reports(horizon_days=30)
+
+        with pytest.raises(sqlite3.OperationalError):
+            await storage.backend.fetch(
+                "DELETE FROM archive_2023.daily_reports",
+                attach={"archive_2023": str(archive_dir / "reports_2023.db")}
+            )
@@ -0,0 +1,240 @@
+"""
+Нагрузочные бенчмарки горячих путей: ответы на дэйлик и проверка отчетов
+
+Запускаются только с BENCH=1 (иначе пропускаются):
+
+    BENCH=1 pytest -m benchmark -s
+
+Данные синтетические: BENCH_CHATS чатов по BENCH_USERS активных участников
+на временной базе (фикстура storage: SQLite, а с TEST_POSTGRES_DSN — еще и
+PostgreSQL). Telegram заменен mock_bot с задержкой BENCH_API_LATENCY_MS на
+вызов. Параметры:
+
+    BENCH_CHATS            чатов (по умолчанию 5)
+    BENCH_USERS            участников в чате (2000)
+    BENCH_CONCURRENCY      одновременных ответов / проверок (100)
+    BENCH_API_LATENCY_MS   задержка вызова Bot API, мс (5)
+    BENCH_NAMELESS_SHARE   доля участников без username (0.2)
+    BENCH_REPORTED_SHARE   доля сдавших отчет перед проверкой (0.5)
+    BENCH_OUTPUT           файл JSONL, куда дописываются результаты
+
+Результат каждого сценария — одна JSON-строка в stdout (и в BENCH_OUTPUT):
+пропускная способность и задержки p50/p95/p99, чтобы сравнивать прогоны.
+"""
+import asyncio
+import json
+import math
+import os
+import subprocess
+import time
+import pytest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+pytestmark = pytest.mark.benchmark
+
+CHATS = int(os.getenv("BENCH_CHATS", "5"))
+USERS = int(os.getenv("BENCH_USERS", "2000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "100"))
+API_LATENCY = float(os.getenv("BENCH_API_LATENCY_MS", "5")) / 1000
+NAMELESS_SHARE = float(os.getenv("BENCH_NAMELESS_SHARE", "0.2"))
+REPORTED_SHARE = float(os.getenv("BENCH_REPORTED_SHARE", "0.5"))
+OUTPUT = os.getenv("BENCH_OUTPUT")
+
+DATE = "2025-06-02"
+DAILY_MESSAGE_ID = 1
+
+
+def chat_ids():
+    return [-1001000000000 - i for i in range(CHATS)]
+
+
+def user_id(chat_index, i):
+    return 100_000_000 + chat_index * USERS + i
+
+
+def percentile(sorted_values, share):
+    """Перцентиль по ближайшему рангу (значения отсортированы)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(len(sorted_values) * share))
+    return sorted_values[rank - 1]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def report_result(scenario, backend, latencies, duration, **extra):
+    """Печатает (и дописывает в BENCH_OUTPUT) результат сценария"""
+    latencies = sorted(latencies)
+    result = {
+        "scenario": scenario,
+        "backend": backend,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "params": {
+            "chats": CHATS,
+            "users": USERS,
+            "concurrency": CONCURRENCY,
+            "api_latency_ms": API_LATENCY * 1000,
+            "nameless_share": NAMELESS_SHARE,
+            "reported_share": REPORTED_SHARE,
+        },
+        "operations": len(latencies),
+        "duration_s": round(duration, 3),
+        "throughput_per_s": round(len(latencies) / duration, 1) if duration else None,
+        "latency_ms": {
+            name: round(percentile(latencies, share) * 1000, 2)
+            for name, share in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+        },
+        **extra,
+    }
+    line = json.dumps(result, ensure_ascii=False)
+    print(f"\n{line}")
+    if OUTPUT:
+        with open(OUTPUT, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    return result
+
+
+async def run_concurrently(operations, concurrency=CONCURRENCY):
+    """
+    Выполняет корутины-фабрики не больше concurrency одновременно
+
+    Returns:
+        tuple: (задержки каждой операции в секундах, общее время)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def run(operation):
+        async with semaphore:
+            started = time.perf_counter()
+            await operation()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(operation) for operation in operations))
+    return latencies, time.perf_counter() - started
+
+
+async def populate(storage):
+    """BENCH_CHATS чатов по BENCH_USERS активных участников; часть — без username"""
+    nameless_every = round(1 / NAMELESS_SHARE) if NAMELESS_SHARE else 0
+    for chat_index, chat_id in enumerate(chat_ids()):
+        await storage.chats.add(chat_id, f"Bench Chat {chat_index}")
+        await storage.reports.save_batch(
+            [
+                (chat_id, user_id(chat_index, i), None if nameless_every and i % nameless_every == 0 else f"user{i}")
+                for i in range(USERS)
+            ],
+            []
+        )
+
+
+def api_call(result=None):
+    """Вызов Bot API с задержкой сети"""
+    async def call(*args, **kwargs):
+        await asyncio.sleep(API_LATENCY)
+        return result(*args, **kwargs) if callable(result) else result
+    return AsyncMock(side_effect=call)
+
+
+@pytest.fixture
+def bench_index(monkeypatch):
+    """Отдельный индекс дэйликов вместо глобального"""
+    import handlers.daily
+    import scheduler_tasks
+    from message_index import MessageIndex
+
+    index = MessageIndex(retention_days=7)
+    monkeypatch.setattr(handlers.daily, "message_index", index)
+    monkeypatch.setattr(scheduler_tasks, "message_index", index)
+    return index
+
+
+class TestReplyStorm:
+    """Поток ответов на дэйлик через handle_reply"""
+
+    @pytest.mark.asyncio
+    async def test_reply_storm(self, storage, mock_bot, bench_index):
+        """Все участники всех чатов отвечают на дэйлик с BENCH_CONCURRENCY одновременных обработок"""
+        from handlers.daily import handle_reply
+        from message_index import KIND_DAILY
+        from report_writer import ReportWriter
+
+        await populate(storage)
+        for chat_id in chat_ids():
+            await bench_index.record(chat_id, DAILY_MESSAGE_ID, KIND_DAILY, DATE)
+
+        def reply(chat_id, chat_index, i):
+            message = MagicMock()
+            message.chat.id = chat_id
+            message.from_user.id = user_id(chat_index, i)
+            message.from_user.username = f"user{i}"
+            message.message_id = 1000 + i
+            message.text = f"1. Задача {i}\n2. Нет\n3. Следующая задача"
+            message.reply_to_message.from_user.id = mock_bot.id
+            message.reply_to_message.message_id = DAILY_MESSAGE_ID
+            return lambda: handle_reply(message)
+
+        writer = ReportWriter()
+        writer.start()
+        try:
+            with patch("handlers.daily.bot", mock_bot), patch("handlers.daily.report_writer", writer):
+                latencies, duration = await run_concurrently([
+                    reply(chat_id, chat_index, i)
+                    for i in range(USERS) for chat_index, chat_id in enumerate(chat_ids())
+                ])
+        finally:
+            await writer.stop()
+
+        report_result(
+            "reply_storm", storage.backend.name, latencies, duration,
+            flushes=writer.flushes, max_batch=writer.max_batch
+        )
+        assert len(await storage.reports.reporters(chat_ids()[0], DATE)) == USERS
+
+
+class TestReminderSweep:
+    """Проверка отчетов и напоминания (check_daily_reports) по всем чатам"""
+
+    @pytest.mark.asyncio
+    async def test_reminder_sweep(self, storage, mock_bot, bench_index):
+        """Проверка BENCH_CHATS чатов по BENCH_USERS участников, часть уже сдала отчет"""
+        from scheduler_tasks import check_daily_reports
+
+        await populate(storage)
+        reported = int(USERS * REPORTED_SHARE)
+        for chat_index, chat_id in enumerate(chat_ids()):
+            await storage.reports.save_batch([], [
+                (chat_id, user_id(chat_index, i), DATE, DAILY_MESSAGE_ID, 1000 + i, "Отчет", f"{DATE} 10:00:00")
+                for i in range(reported)
+            ])
+
+        message_ids = iter(range(10_000, 10_000_000))
+        mock_bot.get_chat_member = api_call(
+            lambda chat_id, user_id: SimpleNamespace(user=SimpleNamespace(first_name=f"Name {user_id}"))
+        )
+        gateway = MagicMock()
+        gateway.send_message = api_call(lambda *args, **kwargs: SimpleNamespace(message_id=next(message_ids)))
+
+        with patch("scheduler_tasks.bot", mock_bot), patch("scheduler_tasks.gateway", gateway):
+            latencies, duration = await run_concurrently([
+                lambda chat_id=chat_id: check_daily_reports(chat_id, DAILY_MESSAGE_ID, DATE)
+                for chat_id in chat_ids()
+            ])
+
+        report_result(
+            "reminder_sweep", storage.backend.name, latencies, duration,
+            get_chat_member_calls=mock_bot.get_chat_member.await_count,
+            reminders_sent=gateway.send_message.await_count
+        )
+        assert gateway.send_message.await_count >= CHATS
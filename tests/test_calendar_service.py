@@ -0,0 +1,77 @@
+"""
+Тесты для производственного календаря
+"""
+import json
+import pytest
+from datetime import date
+from unittest.mock import patch
+
+import holidays
+
+from calendar_service import CalendarService
+
+
+@pytest.fixture
+def overrides_dir(tmp_path):
+    """Каталог с файлом переносов для RU"""
+    (tmp_path / "RU.json").write_text(json.dumps({
+        "workdays": ["2025-11-01"],
+        "holidays": ["2025-11-05"],
+    }))
+    return str(tmp_path)
+
+
+class TestCalendarService:
+    """Тесты для CalendarService"""
+    
+    @pytest.mark.unit
+    def test_overrides_applied(self, overrides_dir):
+        """Переносы из файла перекрывают выходные и будни"""
+        calendar = CalendarService("RU", overrides_dir)
+        
+        assert calendar.is_workday(date(2025, 11, 1)) is True    # рабочая суббота
+        assert calendar.is_workday(date(2025, 11, 5)) is False   # дополнительный выходной
+        assert calendar.is_workday(date(2025, 11, 4)) is False   # праздник из holidays
+        assert calendar.is_workday(date(2025, 11, 6)) is True
+    
+    @pytest.mark.unit
+    def test_without_overrides_file(self, tmp_path):
+        """Без файла переносов используются только праздники из holidays"""
+        calendar = CalendarService("RU", str(tmp_path))
+        
+        assert calendar.is_workday(date(2025, 11, 1)) is False
+    
+    @pytest.mark.unit
+    def test_year_built_once(self, overrides_dir):
+        """Календарь года строится один раз, дальше проверки идут по маске"""
+        calendar = CalendarService("RU", overrides_dir)
+        
+        with patch("calendar_service.holidays.country_holidays", wraps=holidays.country_holidays) as build:
+            for day in range(1, 32):
+                calendar.is_workday(date(2025, 12, day))
+            calendar.is_workday(date(2026, 1, 1))
+        
+        assert build.call_count == 2
+    
+    @pytest.mark.unit
+    def test_matches_holidays_for_whole_year(self, tmp_path):
+        """Маска совпадает с прямой проверкой по holidays для каждого дня года"""
+        calendar = CalendarService("RU", str(tmp_path))
+        public = holidays.country_holidays("RU", years=2024)
+        
+        day = date(2024, 1, 1)
+        while day.year == 2024:
+            expected = day.weekday() < 5 and day not in public
+            assert calendar.is_workday(day) is expected, day
+            day = date.fromordinal(day.toordinal() + 1)
+    
+    @pytest.mark.unit
+    def test_country_per_call(self, overrides_dir):
+        """Календарь выбирается по коду страны чата"""
+        calendar = CalendarService("RU", overrides_dir)
+        
+        # 7 ноября — праздник в Беларуси, но не в России
+        assert calendar.is_workday(date(2025, 11, 7), "BY") is False
+        assert calendar.is_workday(date(2025, 11, 7)) is True
+        assert CalendarService.supports("by") is True
+        assert CalendarService.supports("XX") is False
@@ -50,6 +50,87 @@ class TestDatabaseInit:
             assert row[0] == 1  # Текущая версия
 
 
+class TestMigrations:
+    """Тесты движка миграций"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_all_migrations_applied(self, test_db):
+        """После init_db версия схемы равна последней миграции"""
+        from db import pool, get_schema_version, DB_VERSION
+        
+        async with pool.reader() as db:
+            assert await get_schema_version(db) == DB_VERSION
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_init_db_is_idempotent(self, test_db):
+        """Повторный init_db не применяет миграции заново"""
+        from db import init_db
+        
+        await init_db()
+        
+        async with aiosqlite.connect(test_db) as db:
+            cursor = await db.execute("SELECT COUNT(*), COUNT(DISTINCT version) FROM schema_version")
+            total, distinct = await cursor.fetchone()
+            assert total == distinct
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_failed_migration_rolled_back(self, test_db):
+        """Упавшая миграция откатывается целиком и не записывает версию"""
+        from db import pool, apply_migrations, get_schema_version, DB_VERSION
+        
+        broken = [(DB_VERSION + 1, "broken", [
+            "CREATE TABLE tmp_migration_test (id INTEGER)",
+            "INSERT INTO missing_table VALUES (1)",
+        ])]
+        
+        async with pool.writer() as db:
+            with pytest.raises(aiosqlite.OperationalError):
+                await apply_migrations(db, broken)
+            assert await get_schema_version(db) == DB_VERSION
+            cursor = await db.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'tmp_migration_test'"
+            )
+            assert await cursor.fetchone() is None
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_upgrade_normalizes_daily_time(self, temp_db):
+        """Миграция 2 приводит время рассылки старых чатов к HH:MM"""
+        from db import apply_migrations
+        from migrations import MIGRATIONS
+        
+        async with aiosqlite.connect(temp_db) as db:
+            await db.execute(
+                "CREATE TABLE schema_version (version INTEGER PRIMARY KEY, applied_at TEXT)"
+            )
+            await apply_migrations(db, MIGRATIONS[:1])
+            await db.execute("INSERT INTO chats (chat_id, daily_time) VALUES (-1, '9:5')")
+            await db.execute("INSERT INTO chats (chat_id, daily_time) VALUES (-2, NULL)")
+            await db.commit()
+            
+            await apply_migrations(db)
+            
+            cursor = await db.execute("SELECT daily_time FROM chats ORDER BY chat_id")
+            assert [row[0] for row in await cursor.fetchall()] == [None, "09:05"]
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_connection_pragmas(self, test_db):
+        """Соединения пула работают в WAL с synchronous=NORMAL"""
+        from db import pool
+        
+        async with pool.reader() as db:
+            cursor = await db.execute("PRAGMA journal_mode")
+            assert (await cursor.fetchone())[0] == "wal"
+            cursor = await db.execute("PRAGMA synchronous")
+            assert (await cursor.fetchone())[0] == 1  # NORMAL
+            cursor = await db.execute("PRAGMA busy_timeout")
+            assert (await cursor.fetchone())[0] > 0
+
+
 class TestChatsTable:
     """Тесты таблицы chats"""
     
@@ -228,6 +309,72 @@ class TestDailyReportsTable:
             assert "рефакторинг" in reports[0][1]
 
 
+class TestConnectionPool:
+    """Тесты пула соединений"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_writer_commits_visible_to_readers(self, test_db):
+        """Запись через писателя видна читателям пула"""
+        from db import pool
+        
+        async with pool.writer() as db:
+            await db.execute(
+                "INSERT INTO chats (chat_id, chat_title, daily_time) VALUES (?, ?, ?)",
+                (-100200, "Pool Chat", "09:00")
+            )
+        
+        async with pool.reader() as db:
+            cursor = await db.execute("SELECT chat_title FROM chats WHERE chat_id = ?", (-100200,))
+            row = await cursor.fetchone()
+        
+        assert row[0] == "Pool Chat"
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_writer_rolls_back_on_error(self, test_db):
+        """При исключении транзакция писателя откатывается"""
+        from db import pool
+        
+        with pytest.raises(ValueError):
+            async with pool.writer() as db:
+                await db.execute(
+                    "INSERT INTO chats (chat_id, chat_title) VALUES (?, ?)",
+                    (-100201, "Rolled back")
+                )
+                raise ValueError("boom")
+        
+        async with pool.reader() as db:
+            cursor = await db.execute("SELECT 1 FROM chats WHERE chat_id = ?", (-100201,))
+            assert await cursor.fetchone() is None
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_reader_is_read_only(self, test_db):
+        """Соединения-читатели не позволяют писать"""
+        from db import pool
+        
+        async with pool.reader() as db:
+            with pytest.raises(aiosqlite.OperationalError):
+                await db.execute("INSERT INTO chats (chat_id) VALUES (?)", (-100202,))
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_pool_stats(self, test_db):
+        """Пул отдает статистику использования"""
+        from db import pool
+        
+        async with pool.reader():
+            stats = pool.stats()
+            assert stats["readers_idle"] == stats["readers"] - 1
+        
+        stats = pool.stats()
+        assert stats["open"] is True
+        assert stats["acquired"]["reader"] >= 1
+        assert stats["acquired"]["writer"] >= 1  # init_db
+        assert stats["readers_idle"] == stats["readers"]
+
+
 class TestEnsureAdminsInDb:
     """Тесты функции ensure_admins_in_db"""
     
@@ -271,11 +418,273 @@ class TestEnsureAdminsInDb:
         config.DB_PATH = original
 
 
+CHAT_ID = -1001234567890
+
+
+async def populate(storage):
+    """Чат, три участника и один отчет — как в фикстуре populated_db"""
+    await storage.chats.add(CHAT_ID, "Test Chat")
+    await storage.chats.set_daily_time(CHAT_ID, "10:00")
+    await storage.participants.add_admins(CHAT_ID, [(111111111, "admin_user")])
+    await storage.reports.save_batch(
+        [(CHAT_ID, 111111111, "admin_user"), (CHAT_ID, 222222222, "regular_user")],
+        [(CHAT_ID, 111111111, "2025-11-26", 10001, 10002, "1. Сделал рефакторинг", "2025-11-26 10:30:00")]
+    )
+    await storage.participants.replace(CHAT_ID, 333333333, "inactive_user", active=False)
+
+
+class TestStorageChats:
+    """Репозиторий чатов на SQLite и PostgreSQL"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_add_chat_is_idempotent(self, storage):
+        """Повторное добавление чата не затирает его настройки"""
+        await storage.chats.add(-100123, "Test Chat")
+        await storage.chats.set_daily_time(-100123, "10:00")
+        await storage.chats.add(-100123, "Renamed")
+        
+        assert await storage.chats.get(-100123) == (-100123, "Test Chat", "10:00", None, None)
+        assert await storage.chats.get(-100999) is None
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_setters_return_previous_values(self, storage):
+        """Смена времени и пояса возвращает прежние значения"""
+        await storage.chats.add(-100124, "Test Chat 2")
+        
+        assert await storage.chats.set_daily_time(-100124, "10:00") == (None,)
+        assert await storage.chats.set_daily_time(-100124, "14:30") == ("10:00",)
+        assert await storage.chats.set_timezone(-100124, "Asia/Omsk") == ("14:30", None)
+        assert await storage.chats.set_timezone(-100124, "Europe/Berlin") == ("14:30", "Asia/Omsk")
+        assert await storage.chats.timezone(-100124) == "Europe/Berlin"
+        assert await storage.chats.timezone(-100999) is None
+        assert await storage.chats.set_daily_time(-100999, "10:00") is None
+        assert await storage.chats.set_timezone(-100999, "Asia/Omsk") is None
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_schedule_buckets(self, storage):
+        """Чаты без пояса попадают в пояс по умолчанию"""
+        from config import TIMEZONE
+        
+        for chat_id, tz in ((-1, None), (-2, "Asia/Omsk"), (-3, None)):
+            await storage.chats.add(chat_id, None)
+            await storage.chats.set_daily_time(chat_id, "10:00")
+            if tz:
+                await storage.chats.set_timezone(chat_id, tz)
+        await storage.chats.set_country(-3, "BY")
+        await storage.chats.add(-4, None)
+        
+        assert sorted(await storage.chats.in_bucket("10:00", TIMEZONE)) == [(-3, "BY"), (-1, None)]
+        assert await storage.chats.in_bucket("10:00", "Asia/Omsk") == [(-2, None)]
+        assert sorted(await storage.chats.schedule()) == [
+            (-3, TIMEZONE, "10:00"), (-2, "Asia/Omsk", "10:00"), (-1, TIMEZONE, "10:00")
+        ]
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_chats_for_member(self, storage):
+        """/mychats: только чаты, где пользователь активен"""
+        await populate(storage)
+        
+        assert await storage.chats.for_member(222222222) == [(CHAT_ID, "Test Chat")]
+        assert await storage.chats.for_member(333333333) == []
 
 
+class TestStorageParticipants:
+    """Репозиторий участников на SQLite и PostgreSQL"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_list_in_insertion_order(self, storage):
+        """Участники возвращаются в порядке добавления, replace переносит в конец"""
+        await populate(storage)
+        await storage.participants.replace(CHAT_ID, 111111111, "admin_renamed", active=True)
+        
+        rows = [(user_id, username, bool(active), bool(is_admin))
+                for user_id, username, active, is_admin in await storage.participants.list(CHAT_ID)]
+        assert rows == [
+            (222222222, "regular_user", True, False),
+            (333333333, "inactive_user", False, False),
+            (111111111, "admin_renamed", True, False),
+        ]
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_add_and_upsert_admins(self, storage):
+        """add_admins не трогает существующих, upsert_admins обновляет имя и флаг"""
+        await populate(storage)
+        
+        await storage.participants.add_admins(CHAT_ID, [(222222222, "renamed"), (444444444, "new_admin")])
+        rows = {row[0]: row for row in await storage.participants.list(CHAT_ID)}
+        assert rows[222222222][1] == "regular_user"
+        assert not rows[444444444][2] and rows[444444444][3]
+        
+        await storage.participants.upsert_admins(CHAT_ID, [(222222222, "renamed")])
+        rows = {row[0]: row for row in await storage.participants.list(CHAT_ID)}
+        assert rows[222222222][1:] == ("renamed", True, True)
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_set_active_and_admin_check(self, storage):
+        """/exclude и /include меняют флаг активности; /report в ЛС проверяет активного админа"""
+        await populate(storage)
+        
+        assert await storage.participants.is_active_admin(CHAT_ID, 111111111)
+        assert not await storage.participants.is_active_admin(CHAT_ID, 222222222)
+        
+        await storage.participants.set_active(CHAT_ID, 111111111, False)
+        assert not await storage.participants.is_active_admin(CHAT_ID, 111111111)
+        
+        await storage.participants.set_active(CHAT_ID, 333333333, True)
+        active = [row[0] for row in await storage.participants.list(CHAT_ID) if row[2]]
+        assert active == [222222222, 333333333]
 
 
+class TestStorageReports:
+    """Репозиторий отчетов на SQLite и PostgreSQL"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_save_batch_activates_and_upserts(self, storage):
+        """Ответ активирует участника, повторный ответ за дату заменяет отчет"""
+        await populate(storage)
+        
+        await storage.reports.save_batch(
+            [(CHAT_ID, 333333333, "inactive_user")],
+            [(CHAT_ID, 333333333, "2025-11-27", 30001, 30002, "First version", "2025-11-27 10:00:00")]
+        )
+        await storage.reports.save_batch(
+            [],
+            [(CHAT_ID, 333333333, "2025-11-27", 30001, 30003, "Updated version", "2025-11-27 11:00:00")]
+        )
+        
+        assert await storage.reports.page(CHAT_ID, "2025-11-27") == [
+            ("inactive_user", 333333333, "Updated version")
+        ]
+        rows = {row[0]: row for row in await storage.participants.list(CHAT_ID)}
+        assert rows[333333333][2]
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_reports_by_date(self, storage):
+        """Отчеты и сдавшие за дату"""
+        await populate(storage)
+        
+        reports = await storage.reports.page(CHAT_ID, "2025-11-26")
+        assert len(reports) == 1
+        assert reports[0][0] == "admin_user"
+        assert "рефакторинг" in reports[0][2]
+        assert await storage.reports.reporters(CHAT_ID, "2025-11-26") == {111111111}
+        assert await storage.reports.reporters(CHAT_ID, "2025-11-27") == set()
 
 
+class TestStorageService:
+    """Индекс сообщений, аренды шардов и отметки об отправке на SQLite и PostgreSQL"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_sent_messages(self, storage):
+        """Повторная запись сообщения заменяет дату, старые не выбираются"""
+        await storage.messages.record(CHAT_ID, 1, "daily", "2025-11-20")
+        await storage.messages.record(CHAT_ID, 2, "daily", "2025-11-25")
+        await storage.messages.record(CHAT_ID, 1, "reminder", "2025-11-26")
+        
+        assert sorted(await storage.messages.since("2025-11-24")) == [
+            (CHAT_ID, 1, "2025-11-26"), (CHAT_ID, 2, "2025-11-25")
+        ]
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_shard_lease(self, storage):
+        """Аренду получает первый владелец, после истечения — второй"""
+        assert await storage.shards.acquire_lease(0, "a", 110.0, 100.0) == "a"
+        assert await storage.shards.acquire_lease(0, "b", 115.0, 105.0) == "a"
+        assert await storage.shards.acquire_lease(0, "b", 130.0, 120.0) == "b"
+        await storage.shards.release_lease(0, "a")
+        assert await storage.shards.acquire_lease(0, "a", 135.0, 125.0) == "b"
+        await storage.shards.release_lease(0, "b")
+        assert await storage.shards.acquire_lease(0, "a", 135.0, 125.0) == "a"
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_daily_claims(self, storage):
+        """Отметку за дату ставит только первый, снятая отметка и очистка старых"""
+        assert await storage.shards.claim_daily(CHAT_ID, "2025-11-26", "a")
+        assert not await storage.shards.claim_daily(CHAT_ID, "2025-11-26", "b")
+        await storage.shards.release_claim(CHAT_ID, "2025-11-26", "b")
+        assert not await storage.shards.claim_daily(CHAT_ID, "2025-11-26", "b")
+        await storage.shards.release_claim(CHAT_ID, "2025-11-26", "a")
+        assert await storage.shards.claim_daily(CHAT_ID, "2025-11-26", "b")
+        
+        await storage.shards.claim_daily(CHAT_ID, "2025-11-27", "b")
+        assert await storage.shards.prune_claims("2025-11-27") == 1
+        assert not await storage.shards.claim_daily(CHAT_ID, "2025-11-27", "a")
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_ensure_admins_in_db(self, storage, mock_bot, mock_admin_user):
+        """Синхронизация админов работает на любом бэкенде"""
+        from db import ensure_admins_in_db
+        
+        await storage.chats.add(-100125, "Test Chat")
+        mock_bot.get_chat_administrators.return_value = [mock_admin_user]
+        
+        await ensure_admins_in_db(mock_bot, -100125)
+        
+        rows = [(user_id, username, bool(active), bool(is_admin))
+                for user_id, username, active, is_admin in await storage.participants.list(-100125)]
+        assert rows == [(111111111, "admin_user", False, True)]
 
 
+class TestBackendInterface:
+    """Интерфейс бэкендов без подключения к серверу"""
+    
+    @pytest.mark.unit
+    def test_incomplete_backend_rejected(self):
+        """Бэкенд без обязательного метода не создается"""
+        from storage.base import Backend
+        from storage.sqlite import SqliteBackend
+        
+        class NoStream(SqliteBackend):
+            stream = Backend.stream
+        
+        with pytest.raises(TypeError, match="stream"):
+            NoStream()
+        with pytest.raises(TypeError):
+            Backend()
+    
+    @pytest.mark.unit
+    def test_postgres_placeholders(self):
+        """Плейсхолдеры "?" переводятся в $1, $2, ... по порядку"""
+        from storage.postgres import to_postgres
+        
+        assert to_postgres("SELECT 1") == "SELECT 1"
+        assert to_postgres("SELECT * FROM chats WHERE chat_id = ?") == "SELECT * FROM chats WHERE chat_id = $1"
+        assert to_postgres("INSERT INTO t VALUES (?, ?, ?)") == "INSERT INTO t VALUES ($1, $2, $3)"
+        assert to_postgres("(?,?)") == "($1,$2)"
+    
+    @pytest.mark.unit
+    def test_repository_sql_translates(self):
+        """Запросы репозиториев после перевода не содержат "?", номера идут подряд"""
+        import re
+        from storage import repositories
+        from storage.postgres import to_postgres
+        
+        queries = [value for name, value in vars(repositories).items() if name.endswith("_SQL")]
+        assert queries
+        for sql in queries:
+            translated = to_postgres(sql)
+            assert "?" not in translated
+            numbers = [int(n) for n in re.findall(r"\$(\d+)", translated)]
+            assert numbers == list(range(1, sql.count("?") + 1))
+    
+    @pytest.mark.unit
+    def test_postgres_rowcount(self):
+        """Число затронутых строк берется из статуса команды"""
+        from storage.postgres import _rowcount
+        
+        assert _rowcount("INSERT 0 1") == 1
+        assert _rowcount("DELETE 3") == 3
+        assert _rowcount("CREATE TABLE") == 0
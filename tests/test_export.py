@@ -0,0 +1,142 @@
+"""
+Integration тесты для выгрузки отчетов (/export)
+"""
+import csv
+import io
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+
+CHAT_ID = -1001234567890
+
+
+class TestExportReports:
+    """Тесты export_reports на SQLite и PostgreSQL"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_csv_covers_inclusive_range(self, storage, add_reports):
+        """CSV содержит заголовок и отчеты за обе границы периода по порядку"""
+        from export import export_reports
+
+        await add_reports(storage, dates=["2025-06-01", "2025-06-02", "2025-06-03", "2025-06-04"])
+
+        file, count = await export_reports(CHAT_ID, "2025-06-02", "2025-06-03", "csv")
+        with file:
+            file.seek(0)
+            rows = list(csv.reader(io.StringIO(file.read().decode("utf-8-sig"))))
+
+        assert count == 4
+        assert rows[0] == ["date", "user_id", "username", "text", "created_at"]
+        assert [(row[0], row[1]) for row in rows[1:]] == [
+            ("2025-06-02", "111111111"), ("2025-06-02", "222222222"),
+            ("2025-06-03", "111111111"), ("2025-06-03", "222222222"),
+        ]
+        assert rows[1][2:] == ["user1", "Отчет 1 за 2025-06-02", "2025-06-02 10:00:00"]
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_jsonl_one_object_per_report(self, storage, add_reports):
+        """JSONL: по объекту на строку, кириллица без экранирования"""
+        from export import export_reports
+
+        await add_reports(storage, dates=["2025-06-01"], users=(111111111,))
+
+        file, count = await export_reports(CHAT_ID, "2025-06-01", "2025-06-01", "jsonl")
+        with file:
+            file.seek(0)
+            data = file.read().decode("utf-8")
+
+        assert count == 1
+        assert "Отчет" in data
+        assert [json.loads(line) for line in data.splitlines()] == [{
+            "date": "2025-06-01", "user_id": 111111111, "username": "user1",
+            "text": "Отчет 1 за 2025-06-01", "created_at": "2025-06-01 10:00:00",
+        }]
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_rows_read_in_batches(self, storage, add_reports):
+        """Курсор отдает строки пачками заданного размера"""
+        await add_reports(storage, dates=["2025-06-01", "2025-06-02", "2025-06-03"])
+
+        sizes = [
+            len(rows)
+            async for rows in storage.reports.stream_range(CHAT_ID, "2025-06-01", "2025-06-30", batch_size=4)
+        ]
+
+        assert sizes == [4, 2]
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_large_export_spills_to_disk(self, storage, add_reports):
+        """Файл больше порога переносится из памяти на диск"""
+        from export import export_reports
+
+        await add_reports(storage, dates=[f"2025-06-{day:02d}" for day in range(1, 31)])
+
+        file, count = await export_reports(CHAT_ID, "2025-06-01", "2025-06-30", "csv",
+                                           batch_size=7, spool_max_bytes=1024)
+        with file:
+            assert count == 60
+            assert file._rolled
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_input_file_rereads_from_start(self):
+        """Повторная отправка (после flood control) читает файл с начала"""
+        import tempfile
+        from export import SpooledInputFile
+
+        with tempfile.SpooledTemporaryFile() as file:
+            file.write(b"x" * 10)
+            document = SpooledInputFile(file, "reports.csv", chunk_size=4)
+            first = [chunk async for chunk in document.read(None)]
+            second = [chunk async for chunk in document.read(None)]
+
+        assert first == second == [b"xxxx", b"xxxx", b"xx"]
+
+
+class TestExportCommand:
+    """Тесты команды /export"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_admin_gets_document(self, test_db, mock_message, add_reports):
+        """Админ чата получает файл с отчетами в личку"""
+        from handlers.reports import cmd_export
+        from storage import storage
+
+        await add_reports(storage, dates=["2025-06-01", "2025-06-02"], users=(mock_message.from_user.id,))
+        await storage.participants.upsert_admins(CHAT_ID, [(mock_message.from_user.id, "testuser")])
+        await storage.participants.set_active(CHAT_ID, mock_message.from_user.id, True)
+        mock_message.chat.type = "private"
+        mock_message.chat.id = mock_message.from_user.id
+        command = AsyncMock(args=f"{CHAT_ID} 2025-06-02 2025-06-01 jsonl")
+
+        with patch("handlers.reports.gateway") as gateway:
+            gateway.send_document = AsyncMock()
+            gateway.answer = AsyncMock()
+            await cmd_export(mock_message, command)
+
+        gateway.answer.assert_not_called()
+        document = gateway.send_document.call_args.args[1]
+        assert document.filename == f"reports_{CHAT_ID}_2025-06-01_2025-06-02.jsonl"
+        assert gateway.send_document.call_args.kwargs["caption"] == "Отчёты за 2025-06-01 — 2025-06-02: 2"
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_non_admin_rejected(self, test_db, mock_message):
+        """Не-админ чата выгрузку не получает"""
+        from handlers.reports import cmd_export
+
+        mock_message.chat.type = "private"
+        command = AsyncMock(args=f"{CHAT_ID} 2025-06-01 2025-06-30")
+
+        with patch("handlers.reports.gateway") as gateway:
+            gateway.send_document = AsyncMock()
+            gateway.answer = AsyncMock()
+            await cmd_export(mock_message, command)
+
+        gateway.send_document.assert_not_called()
+        assert "администраторам" in gateway.answer.call_args.args[1]
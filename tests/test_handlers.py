@@ -0,0 +1,271 @@
+"""
+Integration тесты для обработчиков сообщений
+"""
+import pytest
+import aiosqlite
+from unittest.mock import AsyncMock, MagicMock, patch
+from freezegun import freeze_time
+
+CHAT_ID = -1001234567890
+
+
+@pytest.fixture
+def index(monkeypatch):
+    """Чистый индекс дэйликов вместо глобального"""
+    import handlers.daily
+    from message_index import MessageIndex
+    
+    index = MessageIndex(retention_days=7)
+    monkeypatch.setattr(handlers.daily, "message_index", index)
+    return index
+
+
+def make_reply(mock_message, parent_id, parent_text="anything", parent_date=None):
+    """Ответ пользователя на сообщение бота parent_id"""
+    from bot_instance import bot
+    from timezones import local_now
+    
+    mock_message.chat.id = CHAT_ID
+    mock_message.text = "1. Писал тесты\n2. Нет\n3. Писать тесты"
+    mock_message.reply_to_message = MagicMock()
+    mock_message.reply_to_message.from_user.id = bot.id
+    mock_message.reply_to_message.message_id = parent_id
+    mock_message.reply_to_message.text = parent_text
+    mock_message.reply_to_message.date = parent_date or local_now()
+    return mock_message
+
+
+async def fetch_report(db_path, user_id):
+    async with aiosqlite.connect(db_path) as db:
+        cursor = await db.execute(
+            "SELECT date, text FROM daily_reports WHERE chat_id = ? AND user_id = ?",
+            (CHAT_ID, user_id)
+        )
+        return await cursor.fetchall()
+
+
+class TestHandleReply:
+    """Тесты сохранения ответов на дэйлики"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_reply_to_indexed_daily_saved_for_its_date(self, populated_db, index, mock_message):
+        """Ответ на старый дэйлик сохраняется за дату этого дэйлика, а не за сегодня"""
+        from handlers.daily import handle_reply
+        from message_index import KIND_DAILY
+        
+        await index.record(CHAT_ID, 777, KIND_DAILY, "2025-11-25")
+        
+        await handle_reply(make_reply(mock_message, 777))
+        
+        rows = await fetch_report(populated_db, mock_message.from_user.id)
+        assert rows == [("2025-11-25", mock_message.text)]
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_reply_matched_regardless_of_text(self, populated_db, index, mock_message):
+        """Сопоставление не зависит от текста дэйлика"""
+        from handlers.daily import handle_reply
+        from message_index import KIND_REMINDER
+        
+        await index.record(CHAT_ID, 778, KIND_REMINDER, "2025-11-26")
+        
+        await handle_reply(make_reply(mock_message, 778, parent_text="Совсем другой текст"))
+        
+        assert len(await fetch_report(populated_db, mock_message.from_user.id)) == 1
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_reply_to_unknown_message_ignored(self, populated_db, index, mock_message):
+        """Ответ на сообщение бота, которого нет в индексе, не считается отчетом"""
+        from handlers.daily import handle_reply
+        
+        await handle_reply(make_reply(mock_message, 779, parent_text="Отправил вам отчёты в личку."))
+        
+        assert await fetch_report(populated_db, mock_message.from_user.id) == []
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_reply_to_daily_sent_before_index(self, populated_db, index, mock_message):
+        """После обновления ответ на дэйлик, отправленный до индекса, сохраняется и дэйлик попадает в индекс"""
+        from datetime import timedelta
+        from handlers.daily import handle_reply
+        from config import DAILY_TEXT
+        from timezones import local_now
+        
+        sent_at = local_now() - timedelta(days=1)
+        await handle_reply(make_reply(mock_message, 780, parent_text=DAILY_TEXT, parent_date=sent_at))
+        
+        date_str = sent_at.strftime("%Y-%m-%d")
+        assert await fetch_report(populated_db, mock_message.from_user.id) == [(date_str, mock_message.text)]
+        assert index.lookup(CHAT_ID, 780) == date_str
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_old_unindexed_daily_ignored(self, populated_db, index, mock_message):
+        """Неиндексированный дэйлик старше срока хранения индекса по тексту не принимается"""
+        from datetime import timedelta
+        from handlers.daily import handle_reply
+        from config import DAILY_TEXT
+        from timezones import local_now
+        
+        sent_at = local_now() - timedelta(days=index.retention_days + 1)
+        await handle_reply(make_reply(mock_message, 781, parent_text=DAILY_TEXT, parent_date=sent_at))
+        
+        assert await fetch_report(populated_db, mock_message.from_user.id) == []
+        assert index.lookup(CHAT_ID, 781) is None
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_active_participant_reply_reads_no_participants(self, populated_db, index, mock_message):
+        """Ответ уже активного участника (чат уже в кэшах) не читает БД и не переписывает participants"""
+        from handlers.daily import handle_reply
+        from participant_cache import participant_cache
+        from message_index import KIND_DAILY
+        from timezones import chat_timezones
+        from db import pool
+        
+        await index.record(CHAT_ID, 777, KIND_DAILY, "2025-11-26")
+        await participant_cache.all(CHAT_ID)
+        await chat_timezones.get(CHAT_ID)
+        mock_message.from_user.id = 222222222
+        readers = pool.stats()["acquired"]["reader"]
+        
+        with patch("handlers.daily.report_writer.save", AsyncMock()) as save:
+            await handle_reply(make_reply(mock_message, 777))
+        
+        assert pool.stats()["acquired"]["reader"] == readers
+        assert save.await_args.kwargs["participant"] is None
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_inactive_participant_reactivated(self, populated_db, index, mock_message):
+        """Ответ неактивного участника возвращает его в активные — в БД и в кэше"""
+        from handlers.daily import handle_reply
+        from participant_cache import participant_cache
+        from message_index import KIND_DAILY
+        
+        await index.record(CHAT_ID, 777, KIND_DAILY, "2025-11-26")
+        mock_message.from_user.id = 333333333
+        
+        await handle_reply(make_reply(mock_message, 777))
+        
+        assert (await participant_cache.get(CHAT_ID, 333333333)).active is True
+        async with aiosqlite.connect(populated_db) as db:
+            cursor = await db.execute(
+                "SELECT active FROM participants WHERE chat_id = ? AND user_id = ?", (CHAT_ID, 333333333)
+            )
+            assert (await cursor.fetchone())[0] == 1
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_created_at_in_chat_timezone(self, populated_db, index, mock_message):
+        """Время отчета записывается по часовому поясу чата"""
+        from handlers.daily import handle_reply
+        from message_index import KIND_DAILY
+        
+        async with aiosqlite.connect(populated_db) as db:
+            await db.execute("UPDATE chats SET timezone = 'Asia/Vladivostok' WHERE chat_id = ?", (CHAT_ID,))
+            await db.commit()
+        await index.record(CHAT_ID, 777, KIND_DAILY, "2025-11-26")
+        
+        with freeze_time("2025-11-26 20:30:00"):  # UTC, во Владивостоке уже 27-е
+            await handle_reply(make_reply(mock_message, 777))
+        
+        async with aiosqlite.connect(populated_db) as db:
+            cursor = await db.execute(
+                "SELECT date, created_at FROM daily_reports WHERE chat_id = ? AND user_id = ?",
+                (CHAT_ID, mock_message.from_user.id)
+            )
+            assert await cursor.fetchone() == ("2025-11-26", "2025-11-27 06:30:00")
+
+
+class TestSetTime:
+    """Тесты команды /settime"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_unregistered_chat_rejected(self, test_db, mock_message):
+        """Для чата не из базы задача рассылки не создается"""
+        from handlers.admin import cmd_settime
+        from storage import storage
+        
+        command = AsyncMock(args="10:00")
+        
+        with patch("handlers.admin.admin_cache.is_admin", AsyncMock(return_value=True)), \
+             patch("handlers.admin.reschedule_chat_daily", AsyncMock()) as reschedule, \
+             patch("handlers.admin.gateway") as gateway:
+            gateway.answer = AsyncMock()
+            await cmd_settime(mock_message, command)
+        
+        gateway.answer.assert_awaited_once()
+        assert "не зарегистрирован" in gateway.answer.await_args.args[1]
+        reschedule.assert_not_awaited()
+        assert await storage.chats.get(mock_message.chat.id) is None
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_registered_chat_rescheduled(self, test_db, mock_message):
+        """Время зарегистрированного чата сохраняется, задача переносится с прежнего времени"""
+        from handlers.admin import cmd_settime
+        from storage import storage
+        from config import TIMEZONE
+        
+        await storage.chats.add(mock_message.chat.id, "Test Chat")
+        await storage.chats.set_daily_time(mock_message.chat.id, "10:00")
+        command = AsyncMock(args="9:5")
+        
+        with patch("handlers.admin.admin_cache.is_admin", AsyncMock(return_value=True)), \
+             patch("handlers.admin.reschedule_chat_daily", AsyncMock()) as reschedule, \
+             patch("handlers.admin.gateway") as gateway:
+            gateway.answer = AsyncMock()
+            await cmd_settime(mock_message, command)
+        
+        reschedule.assert_awaited_once_with("10:00", "09:05", TIMEZONE, TIMEZONE)
+        assert (await storage.chats.get(mock_message.chat.id))[2] == "09:05"
+
+
+class TestSetTimezone:
+    """Тесты команды /settz"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_unregistered_chat_rejected(self, test_db, mock_message):
+        """Для чата не из базы пояс не запоминается в кэше и задачи рассылки не трогаются"""
+        from handlers.admin import cmd_settz
+        from timezones import chat_timezones
+        from config import TIMEZONE
+        
+        command = AsyncMock(args="Asia/Omsk")
+        
+        with patch("handlers.admin.admin_cache.is_admin", AsyncMock(return_value=True)), \
+             patch("handlers.admin.reschedule_chat_daily", AsyncMock()) as reschedule, \
+             patch("handlers.admin.gateway") as gateway:
+            gateway.answer = AsyncMock()
+            await cmd_settz(mock_message, command)
+        
+        assert "не зарегистрирован" in gateway.answer.await_args.args[1]
+        reschedule.assert_not_awaited()
+        assert await chat_timezones.get(mock_message.chat.id) == TIMEZONE
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_registered_chat_updated(self, test_db, mock_message):
+        """Пояс зарегистрированного чата сохраняется и задачи рассылки переносятся"""
+        from handlers.admin import cmd_settz
+        from storage import storage
+        from timezones import chat_timezones
+        from config import TIMEZONE
+        
+        await storage.chats.add(mock_message.chat.id, "Test Chat")
+        await storage.chats.set_daily_time(mock_message.chat.id, "10:00")
+        command = AsyncMock(args="Asia/Omsk")
+        
+        with patch("handlers.admin.admin_cache.is_admin", AsyncMock(return_value=True)), \
+             patch("handlers.admin.reschedule_chat_daily", AsyncMock()) as reschedule, \
+             patch("handlers.admin.gateway") as gateway:
+            gateway.answer = AsyncMock()
+            await cmd_settz(mock_message, command)
+        
+        reschedule.assert_awaited_once_with("10:00", "10:00", TIMEZONE, "Asia/Omsk")
+        assert await chat_timezones.get(mock_message.chat.id) == "Asia/Omsk"
@@ -0,0 +1,125 @@
+"""
+Тесты раскладки упоминаний в напоминаниях
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+CHAT_ID = -1001234567890
+
+
+def entity_text(text, entity):
+    """Текст под сущностью (смещения — в единицах UTF-16)"""
+    encoded = text.encode("utf-16-le")
+    return encoded[entity.offset * 2:(entity.offset + entity.length) * 2].decode("utf-16-le")
+
+
+class TestPackMentions:
+    """Тесты pack_mentions"""
+
+    @pytest.mark.unit
+    def test_offsets_in_utf16(self):
+        """Смещения и длины считаются в UTF-16: эмодзи в имени занимает две единицы"""
+        from mentions import pack_mentions, utf16_len
+
+        [(text, entities)] = pack_mentions([(1, "Аня 🚀"), (2, "bob"), (3, "Ёж")], footer="Ждем")
+
+        assert text == "Аня 🚀 bob Ёж\nЖдем"
+        assert [(e.offset, e.length) for e in entities] == [(0, 6), (7, 3), (11, 2)]
+        assert [entity_text(text, e) for e in entities] == ["Аня 🚀", "bob", "Ёж"]
+        assert [(e.type, e.user.id) for e in entities] == [("text_mention", 1), ("text_mention", 2), ("text_mention", 3)]
+        assert utf16_len("🚀") == 2
+
+    @pytest.mark.unit
+    def test_packs_by_length(self):
+        """Сообщение заполняется по длине текста с подписью, не превышая лимит"""
+        from mentions import pack_mentions, utf16_len
+
+        users = [(i, "x" * 20) for i in range(10)]
+        messages = pack_mentions(users, footer="Ждем", max_length=70, max_mentions=100)
+
+        # 3 имени по 20 + 2 пробела + "\nЖдем" = 67 <= 70, четвертое не помещается
+        assert [len(entities) for _, entities in messages] == [3, 3, 3, 1]
+        assert all(utf16_len(text) <= 70 for text, _ in messages)
+        assert [e.user.id for _, entities in messages for e in entities] == list(range(10))
+
+    @pytest.mark.unit
+    def test_packs_by_mention_count(self):
+        """Короткие имена упираются в лимит упоминаний, а не в длину"""
+        from mentions import pack_mentions
+
+        messages = pack_mentions([(i, f"u{i}") for i in range(120)], max_mentions=50)
+
+        assert [len(entities) for _, entities in messages] == [50, 50, 20]
+
+    @pytest.mark.unit
+    def test_names_normalized(self):
+        """Переводы строк и пустые имена не ломают текст напоминания"""
+        from mentions import NAME_MAX_LENGTH, pack_mentions
+
+        [(text, entities)] = pack_mentions([(1, "Иван\nИванов "), (2, "   "), (3, "я" * 100)], footer="")
+
+        assert [entity_text(text, e) for e in entities] == ["Иван Иванов", "User 2", "я" * NAME_MAX_LENGTH]
+
+
+class TestSplitParts:
+    """Тесты split_parts и fit_parts"""
+
+    @pytest.mark.unit
+    def test_splits_by_utf16_length(self):
+        """Части не разрываются, длина сообщения считается в UTF-16"""
+        from mentions import split_parts, utf16_len
+
+        messages = split_parts(["🚀" * 10 + "\n"] * 5, max_length=45)
+
+        assert [len(parts) for parts in messages] == [2, 2, 1]
+        assert all(utf16_len("".join(parts)) <= 45 for parts in messages)
+
+    @pytest.mark.unit
+    def test_long_part_truncated(self):
+        """Часть длиннее лимита обрезается, не разрывая суррогатную пару"""
+        from mentions import split_parts, utf16_len
+
+        [[part], [short]] = split_parts(["a" + "🚀" * 10, "b"], max_length=6)
+
+        assert part == "a🚀🚀…"
+        assert utf16_len(part) <= 6
+        assert short == "b"
+
+    @pytest.mark.unit
+    def test_fit_trims_longest_parts(self):
+        """fit_parts обрезает только длинные части до общей длины, короткие не трогает"""
+        from mentions import fit_parts, utf16_len
+
+        parts = fit_parts(["a" * 3, "b" * 20, "🚀" * 20], max_length=23)
+
+        assert parts == ["aaa", "b" * 9 + "…", "🚀" * 4 + "…"]
+        assert utf16_len("".join(parts)) <= 23
+        assert fit_parts(["a", "b"], max_length=5) == ["a", "b"]
+
+
+class TestReminderMessages:
+    """Тесты отправки напоминаний"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_check_sends_text_mentions(self, test_db):
+        """Напоминание уходит с сущностями text_mention без HTML-разметки"""
+        from scheduler_tasks import check_daily_reports
+        from storage import storage
+
+        await storage.chats.add(CHAT_ID, "Test Chat")
+        await storage.reports.save_batch([(CHAT_ID, 111111111, "<alice>"), (CHAT_ID, 222222222, "bob")], [])
+
+        with patch("scheduler_tasks.gateway") as gateway, \
+             patch("scheduler_tasks.message_index.record", AsyncMock()):
+            gateway.send_message = AsyncMock(return_value=MagicMock(message_id=10))
+            await check_daily_reports(CHAT_ID, 1, "2025-06-02")
+
+        gateway.send_message.assert_awaited_once()
+        text = gateway.send_message.await_args.args[1]
+        kwargs = gateway.send_message.await_args.kwargs
+        assert text == "<alice> bob\nЖду Текстовый Дейлик!"
+        assert "parse_mode" not in kwargs
+        assert [(e.user.id, entity_text(text, e)) for e in kwargs["entities"]] == [
+            (111111111, "<alice>"), (222222222, "bob")
+        ]
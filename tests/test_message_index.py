@@ -0,0 +1,103 @@
+"""
+Integration тесты для индекса отправленных дэйликов
+"""
+import pytest
+import aiosqlite
+
+from message_index import MessageIndex, KIND_DAILY, KIND_REMINDER
+
+CHAT_ID = -1001234567890
+
+
+class TestMessageIndex:
+    """Тесты для MessageIndex"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_record_and_lookup(self, test_db):
+        """Записанное сообщение находится по (chat_id, message_id)"""
+        index = MessageIndex(retention_days=7)
+        
+        await index.record(CHAT_ID, 100, KIND_DAILY, "2025-11-26")
+        await index.record(CHAT_ID, 101, KIND_REMINDER, "2025-11-26")
+        
+        assert index.lookup(CHAT_ID, 100) == "2025-11-26"
+        assert index.lookup(CHAT_ID, 101) == "2025-11-26"
+        assert index.lookup(CHAT_ID, 102) is None
+        assert index.lookup(-1, 100) is None
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_load_restores_recent_messages(self, test_db):
+        """После перезапуска индекс восстанавливается из БД в пределах срока хранения"""
+        index = MessageIndex(retention_days=7)
+        await index.record(CHAT_ID, 1, KIND_DAILY, "2025-11-01")
+        await index.record(CHAT_ID, 2, KIND_DAILY, "2025-11-26")
+        
+        restored = MessageIndex(retention_days=7)
+        await restored.load(today="2025-11-27")
+        
+        assert restored.lookup(CHAT_ID, 2) == "2025-11-26"
+        assert restored.lookup(CHAT_ID, 1) is None
+        assert len(restored) == 1
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_old_entries_pruned_on_new_date(self, test_db):
+        """С первым сообщением новой даты устаревшие записи уходят из памяти"""
+        index = MessageIndex(retention_days=2)
+        await index.record(CHAT_ID, 1, KIND_DAILY, "2025-11-20")
+        await index.record(CHAT_ID, 2, KIND_DAILY, "2025-11-26")
+        
+        assert index.lookup(CHAT_ID, 1) is None
+        assert index.lookup(CHAT_ID, 2) == "2025-11-26"
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_prune_removes_old_messages(self, storage):
+        """Из sent_messages удаляются сообщения с датой дэйлика раньше границы"""
+        await storage.messages.record(CHAT_ID, 1, KIND_DAILY, "2025-11-01")
+        await storage.messages.record(CHAT_ID, 2, KIND_REMINDER, "2025-11-19")
+        await storage.messages.record(CHAT_ID, 3, KIND_DAILY, "2025-11-20")
+        
+        assert await storage.messages.prune("2025-11-20") == 2
+        assert await storage.messages.since("2000-01-01") == [(CHAT_ID, 3, "2025-11-20")]
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_schedule_all_dailies_prunes_messages(self, test_db, mock_scheduler, monkeypatch):
+        """Сверка расписаний при запуске удаляет сообщения старше срока хранения индекса"""
+        import scheduler_tasks
+        from storage import storage
+        from timezones import local_now
+        
+        today = local_now().strftime("%Y-%m-%d")
+        await storage.messages.record(CHAT_ID, 1, KIND_DAILY, "2000-01-01")
+        await storage.messages.record(CHAT_ID, 2, KIND_DAILY, today)
+        mock_scheduler.get_jobs.return_value = []
+        monkeypatch.setattr(scheduler_tasks, "scheduler", mock_scheduler)
+        
+        await scheduler_tasks.schedule_all_dailies()
+        
+        assert [row[1] for row in await storage.messages.since("2000-01-01")] == [2]
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_migration_backfills_from_reports(self, temp_db):
+        """Миграция восстанавливает индекс по ответам, сданным до её появления"""
+        from db import apply_migrations
+        from migrations import MIGRATIONS
+        
+        async with aiosqlite.connect(temp_db) as db:
+            await db.execute("CREATE TABLE schema_version (version INTEGER PRIMARY KEY, applied_at TEXT)")
+            await apply_migrations(db, MIGRATIONS[:2])
+            await db.execute(
+                "INSERT INTO daily_reports (chat_id, user_id, date, reply_to_message_id, message_id, text) "
+                "VALUES (?, 1, '2025-11-26', 500, 501, 'r'), (?, 2, '2025-11-26', 500, 502, 'r')",
+                (CHAT_ID, CHAT_ID)
+            )
+            await db.commit()
+            await apply_migrations(db, MIGRATIONS[:3])
+            
+            cursor = await db.execute("SELECT chat_id, message_id, kind, date FROM sent_messages")
+            assert await cursor.fetchall() == [(CHAT_ID, 500, KIND_DAILY, "2025-11-26")]
@@ -0,0 +1,250 @@
+"""
+Тесты метрик Prometheus
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from aiohttp.test_utils import TestClient, TestServer
+
+CHAT_ID = -1001234567890
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    """Каждый тест начинает с пустых значений метрик"""
+    from metrics import registry
+
+    registry.clear()
+    yield
+    registry.clear()
+
+
+class TestRegistry:
+    """Тесты реестра и текстового формата"""
+
+    @pytest.mark.unit
+    def test_histogram_buckets_are_cumulative(self):
+        """Корзины гистограммы в выводе накопительные, есть _sum, _count и +Inf"""
+        from metrics import Registry
+
+        registry = Registry()
+        histogram = registry.histogram("test_seconds", "Тест", ["kind"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value, kind="a")
+
+        lines = registry.render().splitlines()
+
+        assert lines[:2] == ["# HELP test_seconds Тест", "# TYPE test_seconds histogram"]
+        assert lines[2:] == [
+            'test_seconds_bucket{kind="a",le="0.1"} 1',
+            'test_seconds_bucket{kind="a",le="1.0"} 3',
+            'test_seconds_bucket{kind="a",le="+Inf"} 4',
+            'test_seconds_sum{kind="a"} 4.25',
+            'test_seconds_count{kind="a"} 4',
+        ]
+
+    @pytest.mark.unit
+    def test_counter_labels_are_checked_and_escaped(self):
+        """Счетчик требует ровно свои метки и экранирует их значения"""
+        from metrics import Registry
+
+        registry = Registry()
+        counter = registry.counter("test_total", "Тест", ["method"])
+        counter.inc(method='say "hi"')
+        counter.inc(2, method='say "hi"')
+
+        with pytest.raises(ValueError):
+            counter.inc(result="ok")
+        with pytest.raises(ValueError):
+            registry.counter("test_total", "Дубликат")
+        assert 'test_total{method="say \\"hi\\""} 3' in registry.render()
+
+
+    @pytest.mark.unit
+    def test_gauge_function_read_on_render(self):
+        """Датчик с функцией считается при каждом выводе и переживает clear"""
+        from metrics import Registry
+
+        registry = Registry()
+        gauge = registry.gauge("test_depth", "Тест", ["queue"])
+        depth = [3]
+        gauge.set_function(lambda: depth[0], queue="send")
+        gauge.set(7, queue="other")
+
+        assert 'test_depth{queue="send"} 3' in registry.render()
+        depth[0] = 5
+        registry.clear()
+        assert gauge.value(queue="send") == 5
+        assert "# TYPE test_depth gauge" in registry.render()
+        assert 'test_depth{queue="send"} 5' in registry.render()
+        assert gauge.value(queue="other") == 0
+
+
+class TestCollectors:
+    """Тесты перехватчиков обработчиков, Bot API и планировщика"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_handler_middleware(self):
+        """Время обработчика пишется и при успехе, и при исключении; исключение считается"""
+        from metrics import HANDLER_DURATION, HANDLER_ERRORS, HandlerMetricsMiddleware
+
+        async def cmd_test(message):
+            pass
+
+        name = f"{__name__}.{cmd_test.__qualname__}"
+        middleware = HandlerMetricsMiddleware()
+        data = {"handler": SimpleNamespace(callback=cmd_test)}
+
+        assert await middleware(AsyncMock(return_value="done"), object(), data) == "done"
+        with pytest.raises(RuntimeError):
+            await middleware(AsyncMock(side_effect=RuntimeError), object(), data)
+
+        assert HANDLER_DURATION.count(handler=name) == 2
+        assert HANDLER_ERRORS.value(handler=name) == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_bot_api_middleware(self):
+        """Вызовы Bot API считаются по методу и результату"""
+        from aiogram.methods import SendMessage
+        from metrics import API_DURATION, API_REQUESTS, BotApiMetricsMiddleware
+
+        middleware = BotApiMetricsMiddleware()
+        method = SendMessage(chat_id=CHAT_ID, text="привет")
+
+        await middleware(AsyncMock(return_value=True), None, method)
+        with pytest.raises(TimeoutError):
+            await middleware(AsyncMock(side_effect=TimeoutError), None, method)
+
+        assert API_REQUESTS.value(method="sendMessage", result="ok") == 1
+        assert API_REQUESTS.value(method="sendMessage", result="TimeoutError") == 1
+        assert API_DURATION.count(method="sendMessage") == 2
+
+    @pytest.mark.unit
+    def test_scheduler_lag(self):
+        """Опоздание задачи считается от последнего запланированного запуска, по виду задачи"""
+        from metrics import SCHEDULER_LAG, on_job_submitted
+
+        late = datetime.now(timezone.utc) - timedelta(seconds=3)
+        on_job_submitted(SimpleNamespace(job_id=f"daily:{CHAT_ID}", scheduled_run_times=[late]))
+        on_job_submitted(SimpleNamespace(job_id="archive-reports", scheduled_run_times=[]))
+
+        state = SCHEDULER_LAG._values[("daily",)]
+        assert state[2] == 1 and 3 <= state[1] < 60
+        assert SCHEDULER_LAG.count(job="archive-reports") == 0
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_repository_queries_are_timed(self, storage):
+        """Методы репозиториев попадают в гистограмму под именем repo.method"""
+        from metrics import DB_QUERY_DURATION
+
+        await storage.chats.add(CHAT_ID, "Test Chat")
+        await storage.reports.page(CHAT_ID, "2025-06-02")
+        await storage.reports.page(CHAT_ID, "2025-06-03")
+
+        assert DB_QUERY_DURATION.count(query="chat.add") == 1
+        assert DB_QUERY_DURATION.count(query="report.page") == 2
+
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_pool_metrics(self, test_db):
+        """Ожидание соединений пула — в гистограмму, свободные читатели — датчиком"""
+        from db import pool
+        from metrics import DB_POOL_READERS_IDLE, DB_POOL_WAIT, DB_POOL_WRITER_BUSY
+
+        # init_db в фикстуре уже брал соединения
+        readers, writers = DB_POOL_WAIT.count(role="reader"), DB_POOL_WAIT.count(role="writer")
+        async with pool.reader():
+            assert DB_POOL_READERS_IDLE.value() == pool.readers_count - 1
+        async with pool.writer():
+            assert DB_POOL_WRITER_BUSY.value() == 1
+
+        assert DB_POOL_READERS_IDLE.value() == pool.readers_count
+        assert DB_POOL_WRITER_BUSY.value() == 0
+        assert DB_POOL_WAIT.count(role="reader") == readers + 1
+        assert DB_POOL_WAIT.count(role="writer") == writers + 1
+
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_admin_cache_metrics(self):
+        """Попадания, промахи, сбросы и вытеснения кэша админов — в счетчики"""
+        from admin_cache import AdminCache
+        from metrics import ADMIN_CACHE_EVICTIONS, ADMIN_CACHE_INVALIDATIONS, ADMIN_CACHE_REQUESTS
+
+        cache = AdminCache(ttl=60, max_chats=1)
+        bot = AsyncMock()
+        bot.get_chat_administrators.return_value = []
+
+        await cache.get_admin_ids(bot, CHAT_ID)
+        await cache.get_admin_ids(bot, CHAT_ID)
+        await cache.get_admin_ids(bot, CHAT_ID - 1)
+        cache.invalidate(CHAT_ID - 1)
+
+        assert ADMIN_CACHE_REQUESTS.value(result="hit") == 1
+        assert ADMIN_CACHE_REQUESTS.value(result="miss") == 2
+        assert ADMIN_CACHE_EVICTIONS.value() == 1
+        assert ADMIN_CACHE_INVALIDATIONS.value() == 1
+
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_send_gateway_metrics(self):
+        """Глубина очереди шлюза — датчиком, ожидание, результаты и повторы — в метрики"""
+        from aiogram.exceptions import TelegramRetryAfter
+        from aiogram.methods import SendMessage
+        from metrics import SEND_MESSAGES, SEND_QUEUE_DEPTH, SEND_RETRIES, SEND_WAIT
+        from sender import gateway
+
+        depths = []
+        attempts = iter([TelegramRetryAfter(method=SendMessage(chat_id=CHAT_ID, text="x"), message="", retry_after=0), None])
+
+        async def send():
+            depths.append(SEND_QUEUE_DEPTH.value())
+            error = next(attempts)
+            if error is not None:
+                raise error
+            return "sent"
+
+        async def fail():
+            raise RuntimeError("network")
+
+        with patch("sender.asyncio.sleep", new_callable=AsyncMock):
+            assert await gateway.call(CHAT_ID, send) == "sent"
+            with pytest.raises(RuntimeError):
+                await gateway.call(CHAT_ID, fail)
+
+        assert depths == [1, 1]
+        assert SEND_QUEUE_DEPTH.value() == 0
+        assert SEND_MESSAGES.value(result="sent") == 1
+        assert SEND_MESSAGES.value(result="failed") == 1
+        assert SEND_RETRIES.value() == 1
+        assert SEND_WAIT.count() == 3
+
+
+class TestMetricsEndpoint:
+    """Тесты HTTP-эндпоинта /metrics"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_metrics_endpoint(self):
+        """GET /metrics отдает текстовый формат Prometheus"""
+        from metrics import REMINDER_BATCH_SIZE, make_app
+
+        REMINDER_BATCH_SIZE.observe(12)
+        client = TestClient(TestServer(make_app()))
+        await client.start_server()
+        try:
+            response = await client.get("/metrics")
+            body = await response.text()
+        finally:
+            await client.close()
+
+        assert response.status == 200
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert 'bot_reminder_batch_size_bucket{le="20"} 1' in body
+        assert "# TYPE bot_handler_errors_total counter" in body
@@ -0,0 +1,109 @@
+"""
+Integration тесты для кэша участников
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from participant_cache import ParticipantCache
+
+CHAT_ID = -1001234567890
+
+
+def reader_count():
+    from db import pool
+    return pool.stats()["acquired"]["reader"]
+
+
+class TestParticipantCache:
+    """Тесты для ParticipantCache"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_loads_chat_once(self, populated_db):
+        """Участники чата читаются из БД один раз при первом обращении"""
+        cache = ParticipantCache()
+        before = reader_count()
+        
+        assert (await cache.get(CHAT_ID, 111111111)).is_admin is True
+        assert await cache.active(CHAT_ID) == [(111111111, "admin_user"), (222222222, "regular_user")]
+        assert (await cache.find_by_username(CHAT_ID, "inactive_user")).user_id == 333333333
+        assert len(await cache.all(CHAT_ID)) == 3
+        
+        assert reader_count() - before == 1
+        assert cache.stats()["misses"] == 1
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_load(self, populated_db):
+        """Параллельные обращения к незагруженному чату ждут одну загрузку"""
+        cache = ParticipantCache()
+        before = reader_count()
+        
+        results = await asyncio.gather(*(cache.active(CHAT_ID) for _ in range(5)))
+        
+        assert all(r == results[0] for r in results)
+        assert reader_count() - before == 1
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_write_through(self, populated_db):
+        """Изменения повторяются в загруженном чате без перечитывания БД"""
+        cache = ParticipantCache()
+        await cache.all(CHAT_ID)
+        
+        cache.update(CHAT_ID, 222222222, active=False)
+        cache.add(CHAT_ID, 444444444, "new_user", active=True)
+        cache.add(CHAT_ID, 111111111, "ignored", active=True)  # уже есть — как INSERT OR IGNORE
+        cache.put(CHAT_ID, 333333333, "renamed", active=True)
+        
+        assert await cache.active(CHAT_ID) == [
+            (111111111, "admin_user"), (444444444, "new_user"), (333333333, "renamed")
+        ]
+        assert (await cache.get(CHAT_ID, 333333333)).is_admin is False
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_mutation_during_load_not_cached(self, populated_db):
+        """Снимок, прочитанный до изменения, не остается в кэше"""
+        cache = ParticipantCache()
+        original_fetch = cache._fetch
+        
+        async def slow_fetch(chat_id):
+            members = await original_fetch(chat_id)
+            # Пока шло чтение, участника исключили
+            cache.update(chat_id, 222222222, active=False)
+            return members
+        
+        with patch.object(cache, "_fetch", side_effect=slow_fetch):
+            await cache.active(CHAT_ID)
+        
+        assert cache.stats()["chats"] == 0
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self, test_db):
+        """При превышении лимита вытесняется давно не использованный чат"""
+        cache = ParticipantCache(max_chats=2)
+        await cache.all(-1)
+        await cache.all(-2)
+        await cache.all(-1)
+        await cache.all(-3)
+        
+        assert list(cache._chats) == [-1, -3]
+        assert cache.stats()["evictions"] == 1
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_ensure_admins_skips_unchanged(self, populated_db, mock_bot, mock_admin_user):
+        """Повторная синхронизация тех же админов не занимает пишущее соединение"""
+        from db import ensure_admins_in_db, pool
+        
+        mock_admin_user.user.username = "admin_user"
+        mock_bot.get_chat_administrators.return_value = [mock_admin_user]
+        
+        await ensure_admins_in_db(mock_bot, CHAT_ID)
+        writes = pool.stats()["acquired"]["writer"]
+        await ensure_admins_in_db(mock_bot, CHAT_ID)
+        
+        assert pool.stats()["acquired"]["writer"] == writes
@@ -0,0 +1,202 @@
+"""
+Integration тесты для постраничного /report
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+CHAT_ID = -1001234567890
+DATE = "2025-06-24"
+
+
+async def add_team(storage, size, text="Сделал задачу"):
+    """Команда из size участников с отчетами за DATE; у первого нет username"""
+    await storage.chats.add(CHAT_ID, "Big Team")
+    await storage.reports.save_batch(
+        [(CHAT_ID, 1000 + i, None if i == 0 else f"user{i:03d}") for i in range(size)],
+        [(CHAT_ID, 1000 + i, DATE, 1, 2, f"{text} {i}", f"{DATE} 10:00:00") for i in range(size)]
+    )
+
+
+def page_data(markup, back=False):
+    """Данные кнопки «Назад» или «Далее» (None, если кнопки нет)"""
+    from report_pages import ReportPage
+
+    if markup is None:
+        return None
+    for button in markup.inline_keyboard[0]:
+        if button.text.startswith("◀️") == back:
+            return ReportPage.unpack(button.callback_data)
+    return None
+
+
+def user_ids(text):
+    return [int(line.split("user", 1)[1][:3]) if line.startswith("@") else 0
+            for line in text.splitlines() if line.endswith(":") and not line.startswith("Отчёты")]
+
+
+class TestReportPageQuery:
+    """Keyset-пагинация в репозитории на SQLite и PostgreSQL"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_pages_follow_key_order(self, storage):
+        """Страницы идут по (username, user_id) без пропусков и повторов, NULL-имя первым"""
+        await add_team(storage, 7)
+
+        first = await storage.reports.page(CHAT_ID, DATE, limit=3)
+        second = await storage.reports.page(CHAT_ID, DATE, cursor=first[-1][1], limit=3)
+        third = await storage.reports.page(CHAT_ID, DATE, cursor=second[-1][1], limit=3)
+
+        assert [row[1] for row in first + second + third] == [1000 + i for i in range(7)]
+        assert first[0][0] is None
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_backward_page(self, storage):
+        """Страница назад — строки перед курсором, от курсора к началу"""
+        await add_team(storage, 7)
+
+        rows = await storage.reports.page(CHAT_ID, DATE, cursor=1004, backward=True, limit=3)
+
+        assert [row[1] for row in rows] == [1003, 1002, 1001]
+
+
+class TestRenderPage:
+    """Тесты построения страниц"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_small_report_is_single_page(self, storage):
+        """Короткий отчет — одна страница без кнопок и номера"""
+        from report_pages import render_page
+
+        await add_team(storage, 3)
+
+        text, markup = await render_page(CHAT_ID, DATE)
+
+        assert text.startswith(f"Отчёты за {DATE}:\n\n")
+        assert markup is None
+        assert await render_page(CHAT_ID, "2025-06-25") == (None, None)
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_walk_forward_and_back(self, storage):
+        """Переходы «Далее» покрывают всех ровно один раз, «Назад» возвращает к началу"""
+        from report_pages import render_page
+
+        await add_team(storage, 25)
+
+        pages = []
+        text, markup = await render_page(CHAT_ID, DATE, rows=10, max_chars=300)
+        pages.append(text)
+        while (data := page_data(markup)) is not None:
+            text, markup = await render_page(CHAT_ID, DATE, data.page, data.cursor, rows=10, max_chars=300)
+            pages.append(text)
+
+        assert all(len(page) <= 300 for page in pages)
+        assert [uid for page in pages for uid in user_ids(page)] == list(range(25))
+        assert pages[-1].startswith(f"Отчёты за {DATE}, стр. {len(pages)}:")
+
+        # «Назад» возвращает ровно те страницы, что были при листании вперед
+        for expected in reversed(pages[:-1]):
+            back = page_data(markup, back=True)
+            text, markup = await render_page(CHAT_ID, DATE, back.page, back.cursor, back.back, rows=10, max_chars=300)
+            assert text == expected
+        assert page_data(markup, back=True) is None
+        assert page_data(markup) is not None
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_back_matches_uneven_pages(self, storage):
+        """Отчеты разной длины: «Назад» не сдвигает границы и номера"""
+        from report_pages import render_page
+
+        await storage.chats.add(CHAT_ID, "Big Team")
+        await storage.reports.save_batch(
+            [(CHAT_ID, 1000 + i, f"user{i:03d}") for i in range(12)],
+            [(CHAT_ID, 1000 + i, DATE, 1, 2, "x" * (120 if i % 3 == 0 else 10), f"{DATE} 10:00:00") for i in range(12)]
+        )
+
+        pages = [await render_page(CHAT_ID, DATE, rows=5, max_chars=250)]
+        while (data := page_data(pages[-1][1])) is not None:
+            pages.append(await render_page(CHAT_ID, DATE, data.page, data.cursor, rows=5, max_chars=250))
+        assert len(pages) >= 3
+
+        # «Назад» — один запрос от начала страницы, а не раскладка от начала дня
+        back = page_data(pages[-1][1], back=True)
+        assert back.back and back.cursor == 1010
+        assert await render_page(CHAT_ID, DATE, back.page, back.cursor, back.back, rows=5, max_chars=250) == pages[-2]
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_long_report_truncated(self, storage):
+        """Отчеты длиннее страницы обрезаются, число участников на странице не меняется"""
+        from report_pages import render_page
+
+        await add_team(storage, 2, text="x" * 5000)
+
+        text, markup = await render_page(CHAT_ID, DATE, max_chars=4000)
+
+        assert len(text) <= 4000
+        assert user_ids(text) == [0, 1]
+        assert text.count("…") == 2
+        assert markup is None
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_page_length_in_utf16(self, storage):
+        """Эмодзи занимают две единицы UTF-16 — страница не превышает лимит Telegram"""
+        from mentions import utf16_len
+        from report_pages import render_page
+
+        await add_team(storage, 3, text="🚀" * 1500)
+
+        text, markup = await render_page(CHAT_ID, DATE, max_chars=4000)
+
+        assert utf16_len(text) <= 4000
+        assert user_ids(text) == [0, 1, 2]
+        assert markup is None
+
+
+class TestReportPageCallback:
+    """Тесты обработчика кнопок страниц"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_non_admin_gets_alert(self, test_db):
+        """Не-админ чата не может листать отчеты"""
+        from handlers.reports import on_report_page
+        from report_pages import ReportPage
+
+        callback = MagicMock()
+        callback.from_user.id = 222222222
+        callback.answer = AsyncMock()
+
+        with patch("handlers.reports.admin_cache.is_admin", AsyncMock(return_value=False)), \
+             patch("handlers.reports.render_page", AsyncMock()) as render:
+            await on_report_page(callback, ReportPage(chat_id=CHAT_ID, date=DATE, page=2, cursor=1003))
+
+        render.assert_not_called()
+        assert callback.answer.call_args.kwargs["show_alert"] is True
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_admin_page_edits_message(self, test_db):
+        """Админ получает следующую страницу в том же сообщении"""
+        from handlers.reports import on_report_page
+        from report_pages import ReportPage
+        from storage import storage
+
+        await add_team(storage, 5)
+        callback = MagicMock()
+        callback.from_user.id = 111111111
+        callback.answer = AsyncMock()
+        callback.message.chat.id = 111111111
+        callback.message.edit_text = AsyncMock()
+
+        with patch("handlers.reports.admin_cache.is_admin", AsyncMock(return_value=True)):
+            await on_report_page(callback, ReportPage(chat_id=CHAT_ID, date=DATE, page=2, cursor=1002))
+
+        text = callback.message.edit_text.call_args.args[0]
+        assert user_ids(text) == [3, 4]
+        callback.answer.assert_awaited_once_with()
@@ -0,0 +1,147 @@
+"""
+Integration тесты для групповой записи отчетов
+"""
+import asyncio
+import pytest
+import aiosqlite
+
+from report_writer import ReportWriter
+
+CHAT_ID = -1001234567890
+
+
+def report_row(user_id, text, date="2025-11-27"):
+    return (CHAT_ID, user_id, date, 10001, 20000 + user_id % 1000, text, f"{date} 10:00:00")
+
+
+class TestReportWriter:
+    """Тесты для ReportWriter"""
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_concurrent_replies_share_one_commit(self, populated_db):
+        """Параллельные ответы записываются одной транзакцией"""
+        writer = ReportWriter(flush_interval_ms=50, max_rows=100)
+        writer.start()
+        try:
+            await asyncio.gather(*(
+                writer.save(
+                    participant=(CHAT_ID, 500000000 + i, f"user{i}"),
+                    report=report_row(500000000 + i, f"report {i}")
+                )
+                for i in range(20)
+            ))
+        finally:
+            await writer.stop()
+        
+        assert writer.stats()["flushes"] == 1
+        assert writer.stats()["max_batch"] == 20
+        async with aiosqlite.connect(populated_db) as db:
+            cursor = await db.execute(
+                "SELECT COUNT(*) FROM daily_reports WHERE chat_id = ? AND date = ?",
+                (CHAT_ID, "2025-11-27")
+            )
+            assert (await cursor.fetchone())[0] == 20
+            cursor = await db.execute(
+                "SELECT COUNT(*) FROM participants WHERE chat_id = ? AND active = True",
+                (CHAT_ID,)
+            )
+            assert (await cursor.fetchone())[0] == 22  # 2 активных из фикстуры + 20 новых
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_full_batch_flushed_immediately(self, populated_db):
+        """Заполненная пачка сбрасывается, не дожидаясь интервала"""
+        writer = ReportWriter(flush_interval_ms=10000, max_rows=5)
+        writer.start()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(
+                writer.save(report=report_row(600000000 + i, "r")) for i in range(5)
+            )), timeout=2)
+        finally:
+            await writer.stop()
+        
+        assert writer.stats()["flushes"] == 1
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_reactivates_inactive_participant(self, populated_db):
+        """Ответ неактивного участника возвращает его в активные, не трогая админ-флаг"""
+        writer = ReportWriter()
+        
+        await writer.save(
+            participant=(CHAT_ID, 333333333, "inactive_user"),
+            report=report_row(333333333, "back")
+        )
+        await writer.save(
+            participant=(CHAT_ID, 111111111, "renamed_admin"),
+            report=report_row(111111111, "admin report")
+        )
+        
+        async with aiosqlite.connect(populated_db) as db:
+            cursor = await db.execute(
+                "SELECT user_id, username, active, is_admin FROM participants WHERE chat_id = ? ORDER BY user_id",
+                (CHAT_ID,)
+            )
+            rows = await cursor.fetchall()
+        assert rows[0] == (111111111, "admin_user", 1, 1)
+        assert rows[2] == (333333333, "inactive_user", 1, 0)
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_later_reply_wins_within_batch(self, populated_db):
+        """Повторный ответ в той же пачке перезаписывает отчет за дату"""
+        writer = ReportWriter(flush_interval_ms=50, max_rows=100)
+        writer.start()
+        try:
+            await asyncio.gather(
+                writer.save(report=report_row(222222222, "first")),
+                writer.save(report=report_row(222222222, "second")),
+            )
+        finally:
+            await writer.stop()
+        
+        async with aiosqlite.connect(populated_db) as db:
+            cursor = await db.execute(
+                "SELECT text FROM daily_reports WHERE user_id = ? AND date = ?",
+                (222222222, "2025-11-27")
+            )
+            assert (await cursor.fetchone())[0] == "second"
+    
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_failed_flush_rejects_futures(self, populated_db):
+        """Ошибка записи передается вызывающему, буфер продолжает работать"""
+        writer = ReportWriter()
+        bad_row = (CHAT_ID, 1, "2025-11-27", 1, 1, "text")  # не хватает колонки
+        
+        with pytest.raises(Exception):
+            await writer.save(report=bad_row)
+        
+        await writer.save(report=report_row(222222222, "ok"))
+        assert writer.stats()["pending"] == 0
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_bad_row_fails_only_its_caller(self, populated_db):
+        """Ошибочная строка в пачке не мешает сохранить остальные ответы"""
+        writer = ReportWriter(flush_interval_ms=50, max_rows=100)
+        bad_row = (CHAT_ID, 1, "2025-11-27", 1, 1, "text")  # не хватает колонки
+        writer.start()
+        try:
+            results = await asyncio.gather(
+                *(writer.save(report=report_row(500000000 + i, f"report {i}")) for i in range(3)),
+                writer.save(report=bad_row),
+                *(writer.save(report=report_row(500000010 + i, f"report {i}")) for i in range(3)),
+                return_exceptions=True
+            )
+        finally:
+            await writer.stop()
+
+        assert [isinstance(result, Exception) for result in results] == [False] * 3 + [True] + [False] * 3
+        assert writer.flushes == 1
+        async with aiosqlite.connect(populated_db) as db:
+            cursor = await db.execute(
+                "SELECT COUNT(*) FROM daily_reports WHERE user_id >= 500000000 AND date = '2025-11-27'"
+            )
+            assert (await cursor.fetchone())[0] == 6
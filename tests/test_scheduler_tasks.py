@@ -0,0 +1,402 @@
+"""
+Integration тесты для модуля scheduler_tasks
+"""
+import asyncio
+import pytest
+import aiosqlite
+from unittest.mock import AsyncMock, patch
+from freezegun import freeze_time
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+
+class TestNormalizeDailyTime:
+    """Тесты нормализации времени рассылки"""
+
+    @pytest.mark.unit
+    def test_pads_hours_and_minutes(self):
+        from scheduler_tasks import normalize_daily_time
+        assert normalize_daily_time(" 9:5 ") == "09:05"
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("value", ["24:00", "10:60", "10", "abc"])
+    def test_rejects_invalid(self, value):
+        from scheduler_tasks import normalize_daily_time
+        with pytest.raises(ValueError):
+            normalize_daily_time(value)
+
+
+class TestDailyBuckets:
+    """Тесты задач рассылки по минутам HH:MM"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_reschedule_touches_only_own_buckets(self, test_db, real_scheduler, add_chats):
+        """Изменение времени одного чата не трогает задачи других чатов"""
+        from scheduler_tasks import ensure_daily_bucket, reschedule_chat_daily, daily_job_id, check_job_id
+
+        await add_chats([(-1, "12:30"), (-2, "11:00")])
+        ensure_daily_bucket("10:00")
+        ensure_daily_bucket("11:00")
+        real_scheduler.add_job(print, "date", id=check_job_id(-2, "2025-11-26"))
+
+        # Чат -1 переехал с 10:00 на 12:30
+        await reschedule_chat_daily("10:00", "12:30")
+
+        ids = {job.id for job in real_scheduler.get_jobs()}
+        assert ids == {daily_job_id("12:30"), daily_job_id("11:00"), check_job_id(-2, "2025-11-26")}
+        trigger = real_scheduler.get_job(daily_job_id("12:30")).trigger
+        assert str(trigger.fields[5]) == "12"  # hour
+        assert str(trigger.fields[6]) == "30"  # minute
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_bucket_kept_while_chats_remain(self, test_db, real_scheduler, add_chats):
+        """Минута не удаляется, пока в ней есть другие чаты"""
+        from scheduler_tasks import ensure_daily_bucket, reschedule_chat_daily, daily_job_id
+
+        await add_chats([(-1, "10:00"), (-2, "11:00")])
+        ensure_daily_bucket("10:00")
+
+        # Чат -2 ушел с 10:00, но чат -1 все еще там
+        await reschedule_chat_daily("10:00", "11:00")
+
+        assert real_scheduler.get_job(daily_job_id("10:00")) is not None
+        assert real_scheduler.get_job(daily_job_id("11:00")) is not None
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_schedule_all_dailies_keeps_checks(self, populated_db, real_scheduler, add_chats):
+        """Перестройка при старте создает одну задачу на минуту и не удаляет проверки отчетов"""
+        from scheduler_tasks import schedule_all_dailies, daily_job_id, check_job_id
+
+        await add_chats([(-100999, None), (-100998, "10:00"), (-100997, "18:15")])
+        real_scheduler.add_job(print, "date", id=check_job_id(-1001234567890, "2025-11-26"))
+
+        await schedule_all_dailies()
+
+        ids = {job.id for job in real_scheduler.get_jobs()}
+        assert ids == {
+            daily_job_id("10:00"),
+            daily_job_id("18:15"),
+            check_job_id(-1001234567890, "2025-11-26"),
+        }
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_schedule_all_dailies_reconciles(self, populated_db, real_scheduler):
+        """При старте существующие задачи не пересоздаются, лишние удаляются"""
+        from scheduler_tasks import schedule_all_dailies, ensure_daily_bucket, daily_job_id
+
+        ensure_daily_bucket("10:00")
+        ensure_daily_bucket("09:00")  # чатов на 09:00 в БД нет
+        real_scheduler.add_job(print, "cron", hour=8, id="daily:-100123")  # старый формат
+        before = real_scheduler.get_job(daily_job_id("10:00"))
+
+        await schedule_all_dailies()
+
+        after = real_scheduler.get_job(daily_job_id("10:00"))
+        assert after.next_run_time == before.next_run_time
+        assert [job.id for job in real_scheduler.get_jobs()] == [daily_job_id("10:00")]
+
+
+class TestTimezoneBuckets:
+    """Тесты задач рассылки по парам (пояс, HH:MM)"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_schedule_all_dailies_buckets_by_timezone(self, test_db, real_scheduler, add_chats):
+        """Одна задача на пару (пояс, HH:MM), триггер в поясе чатов"""
+        from scheduler_tasks import schedule_all_dailies, daily_job_id
+
+        await add_chats([(-1, "10:00"), (-2, "10:00"), (-3, "10:00"), (-4, "10:00")])
+        async with aiosqlite.connect(test_db) as db:
+            await db.execute("UPDATE chats SET timezone = 'Asia/Novosibirsk' WHERE chat_id IN (-2, -3)")
+            await db.execute("UPDATE chats SET timezone = 'Europe/Moscow' WHERE chat_id = -4")
+            await db.commit()
+
+        await schedule_all_dailies()
+
+        ids = {job.id for job in real_scheduler.get_jobs()}
+        assert ids == {daily_job_id("10:00", "Europe/Moscow"), daily_job_id("10:00", "Asia/Novosibirsk")}
+        job = real_scheduler.get_job(daily_job_id("10:00", "Asia/Novosibirsk"))
+        assert str(job.trigger.timezone) == "Asia/Novosibirsk"
+        assert job.args == ("10:00", "Asia/Novosibirsk")
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_dispatch_selects_only_bucket_timezone(self, test_db, add_chats):
+        """Рассылка пары (пояс, HH:MM) не задевает чаты других поясов"""
+        import scheduler_tasks
+
+        await add_chats([(-1, "10:00"), (-2, "10:00")])
+        async with aiosqlite.connect(test_db) as db:
+            await db.execute("UPDATE chats SET timezone = 'Asia/Novosibirsk' WHERE chat_id = -2")
+            await db.commit()
+
+        with patch.object(scheduler_tasks, "is_workday", return_value=True), \
+             patch.object(scheduler_tasks, "send_scheduled_daily", AsyncMock()) as send:
+            await scheduler_tasks.dispatch_dailies("10:00", "Asia/Novosibirsk")
+
+        send.assert_awaited_once_with(-2, tz="Asia/Novosibirsk")
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_timezone_change_moves_chat(self, test_db, real_scheduler, add_chats):
+        """Смена пояса чата переносит его в другую задачу и освобождает старую"""
+        from scheduler_tasks import ensure_daily_bucket, reschedule_chat_daily, daily_job_id
+
+        await add_chats([(-1, "10:00")])
+        ensure_daily_bucket("10:00")
+        async with aiosqlite.connect(test_db) as db:
+            await db.execute("UPDATE chats SET timezone = 'Europe/Berlin' WHERE chat_id = -1")
+            await db.commit()
+
+        await reschedule_chat_daily("10:00", "10:00", "Europe/Moscow", "Europe/Berlin")
+
+        assert [job.id for job in real_scheduler.get_jobs()] == [daily_job_id("10:00", "Europe/Berlin")]
+
+
+class TestDispatchDailies:
+    """Тесты рассылки дэйликов по минуте"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_dispatch_sends_to_all_chats_of_minute(self, test_db, add_chats):
+        """Дэйлик уходит во все чаты минуты, сбои отдельных чатов не мешают остальным"""
+        import scheduler_tasks
+
+        await add_chats([(-1, "10:00"), (-2, "10:00"), (-3, "10:00"), (-4, "11:00")])
+
+        async def fake_send(chat_id, tz=None):
+            if chat_id == -2:
+                raise RuntimeError("chat not found")
+
+        with patch.object(scheduler_tasks, "is_workday", return_value=True), \
+             patch.object(scheduler_tasks, "send_scheduled_daily", AsyncMock(side_effect=fake_send)) as send:
+            summary = await scheduler_tasks.dispatch_dailies("10:00")
+
+        assert sorted(call.args[0] for call in send.await_args_list) == [-3, -2, -1]
+        assert summary["chats"] == 3
+        assert summary["sent"] == 2
+        assert summary["failed"] == 1
+        assert summary["duration"] >= 0
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_dispatch_respects_concurrency(self, test_db, monkeypatch, add_chats):
+        """Одновременно обрабатывается не больше DAILY_DISPATCH_CONCURRENCY чатов"""
+        import scheduler_tasks
+
+        await add_chats([(-i, "10:00") for i in range(1, 11)])
+        monkeypatch.setattr(scheduler_tasks, "DAILY_DISPATCH_CONCURRENCY", 3)
+        in_flight = 0
+        peak = 0
+
+        async def fake_send(chat_id, tz=None):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        with patch.object(scheduler_tasks, "is_workday", return_value=True), \
+             patch.object(scheduler_tasks, "send_scheduled_daily", side_effect=fake_send):
+            summary = await scheduler_tasks.dispatch_dailies("10:00")
+
+        assert summary["sent"] == 10
+        assert peak == 3
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_dispatch_skips_holidays(self, test_db, add_chats):
+        """В выходной рассылка не выполняется"""
+        import scheduler_tasks
+
+        await add_chats([(-1, "10:00")])
+
+        with patch.object(scheduler_tasks, "is_workday", return_value=False), \
+             patch.object(scheduler_tasks, "send_scheduled_daily", AsyncMock()) as send:
+            summary = await scheduler_tasks.dispatch_dailies("10:00")
+
+        send.assert_not_awaited()
+        assert summary["chats"] == 0
+
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_dispatch_uses_chat_calendar(self, test_db, add_chats):
+        """Выходные определяются по календарю страны каждого чата"""
+        import scheduler_tasks
+
+        await add_chats([(-1, "10:00"), (-2, "10:00")])
+        async with aiosqlite.connect(test_db) as db:
+            await db.execute("UPDATE chats SET country = 'BY' WHERE chat_id = -2")
+            await db.commit()
+
+        # 7 ноября 2025 — рабочий день в России и праздник в Беларуси
+        with freeze_time("2025-11-07 10:00:00"), \
+             patch.object(scheduler_tasks, "send_scheduled_daily", AsyncMock()) as send:
+            summary = await scheduler_tasks.dispatch_dailies("10:00")
+
+        assert [call.args[0] for call in send.await_args_list] == [-1]
+        assert summary["skipped"] == 1
+
+
+class TestPersistentJobStore:
+    """Тесты постоянного хранилища задач"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_jobs_survive_restart(self, test_db, monkeypatch):
+        """Задачи, сохраненные в БД, видны после перезапуска планировщика"""
+        import bot_instance
+        import scheduler_tasks
+        from scheduler_tasks import ensure_daily_bucket, daily_job_id, check_job_id, check_daily_reports
+
+        first = AsyncIOScheduler()
+        monkeypatch.setattr(bot_instance, "scheduler", first)
+        bot_instance.setup_scheduler(test_db)
+        first.start(paused=True)
+        monkeypatch.setattr(scheduler_tasks, "scheduler", first)
+        ensure_daily_bucket("10:00")
+        first.add_job(
+            check_daily_reports, "date", run_date="2099-01-01 12:00:00",
+            args=[-1, 555, "2099-01-01"], id=check_job_id(-1, "2099-01-01")
+        )
+        first.shutdown(wait=False)
+
+        second = AsyncIOScheduler()
+        monkeypatch.setattr(bot_instance, "scheduler", second)
+        bot_instance.setup_scheduler(test_db)
+        second.start(paused=True)
+        try:
+            job = second.get_job(check_job_id(-1, "2099-01-01"))
+            assert job is not None
+            assert job.args == (-1, 555, "2099-01-01")
+            assert second.get_job(daily_job_id("10:00")) is not None
+            assert second.get_job(daily_job_id("10:00")).coalesce is True
+        finally:
+            second.shutdown(wait=False)
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_stored_job_runs_after_restart(self, test_db, monkeypatch):
+        """Проверка, сохраненная до остановки, выполняется запущенным заново планировщиком"""
+        from datetime import timedelta
+        import bot_instance
+        import scheduler_tasks
+        from scheduler_tasks import check_job_id, check_daily_reports
+        from timezones import local_now
+
+        first = AsyncIOScheduler()
+        monkeypatch.setattr(bot_instance, "scheduler", first)
+        bot_instance.setup_scheduler(test_db)
+        first.start(paused=True)
+        first.add_job(
+            check_daily_reports, "date", run_date=local_now() + timedelta(seconds=0.3),
+            args=[-1, 555, "2099-01-01"], id=check_job_id(-1, "2099-01-01")
+        )
+        first.shutdown()
+
+        # Ссылка на функцию задачи разрешается при загрузке из хранилища
+        ran = asyncio.Event()
+        check = AsyncMock(side_effect=lambda *args: ran.set())
+        monkeypatch.setattr(scheduler_tasks, "check_daily_reports", check)
+        second = AsyncIOScheduler()
+        monkeypatch.setattr(bot_instance, "scheduler", second)
+        bot_instance.setup_scheduler(test_db)
+        second.start()
+        try:
+            await asyncio.wait_for(ran.wait(), timeout=5)
+            check.assert_awaited_once_with(-1, 555, "2099-01-01")
+            assert second.get_job(check_job_id(-1, "2099-01-01")) is None
+        finally:
+            second.shutdown(wait=False)
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_check_job_written_off_event_loop(self, test_db, monkeypatch):
+        """Задача проверки отчетов добавляется в хранилище не в потоке event loop"""
+        import threading
+        import scheduler_tasks
+        from unittest.mock import MagicMock
+
+        loop_thread = threading.get_ident()
+        threads = []
+        scheduler = MagicMock()
+        scheduler.add_job = MagicMock(side_effect=lambda *args, **kwargs: threads.append(threading.get_ident()))
+        monkeypatch.setattr(scheduler_tasks, "scheduler", scheduler)
+
+        with patch.object(scheduler_tasks, "gateway") as gateway, \
+             patch.object(scheduler_tasks, "claim_daily", AsyncMock(return_value=True)), \
+             patch.object(scheduler_tasks.message_index, "record", AsyncMock()):
+            gateway.send_message = AsyncMock(return_value=MagicMock(message_id=10))
+            await scheduler_tasks.send_scheduled_daily(-1, tz="Europe/Moscow")
+
+        assert len(threads) == 1 and threads[0] != loop_thread
+
+
+class TestResolveDisplayNames:
+    """Тесты получения имен участников без username для напоминаний"""
+
+    @pytest.fixture
+    async def nameless_chat(self, storage):
+        """Чат с одним участником с username и тремя без"""
+        await storage.chats.add(-1, "Chat")
+        await storage.reports.save_batch([(-1, 1, "alice"), (-1, 2, None), (-1, 3, None), (-1, 4, None)], [])
+        return storage
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_resolves_concurrently_and_stores(self, nameless_chat, mock_bot, monkeypatch):
+        """Имена запрашиваются параллельно (не больше лимита), сохраняются и дальше берутся из БД"""
+        import scheduler_tasks
+        from types import SimpleNamespace
+
+        monkeypatch.setattr(scheduler_tasks, "NAME_RESOLVE_CONCURRENCY", 2)
+        in_flight = 0
+        peak = 0
+
+        async def get_chat_member(chat_id, user_id):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return SimpleNamespace(user=SimpleNamespace(first_name=f"Имя {user_id}"))
+
+        mock_bot.get_chat_member = AsyncMock(side_effect=get_chat_member)
+        users = [(1, "alice"), (2, None), (3, None), (4, None)]
+
+        with patch.object(scheduler_tasks, "bot", mock_bot):
+            first = await scheduler_tasks.resolve_display_names(-1, users)
+            second = await scheduler_tasks.resolve_display_names(-1, users)
+
+        assert first == second == {1: "alice", 2: "Имя 2", 3: "Имя 3", 4: "Имя 4"}
+        assert mock_bot.get_chat_member.await_count == 3
+        assert peak == 2
+        assert set(await nameless_chat.participants.display_names(-1)) == {2, 3, 4}
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_stale_names_refreshed_with_fallback(self, nameless_chat, mock_bot):
+        """Устаревшее имя запрашивается заново; при ошибке остается старое или User <id>"""
+        import scheduler_tasks
+        from types import SimpleNamespace
+
+        await nameless_chat.participants.set_display_names(-1, [(2, "Старое имя"), (3, "Давнее имя")], "2000-01-01 00:00:00")
+
+        async def get_chat_member(chat_id, user_id):
+            if user_id == 3:
+                return SimpleNamespace(user=SimpleNamespace(first_name="Новое имя"))
+            raise RuntimeError("Bad Request: user not found")
+
+        mock_bot.get_chat_member = AsyncMock(side_effect=get_chat_member)
+
+        with patch.object(scheduler_tasks, "bot", mock_bot):
+            names = await scheduler_tasks.resolve_display_names(-1, [(2, None), (3, None), (4, None)])
+
+        assert names == {2: "Старое имя", 3: "Новое имя", 4: "User 4"}
+        stored = await nameless_chat.participants.display_names(-1)
+        assert stored[3][0] == "Новое имя" and stored[3][1] > "2000-01-01 00:00:00"
+        assert stored[2] == ("Старое имя", "2000-01-01 00:00:00")
@@ -0,0 +1,231 @@
+"""
+Integration тесты для полнотекстового поиска (/search)
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+CHAT_ID = -1001234567890
+OTHER_CHAT_ID = -1009876543210
+
+
+def found(rows):
+    return [(row[0], row[1]) for row in rows]
+
+
+class TestSearchQuery:
+    """Поиск в репозитории на SQLite и PostgreSQL"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_all_words_required(self, storage, add_reports):
+        """Находятся только отчеты со всеми словами запроса, без учета регистра и только своего чата"""
+        await add_reports(storage, [
+            (111111111, "2025-06-01", "Починил Релиз и тесты"),
+            (222222222, "2025-06-01", "Готовил релиз"),
+            (111111111, "2025-06-02", "Писал тесты"),
+        ])
+        await add_reports(storage, [(111111111, "2025-06-01", "релиз тесты")], chat_id=OTHER_CHAT_ID)
+
+        rows = await storage.reports.search(CHAT_ID, [("релиз", False), ("тесты", False)])
+
+        assert found(rows) == [("2025-06-01", 111111111)]
+        assert rows[0][2] == "user1"
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_prefix_and_snippet(self, storage, add_reports):
+        """Префикс совпадает с формами слова, фрагмент выделяет найденное маркерами"""
+        await add_reports(storage, [(111111111, "2025-06-01", "Закрыл две задачи по оплате")])
+
+        assert await storage.reports.search(CHAT_ID, [("задач", False)]) == []
+        rows = await storage.reports.search(CHAT_ID, [("задач", True)], marks=("[", "]"))
+
+        assert found(rows) == [("2025-06-01", 111111111)]
+        assert "[задачи]" in rows[0][3]
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_index_follows_updates(self, storage, add_reports):
+        """Повторный отчет за ту же дату заменяет текст и в индексе"""
+        await add_reports(storage, [(111111111, "2025-06-01", "черновик")])
+        await add_reports(storage, [(111111111, "2025-06-01", "финальная версия")])
+
+        assert await storage.reports.search(CHAT_ID, [("черновик", False)]) == []
+        assert found(await storage.reports.search(CHAT_ID, [("финальная", False)])) == [("2025-06-01", 111111111)]
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_ranking_and_offset(self, storage, add_reports):
+        """Отчеты с большим числом совпадений выше; offset листает без повторов"""
+        await add_reports(storage, [
+            (111111111, "2025-06-01", "деплой сервиса после ревью кода"),
+            (222222222, "2025-06-01", "деплой деплой деплой"),
+            (111111111, "2025-06-02", "деплой и еще раз деплой"),
+        ])
+
+        first = await storage.reports.search(CHAT_ID, [("деплой", False)], limit=2)
+        rest = await storage.reports.search(CHAT_ID, [("деплой", False)], limit=2, offset=2)
+
+        assert found(first) == [("2025-06-01", 222222222), ("2025-06-02", 111111111)]
+        assert found(rest) == [("2025-06-01", 111111111)]
+
+
+class TestSearchSqlite:
+    """Особенности FTS5-индекса"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_backfill_on_migration(self, temp_db):
+        """Миграция индексирует отчеты, сохраненные до появления FTS5"""
+        import aiosqlite
+        from db import apply_migrations
+        from migrations import MIGRATIONS
+        from storage import storage
+
+        # База в состоянии до миграции 7: индекса нет, отчет уже сохранен
+        async with aiosqlite.connect(temp_db) as conn:
+            await conn.execute("CREATE TABLE schema_version (version INTEGER PRIMARY KEY, applied_at TEXT)")
+            await apply_migrations(conn, MIGRATIONS[:6])
+            await conn.execute(
+                "INSERT INTO daily_reports VALUES (?, 111111111, '2025-06-01', 1, 2, 'старый отчет о релизе', '')",
+                (CHAT_ID,)
+            )
+            await conn.commit()
+
+        await storage.open("sqlite", temp_db)
+        try:
+            rows = await storage.reports.search(CHAT_ID, [("релизе", False)])
+        finally:
+            await storage.close()
+
+        assert found(rows) == [("2025-06-01", 111111111)]
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_query_operators_are_plain_words(self, storage, add_reports):
+        """Слова-операторы FTS5 ищутся как обычные слова"""
+        await add_reports(storage, [(111111111, "2025-06-01", "NOT OR NEAR")])
+
+        rows = await storage.reports.search(CHAT_ID, [("not", False), ("near", False)])
+
+        assert found(rows) == [("2025-06-01", 111111111)]
+
+
+class TestSearchFormatting:
+    """Тесты разбора запроса и оформления результатов"""
+
+    @pytest.mark.unit
+    def test_parse_query(self):
+        """Из запроса берутся только слова; звездочка после слова — префикс"""
+        from search import parse_query
+
+        assert parse_query('Релиз* "AND" -тест (v2)') == [
+            ("релиз", True), ("and", False), ("тест", False), ("v2", False)
+        ]
+        assert parse_query("*** --") == []
+
+    @pytest.mark.unit
+    def test_snippet_is_escaped(self):
+        """Текст отчета экранируется, маркеры превращаются в <b>"""
+        from search import MARK_END, MARK_START, format_snippet
+
+        snippet = f"a <script>\n{MARK_START}релиз{MARK_END} & b"
+
+        assert format_snippet(snippet) == "a &lt;script&gt; <b>релиз</b> &amp; b"
+
+    @pytest.mark.unit
+    def test_sessions_evict_oldest(self):
+        """Хранилище поисков ограничено по размеру"""
+        from search import SearchSessions
+
+        sessions = SearchSessions(max_sessions=2)
+        first = sessions.add(CHAT_ID, 1, "a")
+        second = sessions.add(CHAT_ID, 1, "b")
+        sessions.get(first)
+        sessions.add(CHAT_ID, 1, "c")
+
+        assert sessions.get(first) == (CHAT_ID, 1, "a")
+        assert sessions.get(second) is None
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_results_paginated(self, storage, add_reports):
+        """Страницы результатов связаны кнопками"""
+        from search import SearchPage, render_results
+
+        await add_reports(storage, [
+            (111111111 + i, f"2025-06-{day:02d}", f"релиз {day}") for i in range(2) for day in range(1, 4)
+        ])
+
+        text, markup = await render_results(CHAT_ID, "релиз", "abc", page_size=4)
+        assert text.startswith("Поиск «релиз», стр. 1:")
+        assert text.count("<b>релиз</b>") == 4
+        assert [button.text for button in markup.inline_keyboard[0]] == ["Далее ▶️"]
+
+        data = SearchPage.unpack(markup.inline_keyboard[0][0].callback_data)
+        text, markup = await render_results(CHAT_ID, "релиз", data.search_id, data.page, page_size=4)
+        assert text.count("<b>релиз</b>") == 2
+        assert [button.text for button in markup.inline_keyboard[0]] == ["◀️ Назад"]
+
+        assert await render_results(CHAT_ID, "отпуск", "abc") == (None, None)
+
+
+class TestSearchCommand:
+    """Тесты команды /search и кнопок страниц"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_admin_gets_results(self, test_db, mock_message, add_reports):
+        """Админ чата получает результаты в личку"""
+        from handlers.reports import cmd_search
+        from storage import storage
+
+        await add_reports(storage, [(mock_message.from_user.id, "2025-06-01", "Выкатил релиз")])
+        await storage.participants.upsert_admins(CHAT_ID, [(mock_message.from_user.id, "testuser")])
+        await storage.participants.set_active(CHAT_ID, mock_message.from_user.id, True)
+        mock_message.chat.type = "private"
+        command = AsyncMock(args=f"{CHAT_ID} релиз")
+
+        with patch("handlers.reports.gateway") as gateway:
+            gateway.answer = AsyncMock()
+            await cmd_search(mock_message, command)
+
+        text = gateway.answer.call_args.args[1]
+        assert "<b>2025-06-01</b> @testuser:" in text
+        assert gateway.answer.call_args.kwargs["parse_mode"] == "HTML"
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_non_admin_rejected(self, test_db, mock_message):
+        """Не-админ чата не может искать"""
+        from handlers.reports import cmd_search
+
+        mock_message.chat.type = "private"
+        command = AsyncMock(args=f"{CHAT_ID} релиз")
+
+        with patch("handlers.reports.gateway") as gateway, \
+             patch("handlers.reports.render_results", AsyncMock()) as render:
+            gateway.answer = AsyncMock()
+            await cmd_search(mock_message, command)
+
+        render.assert_not_called()
+        assert "администраторам" in gateway.answer.call_args.args[1]
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_expired_or_foreign_session(self, test_db):
+        """Кнопка вытесненного или чужого поиска не работает"""
+        from handlers.reports import on_search_page
+        from search import SearchPage, search_sessions
+
+        search_id = search_sessions.add(CHAT_ID, 111111111, "релиз")
+        callback = MagicMock()
+        callback.from_user.id = 222222222
+        callback.answer = AsyncMock()
+
+        with patch("handlers.reports.render_results", AsyncMock()) as render:
+            await on_search_page(callback, SearchPage(search_id=search_id, page=2))
+            await on_search_page(callback, SearchPage(search_id="missing", page=2))
+
+        render.assert_not_called()
+        assert all(call.kwargs["show_alert"] for call in callback.answer.call_args_list)
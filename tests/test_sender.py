@@ -0,0 +1,131 @@
+"""
+Unit тесты для шлюза отправки сообщений
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from aiogram.exceptions import TelegramRetryAfter, TelegramBadRequest
+from aiogram.methods import SendMessage
+
+from sender import TokenBucket, SendGateway
+
+
+def retry_after(seconds):
+    method = SendMessage(chat_id=-100, text="x")
+    return TelegramRetryAfter(method=method, message="Flood control", retry_after=seconds)
+
+
+class TestTokenBucket:
+    """Тесты для TokenBucket"""
+    
+    @pytest.mark.unit
+    def test_burst_then_wait(self):
+        """После исчерпания пачки следующий токен надо ждать 1/rate секунд"""
+        with patch("sender.time.monotonic", return_value=100.0):
+            bucket = TokenBucket(rate=2, capacity=2)
+            assert bucket.reserve() == 0
+            assert bucket.reserve() == 0
+            assert bucket.reserve() == pytest.approx(0.5)
+            assert bucket.reserve() == pytest.approx(1.0)
+    
+    @pytest.mark.unit
+    def test_refill(self):
+        """Токены восстанавливаются со временем, но не выше capacity"""
+        with patch("sender.time.monotonic", return_value=100.0):
+            bucket = TokenBucket(rate=1, capacity=1)
+            bucket.reserve()
+        with patch("sender.time.monotonic", return_value=200.0):
+            assert bucket.reserve() == 0
+            assert bucket.reserve() == pytest.approx(1.0)
+    
+    @pytest.mark.unit
+    def test_block(self):
+        """block() откладывает следующую отправку на заданное время"""
+        with patch("sender.time.monotonic", return_value=100.0):
+            bucket = TokenBucket(rate=1, capacity=3)
+            bucket.block(10)
+            assert bucket.reserve() == pytest.approx(11.0)
+
+
+class TestSendGateway:
+    """Тесты для SendGateway"""
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_send_message(self, mock_bot):
+        """Сообщение уходит через bot.send_message"""
+        gateway = SendGateway(mock_bot)
+        
+        await gateway.send_message(-100, "hello", parse_mode="HTML")
+        
+        mock_bot.send_message.assert_awaited_once_with(-100, "hello", parse_mode="HTML")
+        assert gateway.stats()["sent"] == 1
+        assert gateway.stats()["queue_depth"] == 0
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_answer(self, mock_bot, mock_message):
+        """Ответ на сообщение идет через message.answer"""
+        gateway = SendGateway(mock_bot)
+        
+        await gateway.answer(mock_message, "ok")
+        
+        mock_message.answer.assert_awaited_once_with("ok")
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_retry_after_is_retried(self, mock_bot):
+        """После TelegramRetryAfter запрос повторяется после паузы"""
+        mock_bot.send_message.side_effect = [retry_after(5), MagicMock(message_id=1)]
+        gateway = SendGateway(mock_bot)
+        
+        with patch("sender.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            result = await gateway.send_message(-100, "hello")
+        
+        assert result.message_id == 1
+        assert mock_bot.send_message.await_count == 2
+        assert max(call.args[0] for call in sleep.await_args_list) >= 5
+        assert gateway.stats()["retries"] == 1
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_retry_after_gives_up(self, mock_bot):
+        """После SEND_MAX_RETRIES повторов ошибка пробрасывается"""
+        mock_bot.send_message.side_effect = retry_after(1)
+        gateway = SendGateway(mock_bot)
+        
+        with patch("sender.asyncio.sleep", new_callable=AsyncMock), \
+             patch("sender.SEND_MAX_RETRIES", 2):
+            with pytest.raises(TelegramRetryAfter):
+                await gateway.send_message(-100, "hello")
+        
+        assert mock_bot.send_message.await_count == 3
+        assert gateway.stats()["failed"] == 1
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_other_errors_not_retried(self, mock_bot):
+        """Прочие ошибки Bot API пробрасываются без повтора"""
+        mock_bot.send_message.side_effect = TelegramBadRequest(
+            method=SendMessage(chat_id=-100, text="x"), message="chat not found"
+        )
+        gateway = SendGateway(mock_bot)
+        
+        with pytest.raises(TelegramBadRequest):
+            await gateway.send_message(-100, "hello")
+        
+        mock_bot.send_message.assert_awaited_once()
+        assert gateway.stats()["queue_depth"] == 0
+    
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_group_limit_throttles(self, mock_bot):
+        """Сообщения в одну группу сверх пачки ждут своей очереди"""
+        with patch("sender.asyncio.sleep", new_callable=AsyncMock) as sleep, \
+             patch("sender.time.monotonic", return_value=100.0):
+            gateway = SendGateway(mock_bot)
+            for _ in range(4):
+                await gateway.send_message(-100, "hello")
+        
+        # 3 сообщения пачкой, четвертое ждет 60/20 = 3 секунды
+        sleep.assert_awaited_once()
+        assert sleep.await_args.args[0] == pytest.approx(3.0)
@@ -0,0 +1,187 @@
+"""
+Integration тесты для шардирования чатов
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from aiohttp.test_utils import TestClient, TestServer
+
+import sharding
+from sharding import ShardLease, shard_of, owns, claim_daily, release_daily_claim
+
+
+@pytest.fixture
+def two_shards(monkeypatch):
+    """Процесс — шард 0 из 2"""
+    monkeypatch.setattr(sharding, "SHARD_COUNT", 2)
+    monkeypatch.setattr(sharding, "SHARD_INDEX", 0)
+
+
+class TestShardOf:
+    """Тесты распределения чатов по шардам"""
+
+    @pytest.mark.unit
+    def test_single_shard_owns_everything(self):
+        """Без шардирования все чаты принадлежат процессу"""
+        assert all(owns(chat_id) for chat_id in (-1, -100500, 42))
+
+    @pytest.mark.unit
+    def test_stable_partition(self, two_shards):
+        """Номер шарда зависит только от chat_id и покрывает все шарды"""
+        assert [shard_of(chat_id) for chat_id in (-1, -2, -3, -4, -5, -6)] == [0, 0, 0, 1, 1, 1]
+        assert owns(-1) and not owns(-4)
+
+
+class TestShardLease:
+    """Тесты аренды шарда"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_second_owner_waits_for_expiry(self, test_db):
+        """Аренду держит один владелец, второй получает её только после истечения"""
+        first = ShardLease(shard=0, owner="first", ttl=30)
+        second = ShardLease(shard=0, owner="second", ttl=30)
+
+        assert await first.try_acquire() is True
+        assert await second.try_acquire() is False
+        assert await first.try_acquire() is True  # продление
+        assert first.held and not second.held
+
+        with patch("sharding.time.time", return_value=first.expires_at + 1):
+            assert await second.try_acquire() is True
+            assert await first.try_acquire() is False
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_release_frees_lease(self, test_db):
+        """Освобожденная аренда сразу доступна другому процессу"""
+        first = ShardLease(shard=1, owner="first", ttl=30)
+        second = ShardLease(shard=1, owner="second", ttl=30)
+        await first.acquire()
+        first.start()
+
+        await first.release()
+
+        assert await second.try_acquire() is True
+
+
+class TestDailyClaims:
+    """Тесты отметок об отправке дэйлика"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_claim_once_per_chat_and_date(self, test_db):
+        """Отметку за чат и дату получает только первый"""
+        assert await claim_daily(-1, "2025-11-26") is True
+        assert await claim_daily(-1, "2025-11-26") is False
+        assert await claim_daily(-1, "2025-11-27") is True
+
+        await release_daily_claim(-1, "2025-11-26")
+        assert await claim_daily(-1, "2025-11-26") is True
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_daily_not_sent_twice(self, test_db):
+        """Повторный запуск отправки за ту же дату ничего не отправляет"""
+        import scheduler_tasks
+
+        sent = MagicMock(message_id=555)
+        with patch.object(scheduler_tasks.gateway, "send_message", AsyncMock(return_value=sent)) as send, \
+             patch.object(scheduler_tasks, "scheduler", MagicMock()):
+            await scheduler_tasks.send_scheduled_daily(-1, tz="Europe/Moscow")
+            await scheduler_tasks.send_scheduled_daily(-1, tz="Europe/Moscow")
+
+        send.assert_awaited_once()
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_failed_send_releases_claim(self, test_db):
+        """Если отправка упала, отметка снимается и дэйлик можно отправить повторно"""
+        import scheduler_tasks
+
+        with patch.object(scheduler_tasks.gateway, "send_message", AsyncMock(side_effect=RuntimeError("boom"))), \
+             patch.object(scheduler_tasks, "scheduler", MagicMock()):
+            with pytest.raises(RuntimeError):
+                await scheduler_tasks.send_scheduled_daily(-1, tz="Europe/Moscow")
+
+        date_today = scheduler_tasks.local_now("Europe/Moscow").strftime("%Y-%m-%d")
+        assert await claim_daily(-1, date_today) is True
+
+
+class TestShardedScheduling:
+    """Тесты рассылки по шардам"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_dispatch_only_own_chats(self, test_db, two_shards, monkeypatch, add_chats):
+        """Шард рассылает только своим чатам и только держа аренду"""
+        import scheduler_tasks
+
+        await add_chats([(-1, "10:00"), (-2, "10:00"), (-4, "10:00"), (-5, "10:00")])
+        lease = ShardLease(shard=0, owner="me", ttl=30)
+        monkeypatch.setattr(sharding, "shard_lease", lease)
+
+        with patch.object(scheduler_tasks, "is_workday", return_value=True), \
+             patch.object(scheduler_tasks, "send_scheduled_daily", AsyncMock()) as send:
+            summary = await scheduler_tasks.dispatch_dailies("10:00")
+            assert summary["chats"] == 0  # аренды еще нет
+            send.assert_not_awaited()
+
+            await lease.try_acquire()
+            summary = await scheduler_tasks.dispatch_dailies("10:00")
+
+        assert sorted(call.args[0] for call in send.await_args_list) == [-2, -1]
+        assert summary["chats"] == 2
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_schedule_only_own_buckets(self, test_db, two_shards, real_scheduler, add_chats):
+        """Шард создает задачи только для минут, где есть его чаты"""
+        from scheduler_tasks import schedule_all_dailies, daily_job_id
+
+        await add_chats([(-1, "10:00"), (-4, "11:00"), (-2, "12:00"), (-5, "12:00")])
+
+        await schedule_all_dailies()
+
+        ids = {job.id for job in real_scheduler.get_jobs()}
+        assert ids == {daily_job_id("10:00"), daily_job_id("12:00")}
+
+
+class TestWebhookRouting:
+    """Тесты пересылки обновлений владельцу"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_foreign_update_forwarded(self, two_shards):
+        """Обновление чужого чата пересылается владельцу, свое — обрабатывается"""
+        from webhook import WebhookServer, SECRET_HEADER
+
+        router = sharding.ShardRouter(peers=["http://shard-0", "http://shard-1"])
+        router.forward = AsyncMock(return_value=200)
+        server = WebhookServer(MagicMock(), MagicMock(feed_update=AsyncMock()), secret="s", router=router)
+        server.start_workers()
+        client = TestClient(TestServer(server.make_app()))
+        await client.start_server()
+        try:
+            def update(update_id, chat_id):
+                return {
+                    "update_id": update_id,
+                    "message": {
+                        "message_id": 1, "date": 1764140400, "text": "hi",
+                        "chat": {"id": chat_id, "type": "supergroup", "title": "Chat"},
+                    },
+                }
+
+            foreign = await client.post("/webhook", json=update(1, -4), headers={SECRET_HEADER: "s"})
+            own = await client.post("/webhook", json=update(2, -1), headers={SECRET_HEADER: "s"})
+            forwarded = await client.post(
+                "/webhook", json=update(3, -4),
+                headers={SECRET_HEADER: "s", sharding.FORWARDED_HEADER: "1"}
+            )
+
+            assert foreign.status == own.status == forwarded.status == 200
+            router.forward.assert_awaited_once()
+            assert router.forward.await_args.args[0] == 1
+            assert server.received == 2
+        finally:
+            await server.drain()
+            await client.close()
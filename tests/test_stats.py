@@ -0,0 +1,181 @@
+"""
+Integration тесты для накопительной статистики участников (/stats)
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+CHAT_ID = -1001234567890
+ALICE, BOB = 111111111, 222222222
+
+
+async def report(storage, user_id, date, text="Отчет"):
+    await storage.reports.save_batch(
+        [(CHAT_ID, user_id, f"user{user_id % 10}")],
+        [(CHAT_ID, user_id, date, 1, 2, text, f"{date} 10:00:00")]
+    )
+
+
+async def check(storage, date, reported, users=(ALICE, BOB)):
+    await storage.compliance.record_check(CHAT_ID, date, [(user_id, user_id in reported) for user_id in users])
+
+
+def counters(row):
+    """(reports, expected, missed, streak, best_streak)"""
+    return tuple(row[2:7])
+
+
+class TestComplianceRepository:
+    """Инкрементальные счетчики на SQLite и PostgreSQL"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_streaks_and_misses(self, storage):
+        """Серия растет от проверки к проверке, пропуск ее прерывает, рекорд сохраняется"""
+        await storage.chats.add(CHAT_ID, "Test Chat")
+        for date in ("2025-06-02", "2025-06-03"):
+            await report(storage, ALICE, date)
+            await check(storage, date, {ALICE})
+        await check(storage, "2025-06-04", set())
+        await report(storage, ALICE, "2025-06-05")
+        await check(storage, "2025-06-05", {ALICE})
+
+        assert counters(await storage.compliance.for_user(CHAT_ID, ALICE)) == (3, 4, 1, 1, 2)
+        assert counters(await storage.compliance.for_user(CHAT_ID, BOB)) == (0, 4, 4, 0, 0)
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_repeated_report_and_check_counted_once(self, storage):
+        """Исправленный отчет за ту же дату и повторная проверка даты не меняют счетчики"""
+        await storage.chats.add(CHAT_ID, "Test Chat")
+        await report(storage, ALICE, "2025-06-02", "черновик")
+        await report(storage, ALICE, "2025-06-02", "финал")
+        await storage.reports.save_batch([], [
+            (CHAT_ID, BOB, "2025-06-02", 1, 2, "раз", "2025-06-02 10:00:00"),
+            (CHAT_ID, BOB, "2025-06-02", 1, 3, "два", "2025-06-02 10:00:01"),
+        ])
+        await check(storage, "2025-06-02", {ALICE, BOB})
+        await check(storage, "2025-06-02", set())
+        await check(storage, "2025-06-01", set())
+
+        assert counters(await storage.compliance.for_user(CHAT_ID, ALICE)) == (1, 1, 0, 1, 1)
+        assert counters(await storage.compliance.for_user(CHAT_ID, BOB)) == (1, 1, 0, 1, 1)
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_late_report_restores_streak(self, storage):
+        """Отчет после проверки (ответ на напоминание) отменяет пропуск и склеивает серию"""
+        await storage.chats.add(CHAT_ID, "Test Chat")
+        for date in ("2025-06-02", "2025-06-03"):
+            await report(storage, ALICE, date)
+            await check(storage, date, {ALICE})
+        await check(storage, "2025-06-04", set())
+        await report(storage, ALICE, "2025-06-05")
+        await check(storage, "2025-06-05", {ALICE})
+        await report(storage, ALICE, "2025-06-04")
+
+        row = await storage.compliance.for_user(CHAT_ID, ALICE)
+        assert counters(row) == (4, 4, 0, 4, 4)
+        assert row[7] == "2025-06-05"
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_for_chat_orders_by_compliance(self, storage):
+        """Сводка по чату: сначала лучшие по доле сдачи, с именами участников"""
+        await storage.chats.add(CHAT_ID, "Test Chat")
+        await report(storage, BOB, "2025-06-02")
+        await check(storage, "2025-06-02", {BOB})
+
+        rows = await storage.compliance.for_chat(CHAT_ID)
+
+        assert [(row[0], row[1]) for row in rows] == [(BOB, "user2"), (ALICE, None)]
+
+
+class TestStatsCommand:
+    """Тесты команды /stats"""
+
+    @pytest.mark.unit
+    def test_format_stats_line(self):
+        """Строка сводки: процент, серия и рекорд; без проверок — только число отчетов"""
+        from handlers.admin import format_stats_line
+
+        assert format_stats_line((ALICE, "alice", 20, 20, 1, 5, 12, None, None)) == \
+            "@alice — 95% (19/20), серия 5, рекорд 12"
+        assert format_stats_line((BOB, None, 3, 0, 0, 0, 0, None, None)) == \
+            f"user_id: {BOB} — отчётов: 3, проверок ещё не было"
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_user_stats_sent_privately(self, test_db, mock_message):
+        """/stats @username присылает админу подробную статистику в личку"""
+        from handlers.admin import cmd_stats
+        from storage import storage
+
+        await storage.chats.add(mock_message.chat.id, "Test Chat")
+        await storage.reports.save_batch(
+            [(mock_message.chat.id, BOB, "bob")],
+            [(mock_message.chat.id, BOB, "2025-06-02", 1, 2, "Отчет", "2025-06-02 10:00:00")]
+        )
+        await storage.compliance.record_check(mock_message.chat.id, "2025-06-02", [(BOB, True)])
+        command = AsyncMock(args="@bob")
+
+        with patch("handlers.admin.admin_cache.is_admin", AsyncMock(return_value=True)), \
+             patch("handlers.admin.gateway") as gateway, \
+             patch("handlers.admin.delete_later", AsyncMock()):
+            gateway.answer = AsyncMock()
+            gateway.send_message = AsyncMock()
+            await cmd_stats(mock_message, command)
+
+        text = gateway.send_message.call_args.args[1]
+        assert text.startswith("Статистика @bob:")
+        assert "Сдано в срок: 1 из 1 (100%)" in text
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_chat_stats_split_by_utf16(self, test_db, mock_message):
+        """Длинная сводка делится на сообщения по STATS_MESSAGE_MAX_CHARS в единицах UTF-16"""
+        from handlers.admin import cmd_stats
+        from mentions import utf16_len
+        from storage import storage
+
+        chat_id = mock_message.chat.id
+        await storage.chats.add(chat_id, "Test Chat")
+        await storage.reports.save_batch(
+            [(chat_id, 1000 + i, f"user{i:03d}") for i in range(40)],
+            [(chat_id, 1000 + i, "2025-06-02", 1, 2, "Отчет", "2025-06-02 10:00:00") for i in range(40)]
+        )
+        command = AsyncMock(args=None)
+
+        with patch("handlers.admin.admin_cache.is_admin", AsyncMock(return_value=True)), \
+             patch("handlers.admin.STATS_MESSAGE_MAX_CHARS", 300), \
+             patch("handlers.admin.gateway") as gateway, \
+             patch("handlers.admin.delete_later", AsyncMock()):
+            gateway.answer = AsyncMock()
+            gateway.send_message = AsyncMock()
+            await cmd_stats(mock_message, command)
+
+        chunks = [call.args[1] for call in gateway.send_message.call_args_list]
+        assert len(chunks) > 1
+        assert all(utf16_len(chunk) <= 300 for chunk in chunks)
+        assert chunks[0].startswith("Статистика сдачи отчётов")
+        assert sum(chunk.count("@user") for chunk in chunks) == 40
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_check_updates_stats(self, test_db):
+        """Проверка отчетов за день записывает итог в статистику"""
+        from scheduler_tasks import check_daily_reports
+        from storage import storage
+
+        await storage.chats.add(CHAT_ID, "Test Chat")
+        await storage.reports.save_batch(
+            [(CHAT_ID, ALICE, "alice"), (CHAT_ID, BOB, "bob")],
+            [(CHAT_ID, ALICE, "2025-06-02", 1, 2, "Отчет", "2025-06-02 10:00:00")]
+        )
+
+        with patch("scheduler_tasks.gateway") as gateway, \
+             patch("scheduler_tasks.message_index.record", AsyncMock()):
+            gateway.send_message = AsyncMock()
+            await check_daily_reports(CHAT_ID, 1, "2025-06-02")
+
+        assert counters(await storage.compliance.for_user(CHAT_ID, ALICE)) == (1, 1, 0, 1, 1)
+        assert counters(await storage.compliance.for_user(CHAT_ID, BOB)) == (0, 1, 1, 0, 0)
@@ -0,0 +1,175 @@
+"""
+Тесты трассировки обновлений и лога медленных обновлений
+"""
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from aiogram import Dispatcher, Router
+from aiogram.methods import SendMessage
+from aiogram.types import Update
+
+CHAT_ID = -1001234567890
+
+UPDATE = {
+    "update_id": 42,
+    "message": {
+        "message_id": 1,
+        "date": 1700000000,
+        "chat": {"id": CHAT_ID, "type": "supergroup", "title": "Test Chat"},
+        "from": {"id": 111111111, "is_bot": False, "first_name": "Test"},
+        "text": "Отчет",
+    },
+}
+
+
+def make_dispatcher(callback, threshold_ms=0):
+    """Диспетчер с одним обработчиком сообщений и трассировкой"""
+    from tracing import HandlerTracingMiddleware, UpdateTracingMiddleware
+
+    router = Router()
+    router.message()(callback)
+    dp = Dispatcher()
+    dp.include_router(router)
+    dp.update.outer_middleware(UpdateTracingMiddleware(threshold_ms=threshold_ms))
+    dp.message.middleware(HandlerTracingMiddleware())
+    return dp
+
+
+def logged_record(logger):
+    """JSON из последней записи о медленном обновлении"""
+    message = logger.warning.call_args.args[0]
+    return json.loads(message.split(": ", 1)[1])
+
+
+class TestTrace:
+    """Тесты спанов"""
+
+    @pytest.mark.unit
+    def test_span_outside_update_is_noop(self):
+        """Вне обработки обновления спаны не пишутся и не падают"""
+        from tracing import current_trace, span
+
+        with span("db", "chat.add"):
+            pass
+
+        assert current_trace() is None
+
+    @pytest.mark.unit
+    def test_spans_are_capped_and_ignored_after_finish(self):
+        """Лишние спаны только учитываются в суммах; после завершения обновления — игнорируются"""
+        from tracing import MAX_SPANS, Trace
+
+        trace = Trace(update_id=1)
+        for _ in range(MAX_SPANS + 5):
+            trace.add_span("db", "report.page", time.perf_counter(), 0.001)
+        trace.finish()
+        trace.add_span("api", "sendMessage", time.perf_counter(), 1.0)
+        record = trace.record()
+
+        assert len(record["spans"]) == MAX_SPANS
+        assert record["dropped_spans"] == 5
+        assert record["db_ms"] == pytest.approx((MAX_SPANS + 5) * 1.0, abs=0.5)
+        assert record["api_ms"] == 0.0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_bot_api_span(self):
+        """Вызов Bot API внутри обновления становится спаном api с именем метода"""
+        from tracing import BotApiTracingMiddleware, Trace, _current
+
+        trace = Trace()
+        token = _current.set(trace)
+        try:
+            await BotApiTracingMiddleware()(
+                AsyncMock(return_value=True), None, SendMessage(chat_id=CHAT_ID, text="привет")
+            )
+        finally:
+            _current.reset(token)
+
+        assert [(kind, name) for kind, name, *_ in trace.spans] == [("api", "sendMessage")]
+
+
+class TestSlowUpdateLog:
+    """Тесты записи о медленном обновлении"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_slow_update_record(self, storage):
+        """Медленное обновление: trace ID, обработчик и спаны запросов к БД в логе"""
+        async def handle_report(message):
+            await storage.chats.add(CHAT_ID, "Test Chat")
+            await storage.reports.page(CHAT_ID, "2025-06-02")
+            await asyncio.sleep(0.01)
+
+        dp = make_dispatcher(handle_report)
+        update = Update.model_validate(UPDATE)
+
+        with patch("tracing.logger") as logger:
+            await dp.feed_update(MagicMock(), update, received_at=time.perf_counter() - 0.5)
+
+        record = logged_record(logger)
+        assert len(record["trace_id"]) == 16
+        assert record["update_id"] == 42
+        assert record["type"] == "message"
+        assert record["chat_id"] == CHAT_ID
+        assert record["handler"].endswith("handle_report")
+        assert record["queue_ms"] >= 500
+        assert record["handler_ms"] >= 10
+        assert record["total_ms"] >= record["routing_ms"] + record["handler_ms"] - 0.2
+        assert [(s["kind"], s["name"]) for s in record["spans"]] == [("db", "chat.add"), ("db", "report.page")]
+        assert record["db_ms"] > 0 and record["api_ms"] == 0.0
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_reply_write_in_update_trace(self, storage, mock_bot):
+        """Групповая запись ответа на дэйлик учитывается спаном БД обновления"""
+        from handlers.daily import handle_reply
+        from message_index import KIND_DAILY, MessageIndex
+        from report_writer import ReportWriter
+
+        await storage.chats.add(CHAT_ID, "Test Chat")
+        index = MessageIndex(retention_days=7)
+        await index.record(CHAT_ID, 7, KIND_DAILY, "2025-06-02")
+
+        update = Update.model_validate({**UPDATE, "message": {**UPDATE["message"], "reply_to_message": {
+            "message_id": 7,
+            "date": 1700000000,
+            "chat": UPDATE["message"]["chat"],
+            "from": {"id": mock_bot.id, "is_bot": True, "first_name": "Bot"},
+            "text": "Дэйлик",
+        }}})
+        writer = ReportWriter(flush_interval_ms=5)
+        writer.start()
+        dp = make_dispatcher(handle_reply)
+        try:
+            with patch("tracing.logger") as logger, \
+                 patch("handlers.daily.bot", mock_bot), \
+                 patch("handlers.daily.message_index", index), \
+                 patch("handlers.daily.report_writer", writer):
+                await dp.feed_update(MagicMock(), update)
+        finally:
+            await writer.stop()
+
+        record = logged_record(logger)
+        assert ("db", "reports.save_batch") in [(s["kind"], s["name"]) for s in record["spans"]]
+        assert record["db_ms"] >= 5
+        assert len(await storage.reports.reporters(CHAT_ID, "2025-06-02")) == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_fast_update_not_logged(self):
+        """Обновление быстрее порога в лог не попадает, контекст после него очищен"""
+        from tracing import current_trace
+
+        async def handle_report(message):
+            assert current_trace() is not None
+
+        dp = make_dispatcher(handle_report, threshold_ms=60_000)
+
+        with patch("tracing.logger") as logger:
+            await dp.feed_update(MagicMock(), Update.model_validate(UPDATE))
+
+        logger.warning.assert_not_called()
+        assert current_trace() is None
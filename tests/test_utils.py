@@ -53,6 +53,18 @@ class TestIsWorkday:
     def test_workday_thursday(self):
         """Четверг - рабочий день"""
         assert is_workday() is True
+    
+    @pytest.mark.unit
+    @freeze_time("2025-11-01")  # Суббота, перенесенный рабочий день
+    def test_transferred_working_saturday(self):
+        """Рабочая суббота из файла переносов - рабочий день"""
+        assert is_workday() is True
+    
+    @pytest.mark.unit
+    @freeze_time("2025-11-03")  # Понедельник, выходной перенесен с 01.11
+    def test_transferred_day_off(self):
+        """Перенесенный выходной - не рабочий день"""
+        assert is_workday() is False
 
 
 class TestDeleteLater:
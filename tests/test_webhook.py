@@ -0,0 +1,133 @@
+"""
+Integration тесты для webhook-сервера
+"""
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook import WebhookServer, SECRET_HEADER
+
+SECRET = "test-secret"
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 10,
+        "date": 1764140400,
+        "chat": {"id": -1001234567890, "type": "supergroup", "title": "Test Chat"},
+        "from": {"id": 222222222, "is_bot": False, "first_name": "User"},
+        "text": "/help",
+    },
+}
+
+
+class FakeDispatcher:
+    """Диспетчер, считающий обновления и одновременные обработки"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.updates = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def feed_update(self, bot, update, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.updates.append(update.update_id)
+        self.in_flight -= 1
+
+
+@pytest.fixture
+async def webhook():
+    """Фабрика: WebhookServer с тестовым клиентом aiohttp"""
+    clients = []
+
+    async def make(dp, **kwargs):
+        server = WebhookServer(MagicMock(), dp, secret=SECRET, **kwargs)
+        server.start_workers()
+        client = TestClient(TestServer(server.make_app()))
+        await client.start_server()
+        clients.append((server, client))
+        return server, client
+
+    yield make
+    for server, client in clients:
+        await server.drain()
+        await client.close()
+
+
+def update(update_id):
+    return {**UPDATE, "update_id": update_id}
+
+
+class TestWebhookServer:
+    """Тесты для WebhookServer"""
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_rejects_wrong_secret(self, webhook):
+        """Запрос без верного секрета отклоняется и не попадает в обработку"""
+        dp = FakeDispatcher()
+        server, client = await webhook(dp)
+
+        response = await client.post("/webhook", json=UPDATE, headers={SECRET_HEADER: "wrong"})
+        assert response.status == 401
+        response = await client.post("/webhook", json=UPDATE)
+        assert response.status == 401
+        await server.drain()
+
+        assert dp.updates == []
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_updates_processed_with_bounded_concurrency(self, webhook):
+        """Обновления обрабатываются не более чем workers штук одновременно"""
+        dp = FakeDispatcher(delay=0.01)
+        server, client = await webhook(dp, workers=3)
+
+        for i in range(1, 11):
+            response = await client.post("/webhook", json=update(i), headers={SECRET_HEADER: SECRET})
+            assert response.status == 200
+        await server.queue.join()
+
+        assert sorted(dp.updates) == list(range(1, 11))
+        assert dp.peak == 3
+        assert server.stats()["processed"] == 10
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_queue_overflow_returns_503(self, webhook):
+        """При переполненной очереди отвечаем 503, чтобы Telegram повторил доставку"""
+        dp = FakeDispatcher(delay=0.05)
+        server, client = await webhook(dp, workers=1, queue_size=1)
+
+        statuses = [
+            (await client.post("/webhook", json=update(i), headers={SECRET_HEADER: SECRET})).status
+            for i in range(1, 5)
+        ]
+
+        assert 503 in statuses
+        assert server.stats()["rejected"] == statuses.count(503)
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_drain_finishes_accepted_updates(self, webhook):
+        """Остановка дожидается обработки принятых обновлений и закрывает прием"""
+        dp = FakeDispatcher(delay=0.02)
+        server, client = await webhook(dp, workers=2)
+
+        for i in range(1, 7):
+            await client.post("/webhook", json=update(i), headers={SECRET_HEADER: SECRET})
+        await server.drain()
+
+        assert sorted(dp.updates) == list(range(1, 7))
+        response = await client.post("/webhook", json=update(7), headers={SECRET_HEADER: SECRET})
+        assert response.status == 503
+
+    @pytest.mark.unit
+    def test_secret_required(self):
+        """Без секрета сервер не создается"""
+        with pytest.raises(ValueError):
+            WebhookServer(MagicMock(), FakeDispatcher(), secret=None)
@@ -0,0 +1,61 @@
+"""
+Часовые пояса чатов
+
+У каждого чата свой часовой пояс (chats.timezone, NULL — TIMEZONE из config):
+в нем задается время рассылки, считается дата дэйлика и время отчетов.
+Объекты pytz создаются один раз на пояс, пояса чатов кэшируются в памяти
+и обновляются write-through командой /settz.
+"""
+import logging
+from datetime import datetime
+from functools import lru_cache
+
+import pytz
+
+from config import TIMEZONE
+from storage import storage
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name=TIMEZONE):
+    """Объект pytz для пояса name (один на процесс)"""
+    return pytz.timezone(name)
+
+
+def is_valid_timezone(name):
+    """Проверяет, что name — пояс из базы IANA (например, Asia/Yekaterinburg)"""
+    return name in pytz.all_timezones_set
+
+
+def local_now(name=TIMEZONE):
+    """Текущее время в поясе name"""
+    return datetime.now(get_timezone(name))
+
+
+class ChatTimezones:
+    """Кэш часовых поясов чатов: chat_id -> имя пояса"""
+
+    def __init__(self):
+        self._zones = {}
+
+    async def get(self, chat_id):
+        """Часовой пояс чата (TIMEZONE, если не задан)"""
+        name = self._zones.get(chat_id)
+        if name is None:
+            name = await storage.chats.timezone(chat_id) or TIMEZONE
+            self._zones[chat_id] = name
+        return name
+
+    def set(self, chat_id, name):
+        """Запоминает пояс чата после записи в БД"""
+        self._zones[chat_id] = name or TIMEZONE
+
+    def clear(self):
+        """Полностью очищает кэш"""
+        self._zones.clear()
+
+
+# Глобальный кэш поясов чатов
+chat_timezones = ChatTimezones()
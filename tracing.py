@@ -0,0 +1,185 @@
+"""
+Трассировка обработки обновлений
+
+Каждое обновление получает trace ID (outer middleware диспетчера), а время,
+проведенное в запросах к хранилищу и вызовах Bot API, записывается как
+спаны текущего обновления — через contextvars, поэтому трассировку не нужно
+передавать в обработчики явно. Inner middleware отмечает, какой обработчик
+сработал и когда: время до него — маршрутизация по роутерам и фильтрам.
+
+Если обновление обрабатывалось дольше SLOW_UPDATE_MS мс, в лог пишется
+структурированная JSON-запись: trace ID, обработчик, время в очереди
+webhook-сервера, маршрутизации, обработчике, суммарно в БД и Bot API и
+список спанов. Подключается в main.main, если SLOW_UPDATE_MS > 0.
+"""
+import contextvars
+import functools
+import json
+import logging
+import secrets
+import time
+from contextlib import contextmanager
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from config import SLOW_UPDATE_MS
+from metrics import handler_name
+
+logger = logging.getLogger(__name__)
+
+# Сколько спанов хранить на одно обновление (остальные только учитываются в суммах)
+MAX_SPANS = 50
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+class Trace:
+    """Трассировка одного обновления"""
+
+    def __init__(self, update_id=None, event_type=None, queued=0.0):
+        self.trace_id = secrets.token_hex(8)
+        self.update_id = update_id
+        self.event_type = event_type
+        self.queued = queued
+        self.started = time.perf_counter()
+        self.handler = None
+        self.handler_started = None
+        self.finished = None
+        self.spans = []
+        self.dropped = 0
+        self.totals = {}
+
+    def add_span(self, kind, name, started, duration):
+        # Задачи, запущенные обработчиком, наследуют контекст и могут пережить обновление
+        if self.finished is not None:
+            return
+        self.totals[kind] = self.totals.get(kind, 0.0) + duration
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append((kind, name, started - self.started, duration))
+
+    def finish(self):
+        self.finished = time.perf_counter()
+        return self.finished - self.started
+
+    def record(self, chat_id=None):
+        """Запись для лога медленных обновлений"""
+        total = (self.finished or time.perf_counter()) - self.started
+        routing = (self.handler_started or self.started + total) - self.started
+        return {
+            "trace_id": self.trace_id,
+            "update_id": self.update_id,
+            "type": self.event_type,
+            "chat_id": chat_id,
+            "handler": self.handler,
+            "total_ms": _ms(total),
+            "queue_ms": _ms(self.queued),
+            "routing_ms": _ms(routing),
+            "handler_ms": _ms(total - routing) if self.handler_started else 0.0,
+            "db_ms": _ms(self.totals.get("db", 0.0)),
+            "api_ms": _ms(self.totals.get("api", 0.0)),
+            "spans": [
+                {"kind": kind, "name": name, "at_ms": _ms(offset), "ms": _ms(duration)}
+                for kind, name, offset, duration in self.spans
+            ],
+            "dropped_spans": self.dropped,
+        }
+
+
+def current_trace():
+    """Трассировка обновления, которое сейчас обрабатывается (или None)"""
+    return _current.get()
+
+
+@contextmanager
+def span(kind, name):
+    """Записывает время блока как спан текущего обновления (вне обновления — ничего не делает)"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(kind, name, started, time.perf_counter() - started)
+
+
+def traced(kind, name):
+    """Декоратор корутины: каждый вызов — спан текущего обновления"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(kind, name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _chat_id(event):
+    chat = getattr(event, "chat", None)
+    if chat is None:
+        chat = getattr(getattr(event, "message", None), "chat", None)
+    return getattr(chat, "id", None)
+
+
+class UpdateTracingMiddleware(BaseMiddleware):
+    """Outer middleware на dp.update: trace ID, общее время и запись о медленном обновлении"""
+
+    def __init__(self, threshold_ms=SLOW_UPDATE_MS):
+        self.threshold = threshold_ms / 1000
+
+    async def __call__(self, handler, event, data):
+        # received_at передает webhook-сервер: время приема запроса до очереди
+        received_at = data.get("received_at")
+        trace = Trace(
+            update_id=getattr(event, "update_id", None),
+            event_type=getattr(event, "event_type", None),
+            queued=time.perf_counter() - received_at if received_at else 0.0,
+        )
+        token = _current.set(trace)
+        try:
+            return await handler(event, data)
+        finally:
+            _current.reset(token)
+            if trace.finish() >= self.threshold:
+                record = trace.record(chat_id=_chat_id(getattr(event, "event", None)))
+                logger.warning(f"Медленное обновление: {json.dumps(record, ensure_ascii=False)}")
+
+
+class HandlerTracingMiddleware(BaseMiddleware):
+    """Inner middleware: какой обработчик сработал и когда закончилась маршрутизация"""
+
+    async def __call__(self, handler, event, data):
+        trace = _current.get()
+        if trace is not None:
+            trace.handler = handler_name(data.get("handler"))
+            trace.handler_started = time.perf_counter()
+        return await handler(event, data)
+
+
+class BotApiTracingMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: вызовы Bot API — спаны текущего обновления"""
+
+    async def __call__(self, make_request, bot, method):
+        with span("api", getattr(method, "__api_method__", type(method).__name__)):
+            return await make_request(bot, method)
+
+
+def enabled():
+    return SLOW_UPDATE_MS > 0
+
+
+def install(bot, dp):
+    """Подключает трассировку к диспетчеру и сессии бота"""
+    dp.update.outer_middleware(UpdateTracingMiddleware())
+    middleware = HandlerTracingMiddleware()
+    for observer in (dp.message, dp.callback_query, dp.my_chat_member, dp.chat_member):
+        observer.middleware(middleware)
+    bot.session.middleware(BotApiTracingMiddleware())
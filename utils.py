@@ -2,25 +2,21 @@
 Вспомогательные функции
 """
 import asyncio
-from datetime import datetime
-import holidays
-from pytz import timezone as pytz_timezone
-from config import TIMEZONE
+from calendar_service import calendar_service
 
 
-def is_workday():
+def is_workday(day=None, country=None):
     """
-    Проверяет, является ли сегодня рабочим днем
+    Проверяет, является ли день (по умолчанию сегодня) рабочим
+    
+    Args:
+        day: Дата (по умолчанию — сегодня по МСК)
+        country: Код страны календаря (по умолчанию — CALENDAR_DEFAULT_COUNTRY)
     
     Returns:
         bool: True если рабочий день, False если выходной/праздник
     """
-    today = datetime.now(pytz_timezone(TIMEZONE)).date()
-    ru_holidays = holidays.RU(years=today.year)
-    # Суббота (5) или воскресенье (6) — выходные, а также праздники РФ
-    if today.weekday() >= 5 or today in ru_holidays:
-        return False
-    return True
+    return calendar_service.is_workday(day, country)
 
 
 async def delete_later(msg, seconds=1800):
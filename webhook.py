@@ -0,0 +1,210 @@
+"""
+Режим webhook: встроенный aiohttp-сервер вместо long polling
+
+Telegram присылает обновления POST-запросами на WEBHOOK_PATH. Сервер сверяет
+заголовок X-Telegram-Bot-Api-Secret-Token с WEBHOOK_SECRET, кладет обновление
+в ограниченную очередь и сразу отвечает 200 — обработку выполняют
+WEBHOOK_WORKERS воркеров через dp.feed_update. При переполнении очереди
+отвечаем 503, и Telegram повторит доставку позже. При шардировании
+(sharding.py) обновления чужих чатов пересылаются процессу-владельцу.
+
+При остановке сервер перестает принимать запросы и ждет, пока воркеры
+обработают уже принятые обновления (не дольше WEBHOOK_DRAIN_TIMEOUT_SECONDS).
+"""
+import asyncio
+import hmac
+import logging
+import signal
+import time
+
+from aiohttp import web
+from aiogram.types import Update
+
+import sharding
+from config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_WORKERS,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_DRAIN_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """aiohttp-приложение webhook с очередью и пулом воркеров"""
+
+    def __init__(
+        self,
+        bot,
+        dp,
+        secret=WEBHOOK_SECRET,
+        path=WEBHOOK_PATH,
+        workers=WEBHOOK_WORKERS,
+        queue_size=WEBHOOK_QUEUE_SIZE,
+        drain_timeout=WEBHOOK_DRAIN_TIMEOUT_SECONDS,
+        router=None,
+    ):
+        if not secret:
+            raise ValueError("WEBHOOK_SECRET не задан — без него webhook принимал бы запросы от кого угодно")
+        self.bot = bot
+        self.dp = dp
+        self.secret = secret
+        self.path = path
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.router = router
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+        self._runner = None
+        self._accepting = False
+        # Статистика
+        self.received = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.queue_peak = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def make_app(self):
+        """aiohttp-приложение с маршрутом webhook"""
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request):
+        """Принимает обновление от Telegram"""
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            logger.warning(f"Webhook: запрос с неверным секретом от {request.remote}")
+            return web.Response(status=401)
+        if not self._accepting:
+            return web.Response(status=503)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Webhook: некорректное обновление: {e}")
+            return web.Response(status=400)
+        if self.router is not None and sharding.FORWARDED_HEADER not in request.headers:
+            owner = self.router.remote_owner(update)
+            if owner is not None:
+                # Чат другого шарда: ответ владельца (в том числе 503) возвращаем Telegram
+                status = await self.router.forward(owner, await request.read(), self.secret)
+                return web.Response(status=status)
+        try:
+            self.queue.put_nowait((time.perf_counter(), update))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"Webhook: очередь заполнена ({self.queue.maxsize}), обновление {update.update_id} отклонено")
+            return web.Response(status=503)
+        self.received += 1
+        self.queue_peak = max(self.queue_peak, self.queue.qsize())
+        return web.Response()
+
+    async def _worker(self):
+        while True:
+            received_at, update = await self.queue.get()
+            try:
+                # received_at — для времени в очереди в трассировке (tracing.py)
+                await self.dp.feed_update(self.bot, update, received_at=received_at)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Webhook: ошибка обработки обновления {update.update_id}: {e}", exc_info=True)
+            finally:
+                # Задержка от приема запроса до конца обработки хендлером
+                latency = time.perf_counter() - received_at
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+                self.queue.task_done()
+
+    def start_workers(self):
+        """Запускает воркеры и начинает принимать обновления"""
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"webhook-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._accepting = True
+
+    async def start(self, host=WEBHOOK_HOST, port=WEBHOOK_PORT):
+        """Поднимает HTTP-сервер и воркеры"""
+        self.start_workers()
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Webhook-сервер слушает {host}:{port}{self.path} ({self.workers} воркеров)")
+
+    async def drain(self):
+        """Перестает принимать обновления и дожидается обработки очереди"""
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook: за {self.drain_timeout} с не обработано {self.queue.qsize()} обновлений")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def stop(self):
+        """Плавная остановка: прием закрывается, очередь дообрабатывается, сервер гасится"""
+        await self.drain()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self.router is not None:
+            await self.router.close()
+        logger.info(f"Webhook-сервер остановлен. Статистика: {self.stats()}")
+
+    def stats(self):
+        """Счетчики обновлений и задержка прием → конец обработки"""
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "queue_depth": self.queue.qsize(),
+            "queue_peak": self.queue_peak,
+            "latency_avg_ms": round(self.latency_total / (self.processed + self.failed) * 1000, 2)
+            if self.processed + self.failed else 0.0,
+            "latency_max_ms": round(self.latency_max * 1000, 2),
+        }
+
+
+async def run_webhook(bot, dp):
+    """
+    Работа бота в режиме webhook до SIGINT/SIGTERM
+
+    Регистрирует webhook в Telegram (только обновления, на которые есть хендлеры)
+    и при остановке не удаляет его: накопившиеся за время перезапуска обновления
+    Telegram доставит новому процессу.
+    """
+    if not WEBHOOK_URL:
+        raise ValueError("BOT_MODE=webhook требует WEBHOOK_URL")
+    server = WebhookServer(bot, dp, router=sharding.ShardRouter() if sharding.enabled() else None)
+    await server.start()
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    try:
+        await bot.set_webhook(
+            WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info(f"Webhook зарегистрирован: {WEBHOOK_URL}")
+        await stop_event.wait()
+        logger.info("Получен сигнал остановки, дообрабатываем очередь webhook...")
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+        await server.stop()